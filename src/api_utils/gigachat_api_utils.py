@@ -1,10 +1,80 @@
 import json
+import time
+from typing import AsyncIterator
+
 import urllib3
 import aiohttp
+
+from api_utils.http_client import http_client
+from config import GIGACHAT_API_URL, GIGACHAT_AUTH_URL
+from monitoring.metrics import LLM_ERRORS_TOTAL, record, span
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
-async def query(url: str, headers: dict, payload: dict | str) -> dict:
+class GigaChatError(Exception):
+    """Ошибка GigaChat API с HTTP-статусом ответа.
+
+    Args:
+        status (int): HTTP-статус ответа.
+        message (str): Текст ошибки.
+        retry_after (float | None): Значение заголовка Retry-After в секундах, если он есть.
+    """
+
+    def __init__(self, status: int, message: str, retry_after: float | None = None):
+        super().__init__(f'GigaChat API {status}: {message}')
+        self.status = status
+        self.retry_after = retry_after
+
+
+class GigaChatResponseError(GigaChatError):
+    """Сервер вернул успешный статус, но тело ответа не соответствует формату chat/completions.
+
+    Args:
+        message (str): Описание ошибки.
+    """
+
+    def __init__(self, message: str):
+        super().__init__(200, message)
+
+
+def extract_content(response) -> str:
+    """Извлекает текст ответа из тела ответа chat/completions.
+
+    Args:
+        response: Ответ сервера, декодированный из JSON.
+
+    Returns:
+        str: Текст первого варианта ответа.
+
+    Raises:
+        GigaChatResponseError: Если в ответе нет `choices[0].message.content`.
+    """
+    try:
+        content = response['choices'][0]['message']['content']
+    except (KeyError, IndexError, TypeError):
+        raise GigaChatResponseError(f'Некорректный ответ: {str(response)[:200]}') from None
+    if not isinstance(content, str):
+        raise GigaChatResponseError(f'Некорректный текст ответа: {content!r:.200}')
+    return content
+
+
+async def raise_for_status(response: aiohttp.ClientResponse):
+    """Выбрасывает `GigaChatError`, если сервер вернул статус ошибки.
+
+    Args:
+        response (aiohttp.ClientResponse): Ответ сервера.
+    """
+    if response.status < 400:
+        return
+    retry_after = response.headers.get('Retry-After')
+    try:
+        retry_after = float(retry_after) if retry_after is not None else None
+    except ValueError:
+        retry_after = None
+    raise GigaChatError(response.status, (await response.text())[:500], retry_after)
+
+
+async def query(url: str, headers: dict, payload: dict | str, session: aiohttp.ClientSession | None = None) -> dict:
     """Отправляет асинхронный POST-запрос по указанному URL и возвращает ответ в формате JSON.
 
     Args:
@@ -12,26 +82,33 @@ async def query(url: str, headers: dict, payload: dict | str) -> dict:
         headers (dict): Заголовки HTTP-запроса.
         payload (dict | str): Тело запроса. Может быть словарём (будет автоматически
             сериализовано в JSON) или строкой.
+        session (aiohttp.ClientSession | None): Сессия для запроса. По умолчанию
+            используется общий пул соединений `http_client`.
 
     Returns:
         dict: Ответ сервера, декодированный из JSON.
+
+    Raises:
+        GigaChatError: Если сервер вернул статус ошибки.
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=headers, data=payload, ssl=False) as response:
-            resp = await response.json()
-            return resp
+    session = session or http_client.session
+    async with session.post(url, headers=headers, data=payload, ssl=False) as response:
+        await raise_for_status(response)
+        resp = await response.json()
+        return resp
 
 
-async def get_token(client_secret: str) -> str | None:
+async def fetch_token(client_secret: str) -> dict:
     """Запрашивает OAuth-токен доступа к GigaChat API через авторизацию с client_secret.
 
      Args:
          client_secret (str): Секретный ключ
 
      Returns:
-         str: Строка с access_token в случае успешной авторизации.
+         dict: Ответ OAuth-сервера с ключами 'access_token' и 'expires_at'
+            (время истечения токена в миллисекундах).
      """
-    url = 'https://ngw.devices.sberbank.ru:9443/api/v2/oauth'
+    url = GIGACHAT_AUTH_URL
     payload = {'scope': 'GIGACHAT_API_PERS'}
     headers = {
         'Content-Type': 'application/x-www-form-urlencoded',
@@ -40,24 +117,36 @@ async def get_token(client_secret: str) -> str | None:
         'Authorization': f'Basic {client_secret}'
     }
 
-    response = await query(url, headers, payload)
-    return response['access_token']
+    return await query(url, headers, payload)
 
 
+async def get_token(client_secret: str) -> str | None:
+    """Запрашивает OAuth-токен доступа к GigaChat API через авторизацию с client_secret.
 
-async def get_answer(text: str, access_token: str) -> str | None:
-    """Отправляет запрос к GigaChat API для генерации ответа на пользовательский текст.
+    Для повторяющихся запросов используйте `api_utils.token_manager.token_manager`,
+    который кэширует токен до истечения срока его действия.
+
+     Args:
+         client_secret (str): Секретный ключ
+
+     Returns:
+         str: Строка с access_token в случае успешной авторизации.
+     """
+    response = await fetch_token(client_secret)
+    return response['access_token']
+
+
+def completion_payload(text: str, stream: bool = False) -> str:
+    """Формирует тело запроса к эндпоинту chat/completions.
 
     Args:
-        text (str): Входной текст (сообщение от пользователя), на который нужно
-            сгенерировать ответ.
-        access_token (str): Токен доступа.
+        text (str): Текст сообщения пользователя.
+        stream (bool): Запросить ли потоковую выдачу ответа.
 
     Returns:
-        str: Сгенерированный моделью текст ответа
+        str: Тело запроса в формате JSON.
     """
-    url = "https://gigachat.devices.sberbank.ru/api/v1/chat/completions"
-    payload = json.dumps({
+    return json.dumps({
         "model": "GigaChat-2-Pro",
         "messages": [
             {
@@ -68,18 +157,96 @@ async def get_answer(text: str, access_token: str) -> str | None:
         "temperature": 1,
         "top_p": 0.1,
         "n": 1,
-        "stream": False,
+        "stream": stream,
         "max_tokens": 512,
         "repetition_penalty": 1
     })
 
+
+async def get_answer(text: str, access_token: str) -> str | None:
+    """Отправляет запрос к GigaChat API для генерации ответа на пользовательский текст.
+
+    Args:
+        text (str): Входной текст (сообщение от пользователя), на который нужно
+            сгенерировать ответ.
+        access_token (str): Токен доступа.
+
+    Returns:
+        str: Сгенерированный моделью текст ответа
+
+    Raises:
+        GigaChatError: Если сервер вернул статус ошибки или ответ некорректного формата.
+    """
+    url = f"{GIGACHAT_API_URL}/chat/completions"
+    payload = completion_payload(text)
+
     headers = {
         'Content-Type': 'application/json',
         'Accept': 'application/json',
         'Authorization': f'Bearer {access_token}'
     }
 
-    response = await query(url, headers, payload)
-    return response['choices'][0]['message']['content']
+    try:
+        with span('llm_completion'):
+            response = await query(url, headers, payload)
+            return extract_content(response)
+    except Exception:
+        LLM_ERRORS_TOTAL.inc(operation='completion')
+        raise
+
+
+async def stream_answer(text: str,
+                        access_token: str,
+                        session: aiohttp.ClientSession | None = None) -> AsyncIterator[str]:
+    """Запрашивает у GigaChat потоковый ответ и отдаёт фрагменты текста по мере их поступления.
+
+    Ответ приходит в формате Server-Sent Events: строки `data: {...}` с полем
+    `choices[0].delta.content` и завершающая строка `data: [DONE]`.
 
+    Args:
+        text (str): Входной текст (сообщение от пользователя).
+        access_token (str): Токен доступа.
+        session (aiohttp.ClientSession | None): Сессия для запроса. По умолчанию
+            используется общий пул соединений `http_client`.
+
+    Yields:
+        str: Очередной фрагмент текста ответа.
+
+    Raises:
+        GigaChatError: Если сервер вернул статус ошибки или фрагмент некорректного формата.
+    """
+    url = f"{GIGACHAT_API_URL}/chat/completions"
+    headers = {
+        'Content-Type': 'application/json',
+        'Accept': 'text/event-stream',
+        'Authorization': f'Bearer {access_token}'
+    }
 
+    session = session or http_client.session
+    started = time.perf_counter()
+    first_token = True
+    try:
+        async with session.post(url, headers=headers, data=completion_payload(text, stream=True), ssl=False) as response:
+            await raise_for_status(response)
+            async for line in response.content:
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                try:
+                    choices = json.loads(data)['choices']
+                    deltas = [choice.get('delta', {}).get('content') for choice in choices]
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    raise GigaChatResponseError(f'Некорректный фрагмент потокового ответа: {data[:200]}') from None
+                for delta in deltas:
+                    if delta:
+                        if first_token:
+                            record('llm_first_token', time.perf_counter() - started)
+                            first_token = False
+                        yield delta
+    except Exception:
+        LLM_ERRORS_TOTAL.inc(operation='stream')
+        raise
+    record('llm_completion', time.perf_counter() - started)
@@ -0,0 +1,279 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable
+
+import aiohttp
+from loguru import logger
+
+from api_utils.gigachat_api_utils import GigaChatError, GigaChatResponseError, get_answer, stream_answer
+from api_utils.token_manager import TokenManager, token_manager
+from config import (GIGACHAT_BACKOFF, GIGACHAT_BREAKER_RESET, GIGACHAT_BREAKER_THRESHOLD, GIGACHAT_DEADLINE,
+                    GIGACHAT_HEDGE, GIGACHAT_HEDGE_MIN_DELAY, GIGACHAT_RETRIES)
+from monitoring.metrics import LLM_ERRORS_TOTAL
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """GigaChat временно недоступен: предохранитель разомкнут, запросы не отправляются."""
+
+
+class CircuitBreaker:
+    """Предохранитель: после `failure_threshold` неудачных вызовов подряд запросы
+    отклоняются сразу в течение `reset_timeout` секунд, затем пропускается один пробный.
+
+    Args:
+        failure_threshold (int): Число неудач подряд для размыкания.
+        reset_timeout (float): Через сколько секунд разрешить пробный запрос.
+    """
+
+    def __init__(self, failure_threshold: int = GIGACHAT_BREAKER_THRESHOLD, reset_timeout: float = GIGACHAT_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """Состояние предохранителя: 'closed', 'open' или 'half_open'."""
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """Проверяет, можно ли отправить запрос."""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def release(self):
+        """Освобождает пробный запрос, не учитывая его результат (вызов был отменён)."""
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self._trial_in_flight:
+                logger.warning(f'GigaChat недоступен, предохранитель разомкнут на {self.reset_timeout} с')
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+class GigaChatClient:
+    """Отказоустойчивый клиент GigaChat.
+
+    - ограничивает время каждого вызова (`deadline`);
+    - повторяет запрос с экспоненциальной задержкой и джиттером при 429/5xx и сетевых
+      ошибках, учитывая заголовок Retry-After;
+    - при 401 обновляет токен и повторяет запрос;
+    - при `hedge=True` отправляет второй запрос, если первый выполняется дольше p95
+      недавних ответов (но не раньше `hedge_min_delay`), и берёт первый успешный;
+    - при серии неудач размыкает предохранитель и сразу выбрасывает `CircuitOpenError`.
+      Некорректный или пустой ответ считается неудачей: успех учитывается только после проверки ответа.
+
+    У каждого потребителя (ответы пользователям, обработка страниц при парсинге) свой клиент
+    и свой предохранитель, чтобы сбои одного не отключали GigaChat для другого.
+
+    Args:
+        tokens (TokenManager): Менеджер токенов доступа.
+        deadline (float): Максимальная длительность вызова в секундах.
+        retries (int): Максимальное число попыток.
+        backoff (float): Базовая задержка между попытками в секундах.
+        hedge (bool): Отправлять ли дублирующий запрос при медленном ответе.
+        hedge_min_delay (float): Минимальная задержка перед дублирующим запросом в секундах.
+        breaker (CircuitBreaker | None): Предохранитель. По умолчанию создаётся новый.
+    """
+
+    def __init__(self,
+                 tokens: TokenManager = token_manager,
+                 deadline: float = GIGACHAT_DEADLINE,
+                 retries: int = GIGACHAT_RETRIES,
+                 backoff: float = GIGACHAT_BACKOFF,
+                 hedge: bool = GIGACHAT_HEDGE,
+                 hedge_min_delay: float = GIGACHAT_HEDGE_MIN_DELAY,
+                 breaker: CircuitBreaker | None = None):
+        self.tokens = tokens
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = deque(maxlen=200)
+
+    def _hedge_delay(self) -> float | None:
+        if not self.hedge or len(self.latencies) < 20:
+            return None
+        ordered = sorted(self.latencies)
+        return max(self.hedge_min_delay, ordered[int(len(ordered) * 0.95) - 1])
+
+    def _retry_delay(self, attempt: int, ex: Exception) -> float:
+        retry_after = getattr(ex, 'retry_after', None)
+        if retry_after is not None:
+            return retry_after
+        return self.backoff * 2 ** (attempt - 1) * (0.5 + random.random())
+
+    async def _call_with_retries(self, call: Callable[[str], Awaitable]):
+        """Выполняет `call(token)` с повторами. 401 приводит к обновлению токена.
+
+        `call` сам проверяет ответ и выбрасывает `GigaChatResponseError`, если он некорректен:
+        такой ответ не повторяется, но учитывается предохранителем как неудача.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError('GigaChat временно недоступен')
+        for attempt in range(1, self.retries + 1):
+            token = None
+            try:
+                token = await self.tokens.get()
+                result = await call(token)
+                self.breaker.record_success()
+                return result
+            except GigaChatResponseError:
+                self.breaker.record_failure()
+                raise
+            except GigaChatError as ex:
+                if ex.status == 401:
+                    logger.info('Токен GigaChat отклонён, обновление')
+                    await self._refresh_token(token)
+                    if attempt < self.retries:
+                        continue
+                elif ex.status not in RETRYABLE_STATUSES:
+                    self.breaker.record_success()
+                    raise
+                error = ex
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                error = ex
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Отмена (дедлайн, проигравший дублирующий запрос, остановка) — не сбой GigaChat
+                self.breaker.release()
+                raise
+            if attempt == self.retries:
+                break
+            delay = self._retry_delay(attempt, error)
+            logger.warning(f'Ошибка GigaChat ({error!r}), попытка {attempt}/{self.retries}, повтор через {delay:.1f} с')
+            LLM_ERRORS_TOTAL.inc(operation='retry')
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:
+                self.breaker.release()
+                raise
+        self.breaker.record_failure()
+        raise error
+
+    async def _refresh_token(self, token: str | None):
+        # Обновление выполняется вне обработчиков попытки: его исход тоже должен попасть в предохранитель,
+        # иначе пробный запрос полуоткрытого предохранителя остался бы занятым навсегда
+        try:
+            await self.tokens.refresh(stale=token)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+
+    async def _hedged_answer(self, prompt: str, token: str) -> str:
+        started = time.perf_counter()
+        delay = self._hedge_delay()
+        first = asyncio.ensure_future(get_answer(prompt, token))
+        tasks = {first}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    logger.debug(f'GigaChat отвечает дольше {delay:.1f} с, отправлен дублирующий запрос')
+                    tasks.add(asyncio.ensure_future(get_answer(prompt, token)))
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.latencies.append(time.perf_counter() - started)
+                        return task.result()
+                if not tasks:
+                    raise next(iter(done)).exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def complete(self, prompt: str) -> str:
+        """Генерирует ответ на промпт.
+
+        Args:
+            prompt (str): Текст промпта.
+
+        Returns:
+            str: Ответ модели.
+
+        Raises:
+            CircuitOpenError: Если предохранитель разомкнут.
+            GigaChatError: Если все попытки завершились ошибкой API или ответ некорректен либо пуст.
+            asyncio.TimeoutError: Если превышено время `deadline`.
+        """
+        async def answer(token: str) -> str:
+            result = await self._hedged_answer(prompt, token)
+            if not result or not result.strip():
+                raise GigaChatResponseError('Пустой ответ')
+            return result
+
+        return await asyncio.wait_for(self._call_with_retries(answer), self.deadline)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Генерирует ответ на промпт потоково.
+
+        Повторы выполняются только до получения первого фрагмента; `deadline`
+        ограничивает время до первого фрагмента. Ошибка после первого фрагмента
+        тоже учитывается предохранителем.
+
+        Args:
+            prompt (str): Текст промпта.
+
+        Yields:
+            str: Очередной фрагмент ответа.
+        """
+        async def first_chunk(token: str):
+            stream = stream_answer(prompt, token)
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                raise GigaChatResponseError('Пустой потоковый ответ') from None
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        stream, delta = await asyncio.wait_for(self._call_with_retries(first_chunk), self.deadline)
+        try:
+            while delta is not None:
+                yield delta
+                try:
+                    delta = await stream.__anext__()
+                except StopAsyncIteration:
+                    delta = None
+                except Exception:
+                    self.breaker.record_failure()
+                    raise
+        finally:
+            await stream.aclose()
+
+
+# Ответы пользователям и обработка страниц при парсинге — разные клиенты с разными предохранителями.
+# Парсер повторяет страницу целиком (`parse_with_retry`), каждый раз через ограничитель частоты,
+# поэтому его клиент не повторяет и не дублирует запросы сам
+gigachat_client = GigaChatClient()
+parser_gigachat_client = GigaChatClient(retries=1, hedge=False)
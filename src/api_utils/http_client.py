@@ -0,0 +1,80 @@
+import aiohttp
+
+from config import (HTTP_CONNECT_TIMEOUT, HTTP_DNS_CACHE_TTL, HTTP_KEEPALIVE_TIMEOUT, HTTP_POOL_LIMIT,
+                    HTTP_POOL_LIMIT_PER_HOST, HTTP_TOTAL_TIMEOUT)
+
+
+class HttpClient:
+    """Долгоживущий HTTP-клиент процесса с пулом соединений для всех исходящих запросов.
+
+    Сессия открывается при старте бота/CLI и закрывается при завершении работы.
+    Если сессия ещё не открыта, она создаётся лениво при первом обращении.
+
+    Args:
+        limit (int): Общее число одновременных соединений в пуле.
+        limit_per_host (int): Число одновременных соединений с одним хостом.
+        keepalive_timeout (float): Сколько секунд держать простаивающее соединение открытым.
+        dns_cache_ttl (int): Время жизни записей DNS-кэша в секундах.
+        total_timeout (float): Общий таймаут запроса в секундах.
+        connect_timeout (float): Таймаут установки соединения в секундах.
+    """
+
+    def __init__(self,
+                 limit: int = HTTP_POOL_LIMIT,
+                 limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+                 dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+                 total_timeout: float = HTTP_TOTAL_TIMEOUT,
+                 connect_timeout: float = HTTP_CONNECT_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.total_timeout = total_timeout
+        self.connect_timeout = connect_timeout
+        self._session: aiohttp.ClientSession | None = None
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        timeout = aiohttp.ClientTimeout(total=self.total_timeout, connect=self.connect_timeout)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Текущая сессия aiohttp. Создаётся при первом обращении."""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+
+    def set_session(self, session: aiohttp.ClientSession | None):
+        """Подменяет сессию, например, на клиента локального тестового сервера.
+
+        Args:
+            session (aiohttp.ClientSession | None): Новая сессия или None для сброса.
+        """
+        self._session = session
+
+    async def start(self):
+        """Открывает сессию с пулом соединений."""
+        _ = self.session
+
+    async def close(self):
+        """Закрывает сессию и все соединения пула."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> "HttpClient":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+http_client = HttpClient()
@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Ограничивает частоту операций: не более `rate` запусков в секунду.
+
+    Args:
+        rate (float): Допустимое число операций в секунду. Значение <= 0 отключает ограничение.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Ожидает, пока не освободится очередной слот."""
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __aenter__(self) -> "RateLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+from loguru import logger
+
+from api_utils.gigachat_api_utils import fetch_token
+from config import GIGACHAT_CLIENT_SECRET, TOKEN_REFRESH_MARGIN
+from monitoring.metrics import span
+
+
+class TokenManager:
+    """Хранит OAuth-токен GigaChat и обновляет его незадолго до истечения срока действия.
+
+    Одновременные запросы устаревшего токена порождают только один запрос к OAuth
+    (single-flight): остальные вызывающие ожидают его результата.
+
+    Args:
+        client_secret (str): Секретный ключ для авторизации.
+        refresh_margin (float): За сколько секунд до `expires_at` токен считается устаревшим.
+    """
+
+    def __init__(self, client_secret: str, refresh_margin: float = TOKEN_REFRESH_MARGIN):
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.access_token: str | None = None
+        self.expires_at: float = 0.0
+        self._refresh_task: asyncio.Task | None = None
+        self._background_task: asyncio.Task | None = None
+
+    def is_fresh(self) -> bool:
+        """Проверяет, что токен есть и не истекает в ближайшие `refresh_margin` секунд."""
+        return self.access_token is not None and time.time() < self.expires_at - self.refresh_margin
+
+    async def get(self) -> str:
+        """Возвращает действующий токен доступа, при необходимости обновляя его.
+
+        Returns:
+            str: Строка с access_token.
+        """
+        if self.is_fresh():
+            return self.access_token
+        return await self.refresh()
+
+    async def refresh(self, stale: str | None = None) -> str:
+        """Обновляет токен. Если обновление уже выполняется, дожидается его результата.
+
+        Args:
+            stale (str | None): Токен, отклонённый сервером. Если он уже заменён новым,
+                повторное обновление не выполняется.
+
+        Returns:
+            str: Новый access_token.
+        """
+        if stale is not None and self.access_token != stale and self.is_fresh():
+            return self.access_token
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch())
+        return await asyncio.shield(self._refresh_task)
+
+    async def _fetch(self) -> str:
+        with span('token_fetch'):
+            response = await fetch_token(self.client_secret)
+        self.access_token = response['access_token']
+        # GigaChat возвращает expires_at в миллисекундах
+        self.expires_at = response['expires_at'] / 1000
+        logger.info(f"Получен токен GigaChat, действителен ещё {self.expires_at - time.time():.0f} с")
+        return self.access_token
+
+    async def _background_refresh(self):
+        while True:
+            delay = self.expires_at - self.refresh_margin - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except Exception as ex:
+                logger.error(f"Ошибка обновления токена GigaChat: {ex}")
+                await asyncio.sleep(self.refresh_margin / 4)
+
+    def start(self):
+        """Запускает фоновое обновление токена в текущем цикле событий."""
+        if self._background_task is None or self._background_task.done():
+            self._background_task = asyncio.create_task(self._background_refresh())
+
+    async def close(self):
+        """Останавливает фоновое обновление токена."""
+        for task in (self._background_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+        self._background_task = None
+        self._refresh_task = None
+
+
+token_manager = TokenManager(GIGACHAT_CLIENT_SECRET)
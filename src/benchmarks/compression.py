@@ -0,0 +1,100 @@
+"""Компактные коды векторов: качество поиска против памяти и задержки.
+
+Для каждой комбинации обрезки размерности (Matryoshka), квантования (none/int8/binary)
+и коэффициента пересчёта считает recall@k по размеченным вопросам (`benchmarks/queries.jsonl`),
+совпадение top-k с точным поиском по полным векторам, объём кодов в памяти и задержку поиска.
+Запуск из корня репозитория:
+
+    PYTHONPATH=src python -m benchmarks.compression --dims 0 512 256 128 --rescore 1 4 --output compression.json
+"""
+import argparse
+import itertools
+
+from benchmarks.rag import load_queries
+from benchmarks.utils import Timer, default_corpus_path, latency_stats, load_chunks, write_report
+from vec_db.embeddings import load_embeddings
+from vec_db.manifest import chunk_ids
+from vec_db.numpy_store import NumpyVectorStore
+from vec_db.quantization import QUANTIZATIONS, CompressedCodes
+
+
+def search_all(store: NumpyVectorStore, vectors: list, k: int, batch_size: int) -> tuple[list, list, float]:
+    results, latencies = [], []
+    for vector in vectors:
+        with Timer() as timer:
+            results.append(store.similarity_search_by_vectors([vector], k)[0])
+        latencies.append(timer.elapsed)
+    with Timer() as batched:
+        for start in range(0, len(vectors), batch_size):
+            store.similarity_search_by_vectors(vectors[start:start + batch_size], k)
+    return results, latencies, len(vectors) / batched.elapsed
+
+
+def evaluate(results: list, exact: list, queries: list, k_values: list) -> dict:
+    report = {}
+    for k in k_values:
+        recall, overlap = [], []
+        for docs, exact_docs, item in zip(results, exact, queries):
+            relevant = set(item['relevant_sources'])
+            recall.append(len(relevant & {doc.metadata.get('source') for doc, _ in docs[:k]}) / len(relevant))
+            exact_ids = {doc.id for doc, _ in exact_docs[:k]}
+            overlap.append(len(exact_ids & {doc.id for doc, _ in docs[:k]}) / len(exact_ids))
+        report[f'recall@{k}'] = sum(recall) / len(recall)
+        report[f'overlap@{k}'] = sum(overlap) / len(overlap)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=default_corpus_path(), help='Корпус документов')
+    parser.add_argument('--dims', type=int, nargs='+', default=[0, 512, 256, 128], help='0 — без обрезки')
+    parser.add_argument('--quantization', nargs='+', default=list(QUANTIZATIONS), choices=QUANTIZATIONS)
+    parser.add_argument('--rescore', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.data)
+    queries = load_queries()
+    embeddings = load_embeddings()
+    store = NumpyVectorStore.from_texts([chunk.page_content for chunk in chunks], embeddings,
+                                        [chunk.metadata for chunk in chunks], ids=chunk_ids(chunks))
+    vectors = embeddings.embed_documents([item['query'] for item in queries])
+    max_k = max(args.k)
+
+    exact, latencies, batched_qps = search_all(store, vectors, max_k, args.batch_size)
+    report = {
+        'chunks': len(chunks),
+        'queries': len(queries),
+        'dimensions': store.matrix.shape[1],
+        'exact': {
+            'memory_mb': store.matrix.nbytes / 2 ** 20,
+            **evaluate(exact, exact, queries, args.k),
+            'latency': latency_stats(latencies),
+            'batched_qps': batched_qps,
+        },
+        'compressed': [],
+    }
+    for dims, quantization, rescore in itertools.product(args.dims, args.quantization, args.rescore):
+        if not dims and quantization == 'none':
+            continue
+        store.compressed = CompressedCodes(dims or None, quantization)
+        store.rescore = rescore
+        with Timer() as fit_timer:
+            store.compressed.fit(store.matrix)
+        results, latencies, batched_qps = search_all(store, vectors, max_k, args.batch_size)
+        report['compressed'].append({
+            'setting': store.compressed.name,
+            'rescore': rescore,
+            'memory_mb': store.compressed.nbytes / 2 ** 20,
+            'fit_s': fit_timer.elapsed,
+            **evaluate(results, exact, queries, args.k),
+            'latency': latency_stats(latencies),
+            'batched_qps': batched_qps,
+        })
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Проверка и сравнение бэкендов разбора HTML (html5lib, lxml, selectolax).
+
+Текст, извлечённый каждым бэкендом из сохранённых страниц, сравнивается с эталонным
+результатом html5lib; также измеряется скорость в страницах в секунду. По умолчанию
+фикстурами служат страницы из `benchmarks/fixtures/pages`; можно указать кэш парсера
+(`--fixtures page_cache`) или любую другую директорию с .html-файлами.
+Запуск из корня репозитория:
+
+    PYTHONPATH=src python -m benchmarks.extraction --backends lxml selectolax --min-similarity 0.98
+"""
+import argparse
+import difflib
+import os
+import sys
+
+from benchmarks.utils import Timer, write_report
+from parser.extract import extract_text
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'pages')
+
+
+def load_fixtures(path: str) -> list[str]:
+    files = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.html'))
+    pages = []
+    for file in files:
+        with open(file, 'r', encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+
+def similarity(reference: str, text: str) -> float:
+    return difflib.SequenceMatcher(None, reference.split(), text.split(), autojunk=False).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Директория с сохранёнными HTML-страницами')
+    parser.add_argument('--backends', nargs='+', default=['lxml', 'selectolax'])
+    parser.add_argument('--min-similarity', type=float, default=0.98)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures)
+    if not pages:
+        raise FileNotFoundError(f'В {args.fixtures} нет .html-файлов')
+
+    report = {'pages': len(pages), 'backends': {}}
+    passed = True
+    for backend in ['html5lib'] + args.backends:
+        with Timer() as timer:
+            for _ in range(args.repeat):
+                texts = [extract_text(page, backend) for page in pages]
+        result = {'pages_per_second': len(pages) * args.repeat / timer.elapsed}
+        if backend == 'html5lib':
+            reference = texts
+        else:
+            scores = [similarity(ref, text) for ref, text in zip(reference, texts)]
+            result.update(min_similarity=min(scores), mean_similarity=sum(scores) / len(scores),
+                          passed=min(scores) >= args.min_similarity)
+            passed = passed and result['passed']
+        report['backends'][backend] = result
+
+    write_report(report, args.output)
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Локальная заглушка GigaChat API для бенчмарков и тестов без сети.
+
+Реализует OAuth (`POST /api/v2/oauth`) и генерацию ответа (`POST /api/v1/chat/completions`)
+в обычном и потоковом (SSE) режимах с настраиваемой задержкой. Для проверки отказоустойчивости
+клиента можно задать последовательность кодов ответа (`failures`), заголовок Retry-After
+и долю медленных ответов. Запуск из корня репозитория:
+
+    PYTHONPATH=src python -m benchmarks.mock_gigachat --port 8089 --latency 0.5
+    PYTHONPATH=src python -m benchmarks.mock_gigachat --failures 503,429,200 --retry-after 1
+
+После этого укажите GIGACHAT_AUTH_URL=http://127.0.0.1:8089/api/v2/oauth и
+GIGACHAT_API_URL=http://127.0.0.1:8089/api/v1.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from collections import deque
+from typing import List
+
+from aiohttp import web
+
+ANSWER = ("Мы разработали для клиента решение на основе машинного обучения [1]. "
+          "Наша команда внедрила его в production и сопровождает проект [1].")
+
+
+class MockGigaChat:
+    """Заглушка GigaChat API.
+
+    Args:
+        latency (float): Задержка ответа на запрос генерации в секундах (до первого токена при потоковой выдаче).
+        token_latency (float): Задержка между фрагментами потокового ответа в секундах.
+        token_ttl (float): Время жизни выдаваемого токена в секундах.
+        answer (str): Текст ответа модели.
+        failures (List[int] | None): Коды ответа для очередных запросов генерации (200 — обычный ответ).
+            После исчерпания списка запросы обрабатываются штатно.
+        retry_after (float | None): Значение заголовка Retry-After для ответов с ошибкой.
+        slow_rate (float): Доля запросов, отвечающих с задержкой `slow_latency`.
+        slow_latency (float): Задержка медленного ответа в секундах.
+        malformed (int): Сколько очередных успешных ответов вернуть без поля `choices`.
+    """
+
+    def __init__(self,
+                 latency: float = 0.5,
+                 token_latency: float = 0.02,
+                 token_ttl: float = 1800,
+                 answer: str = ANSWER,
+                 failures: List[int] | None = None,
+                 retry_after: float | None = None,
+                 slow_rate: float = 0.0,
+                 slow_latency: float = 10.0,
+                 malformed: int = 0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.token_ttl = token_ttl
+        self.answer = answer
+        self.failures = deque(failures or [])
+        self.retry_after = retry_after
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.malformed = malformed
+        self.oauth_requests = 0
+        self.completion_requests = 0
+        self.tokens: set[str] = set()
+
+    def app(self) -> web.Application:
+        """Создаёт aiohttp-приложение заглушки."""
+        app = web.Application()
+        app.router.add_post('/api/v2/oauth', self.oauth)
+        app.router.add_post('/api/v1/chat/completions', self.completions)
+        return app
+
+    async def oauth(self, request: web.Request) -> web.Response:
+        self.oauth_requests += 1
+        token = uuid.uuid4().hex
+        self.tokens.add(token)
+        return web.json_response({'access_token': token, 'expires_at': int((time.time() + self.token_ttl) * 1000)})
+
+    async def completions(self, request: web.Request) -> web.StreamResponse:
+        self.completion_requests += 1
+        if request.headers.get('Authorization', '').removeprefix('Bearer ') not in self.tokens:
+            return web.json_response({'status': 401, 'message': 'Token has expired'}, status=401)
+        payload = json.loads(await request.text())
+        status = self.failures.popleft() if self.failures else 200
+        if status != 200:
+            headers = {'Retry-After': str(self.retry_after)} if self.retry_after is not None else None
+            return web.json_response({'status': status, 'message': 'Injected failure'}, status=status, headers=headers)
+        slow = random.random() < self.slow_rate
+        await asyncio.sleep(self.slow_latency if slow else self.latency)
+        if self.malformed:
+            self.malformed -= 1
+            return web.json_response({'model': payload.get('model')})
+
+        if not payload.get('stream'):
+            return web.json_response({
+                'choices': [{'message': {'role': 'assistant', 'content': self.answer}, 'index': 0,
+                             'finish_reason': 'stop'}],
+                'model': payload.get('model'),
+            })
+
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        for word in self.answer.split(' '):
+            chunk = {'choices': [{'delta': {'content': word + ' '}, 'index': 0}]}
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+            await asyncio.sleep(self.token_latency)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def revoke_tokens(self):
+        """Отзывает выданные токены: следующие запросы с ними получат 401."""
+        self.tokens.clear()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Запускает заглушку в текущем цикле событий.
+
+        Args:
+            host (str): Адрес.
+            port (int): Порт; 0 — выбрать свободный.
+
+        Returns:
+            str: Базовый URL запущенного сервера.
+        """
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f'http://{host}:{port}'
+
+    async def stop(self):
+        """Останавливает заглушку."""
+        await self._runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--token-latency', type=float, default=0.02)
+    parser.add_argument('--failures', default='', help='Коды ответа через запятую, например 503,429,200')
+    parser.add_argument('--retry-after', type=float, default=None)
+    parser.add_argument('--slow-rate', type=float, default=0.0)
+    parser.add_argument('--slow-latency', type=float, default=10.0)
+    args = parser.parse_args()
+    failures = [int(code) for code in args.failures.split(',') if code]
+    mock = MockGigaChat(args.latency, args.token_latency, failures=failures, retry_after=args.retry_after,
+                        slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    web.run_app(mock.app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Локальная заглушка Telegram Bot API для проверки бота без сети.
+
+Отвечает на вызовы `/bot<token>/<method>`, которые делает aiogram (getMe, sendMessage,
+editMessageText, deleteMessage, setWebhook, deleteWebhook), и запоминает их, чтобы по журналу
+можно было проверить, какие сообщения отправил бот. Вместе с `benchmarks.replay_updates`
+позволяет прогнать вебхук-режим целиком. Запуск из корня репозитория:
+
+    PYTHONPATH=src python -m benchmarks.mock_telegram --port 8081
+
+После этого укажите BOT_API_URL=http://127.0.0.1:8081.
+"""
+import argparse
+import itertools
+import json
+import time
+
+from aiohttp import web
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'RAG bot', 'username': 'rag_bot'}
+
+
+class MockTelegram:
+    """Заглушка Telegram Bot API.
+
+    Args:
+        log_path (str | None): Файл, в который дописываются вызовы в формате JSONL.
+    """
+
+    def __init__(self, log_path: str | None = None):
+        self.log_path = log_path
+        self.calls: list[dict] = []
+        self._message_ids = itertools.count(1)
+
+    def app(self) -> web.Application:
+        """Создаёт aiohttp-приложение заглушки."""
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        return app
+
+    def _message(self, params: dict, message_id: int | None = None) -> dict:
+        chat_id = int(params.get('chat_id', 0))
+        return {'message_id': message_id or next(self._message_ids), 'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'}, 'from': BOT_USER, 'text': params.get('text', '')}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        params = dict(await request.post())
+        call = {'method': method, 'params': params, 'time': time.time()}
+        self.calls.append(call)
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(call, ensure_ascii=False) + '\n')
+
+        match method.lower():
+            case 'getme':
+                result = BOT_USER
+            case 'sendmessage':
+                result = self._message(params)
+            case 'editmessagetext':
+                result = self._message(params, int(params.get('message_id', 0)))
+            case 'deletemessage' | 'setwebhook' | 'deletewebhook' | 'sendchataction':
+                result = True
+            case _:
+                return web.json_response({'ok': False, 'error_code': 404,
+                                          'description': f'Not Found: method {method}'}, status=404)
+        return web.json_response({'ok': True, 'result': result})
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Запускает заглушку в текущем цикле событий.
+
+        Args:
+            host (str): Адрес.
+            port (int): Порт; 0 — выбрать свободный.
+
+        Returns:
+            str: Базовый URL запущенного сервера (значение для BOT_API_URL).
+        """
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f'http://{host}:{port}'
+
+    async def stop(self):
+        """Останавливает заглушку."""
+        await self._runner.cleanup()
+
+    def sent(self, method: str = 'sendMessage') -> list[dict]:
+        """Возвращает параметры вызовов заданного метода."""
+        return [call['params'] for call in self.calls if call['method'] == method]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--log', default=None, help='Файл журнала вызовов (JSONL)')
+    args = parser.parse_args()
+    web.run_app(MockTelegram(args.log).app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
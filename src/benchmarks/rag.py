@@ -0,0 +1,181 @@
+"""Офлайн-бенчмарк RAG: качество и скорость поиска, сквозная задержка ответа на заглушке GigaChat.
+
+Прогоняет размеченный набор вопросов (`benchmarks/queries.jsonl`) по индексу из корпуса `data.jsonl`
+(если его нет — из `data.json`) и выводит отчёт в JSON, который можно сравнивать между коммитами.
+Сеть не используется. Запуск из корня репозитория:
+
+    PYTHONPATH=src python -m benchmarks.rag --concurrency 1 4 16 --llm-latency 0.5 --output rag.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+import time
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from loguru import logger
+
+import api_utils.gigachat_api_utils as gigachat_api_utils
+from api_utils.http_client import http_client
+from benchmarks.mock_gigachat import MockGigaChat
+from benchmarks.utils import Timer, default_corpus_path, latency_stats, load_chunks, write_report
+from config import COLLECTION_NAME
+from rag.pipeline import RagPipeline
+from rag.prompts import BOT_PROMPT_TEMPLATE
+from vec_db.manifest import chunk_ids
+from vec_db.retriever import AsyncRetriever
+from vec_db.vec_db import connect_to_vecdb
+
+QUERIES_PATH = os.path.join(os.path.dirname(__file__), 'queries.jsonl')
+
+
+def load_queries(path: str = QUERIES_PATH) -> List[dict]:
+    """Загружает размеченные вопросы: {'query': str, 'relevant_sources': List[str]}."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_index(index_dir: str, chunks: List[Document]) -> VectorStore:
+    """Строит индекс из чанков корпуса во временной директории, не трогая рабочий индекс и корпус."""
+    db = connect_to_vecdb(index_dir, COLLECTION_NAME)
+    db.add_texts(texts=[chunk.page_content for chunk in chunks], metadatas=[chunk.metadata for chunk in chunks],
+                 ids=chunk_ids(chunks))
+    return db
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_concurrently(func, items: list, concurrency: int) -> tuple[list, float]:
+    """Выполняет корутину `func` для всех элементов, не более `concurrency` одновременно (в одном цикле событий).
+
+    Returns:
+        tuple[list, float]: Задержки каждого вызова и общее время выполнения.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def call(item):
+        async with semaphore:
+            started = time.perf_counter()
+            await func(item)
+            latencies.append(time.perf_counter() - started)
+
+    with Timer() as timer:
+        await asyncio.gather(*(call(item) for item in items))
+    return latencies, timer.elapsed
+
+
+async def bench_retrieval(retriever: AsyncRetriever, queries: List[dict], k_values: List[int],
+                          concurrency: List[int]) -> dict:
+    max_k = max(k_values)
+    recall = {k: [] for k in k_values}
+    reciprocal_ranks = []
+    latencies = []
+    for item in queries:
+        with Timer() as timer:
+            docs = await retriever.search(item['query'], k=max_k)
+        latencies.append(timer.elapsed)
+        sources = [doc.metadata.get('source') for doc, _ in docs]
+        relevant = set(item['relevant_sources'])
+        for k in k_values:
+            recall[k].append(len(relevant & set(sources[:k])) / len(relevant))
+        rank = next((i for i, source in enumerate(sources, 1) if source in relevant), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    report = {
+        **{f'recall@{k}': sum(values) / len(values) for k, values in recall.items()},
+        f'mrr@{max_k}': sum(reciprocal_ranks) / len(reciprocal_ranks),
+        'latency': latency_stats(latencies),
+        'concurrency': {},
+    }
+    for level in concurrency:
+        level_latencies, elapsed = await run_concurrently(
+            lambda item: retriever.search(item['query'], k=5), queries, level
+        )
+        report['concurrency'][level] = {'qps': len(queries) / elapsed, 'latency': latency_stats(level_latencies)}
+    return report
+
+
+async def bench_answers(pipeline: RagPipeline, queries: List[dict], concurrency: List[int]) -> dict:
+    report = {}
+    for level in concurrency:
+        latencies, elapsed = await run_concurrently(lambda item: pipeline.answer(item['query']), queries, level)
+        first_tokens = []
+
+        async def stream(item):
+            # Поток дочитывается до конца: генерация продолжается и без подписчика (`SingleFlight`)
+            # и иначе нагружала бы заглушку во время замеров следующего уровня конкурентности
+            started = time.perf_counter()
+            first_token = None
+            async for _ in pipeline.stream(item['query']):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+            if first_token is not None:
+                first_tokens.append(first_token)
+
+        await run_concurrently(stream, queries, level)
+        report[level] = {
+            'qps': len(queries) / elapsed,
+            'latency': latency_stats(latencies),
+            'time_to_first_token': latency_stats(first_tokens),
+        }
+    return report
+
+
+async def main(args: argparse.Namespace):
+    if not os.path.exists(args.data):
+        raise FileNotFoundError(f'Корпус {args.data} не найден: бенчмарк не парсит страницы из сети')
+    queries = load_queries(args.queries)
+    mock = MockGigaChat(latency=args.llm_latency, token_latency=args.token_latency)
+    base_url = await mock.start()
+    gigachat_api_utils.GIGACHAT_AUTH_URL = f'{base_url}/api/v2/oauth'
+    gigachat_api_utils.GIGACHAT_API_URL = f'{base_url}/api/v1'
+
+    report = {'commit': git_commit(), 'queries': len(queries), 'llm_latency_s': args.llm_latency}
+    try:
+        async with http_client:
+            with tempfile.TemporaryDirectory() as index_dir:
+                chunks = load_chunks(args.data)
+                with Timer() as timer:
+                    db = await asyncio.to_thread(build_index, index_dir, chunks)
+                report['index_build_s'] = timer.elapsed
+                unknown = sorted({source for item in queries for source in item['relevant_sources']}
+                                 - {chunk.metadata['source'] for chunk in chunks})
+                if unknown:
+                    logger.warning(f'Источников из разметки нет в индексе, recall занижен: {unknown}')
+                retriever = AsyncRetriever(db)
+                try:
+                    report['retrieval'] = await bench_retrieval(retriever, queries, args.k, args.concurrency)
+                    pipeline = RagPipeline(retriever, BOT_PROMPT_TEMPLATE)
+                    report['answer'] = await bench_answers(pipeline, queries, args.concurrency)
+                finally:
+                    retriever.close()
+    finally:
+        await mock.stop()
+    report['mock_gigachat'] = {'oauth_requests': mock.oauth_requests, 'completion_requests': mock.completion_requests}
+    write_report(report, args.output)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', default=QUERIES_PATH, help='Размеченные вопросы в формате JSONL')
+    parser.add_argument('--data', default=default_corpus_path(), help='Корпус документов')
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--token-latency', type=float, default=0.02)
+    parser.add_argument('--output')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,80 @@
+"""Воспроизводит записанные обновления Telegram на вебхук бота.
+
+Каждая строка входного файла — JSON-объект Update. Обновления отправляются POST-запросами
+с заголовком X-Telegram-Bot-Api-Secret-Token, как это делает Telegram; скрипт печатает коды
+ответа и задержку приёма. Запуск из корня репозитория (бот в режиме BOT_MODE=webhook):
+
+    PYTHONPATH=src python -m benchmarks.replay_updates --url http://127.0.0.1:8080/webhook
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+
+from benchmarks.utils import latency_stats, write_report
+from config import WEBHOOK_SECRET
+
+UPDATES_PATH = os.path.join(os.path.dirname(__file__), 'updates.jsonl')
+
+
+def load_updates(path: str) -> list[dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def replay(url: str, updates: list[dict], secret: str = WEBHOOK_SECRET, concurrency: int = 1,
+                 delay: float = 0.0) -> dict:
+    """Отправляет обновления на вебхук.
+
+    Args:
+        url (str): Адрес вебхука.
+        updates (list[dict]): Обновления Telegram.
+        secret (str): Секрет вебхука; пустая строка — не передавать заголовок.
+        concurrency (int): Число одновременных запросов.
+        delay (float): Пауза между отправками в секундах.
+
+    Returns:
+        dict: Число ответов по кодам и перцентили задержки приёма.
+    """
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses: dict[int, int] = {}
+    latencies = []
+
+    async def send(session: aiohttp.ClientSession, update: dict):
+        async with semaphore:
+            start = time.perf_counter()
+            async with session.post(url, json=update, headers=headers) as response:
+                await response.read()
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    async with aiohttp.ClientSession() as session:
+        tasks = []
+        for update in updates:
+            tasks.append(asyncio.create_task(send(session, update)))
+            if delay:
+                await asyncio.sleep(delay)
+        await asyncio.gather(*tasks)
+
+    return {'updates': len(updates), 'statuses': statuses, **latency_stats(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8080/webhook')
+    parser.add_argument('--updates', default=UPDATES_PATH)
+    parser.add_argument('--secret', default=WEBHOOK_SECRET)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+    report = asyncio.run(replay(args.url, load_updates(args.updates), args.secret, args.concurrency, args.delay))
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import json
+import os
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+
+from config import CORPUS_PATH, JSON_PATH
+from vec_db.corpus import CorpusStore
+from vec_db.utils import chunks_from_md, dicts_to_documents
+
+
+def default_corpus_path() -> str:
+    """Корпус по умолчанию: `data.jsonl`, а если его ещё нет (свежий клон) — `data.json` из репозитория."""
+    return CORPUS_PATH if os.path.exists(CORPUS_PATH) else JSON_PATH
+
+
+def load_chunks(corpus_path: str) -> List[Document]:
+    """Загружает чанки корпуса из JSONL-корпуса (`data.jsonl`) или JSON-файла прежнего формата.
+
+    Args:
+        corpus_path (str): Путь к корпусу.
+
+    Returns:
+        List[Document]: Чанки, как их индексирует `initialize_db`.
+    """
+    if corpus_path.endswith('.jsonl'):
+        return chunks_from_md(dicts_to_documents(list(CorpusStore(corpus_path).iter_documents())))
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        return chunks_from_md(dicts_to_documents(json.load(f)))
+
+
+def rss_mb() -> float:
+    """Текущий объём резидентной памяти процесса в МБ (Linux), иначе пиковый."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def latency_stats(latencies: List[float]) -> dict:
+    """Считает перцентили задержки.
+
+    Args:
+        latencies (List[float]): Задержки в секундах.
+
+    Returns:
+        dict: p50/p95/p99 и среднее в миллисекундах.
+    """
+    ms = np.asarray(latencies) * 1000
+    return {
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'mean_ms': float(ms.mean()),
+    }
+
+
+class Timer:
+    """Контекстный менеджер для замера времени выполнения блока."""
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def write_report(report: dict, output: str | None):
+    """Печатает отчёт в формате JSON и при необходимости сохраняет его в файл.
+
+    Args:
+        report (dict): Результаты бенчмарка.
+        output (str | None): Путь к файлу отчёта.
+    """
+    text = json.dumps(report, ensure_ascii=False, indent=4)
+    print(text)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
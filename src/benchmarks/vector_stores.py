@@ -0,0 +1,86 @@
+"""Сравнение бэкендов векторного хранилища (Chroma и NumPy) по задержке поиска и памяти.
+
+Запуск из корня репозитория:
+
+    PYTHONPATH=src python -m benchmarks.vector_stores --queries 200 --output vector_stores.json
+"""
+import argparse
+import gc
+import random
+import tempfile
+
+from langchain_chroma import Chroma
+
+from benchmarks.utils import Timer, default_corpus_path, latency_stats, load_chunks, rss_mb, write_report
+from config import COLLECTION_NAME
+from vec_db.embeddings import load_embeddings
+from vec_db.manifest import chunk_ids
+from vec_db.numpy_store import NumpyVectorStore
+
+
+def bench_store(build, connect, vectors, k, batch_size):
+    with Timer() as build_timer:
+        build()
+    gc.collect()
+    memory_before = rss_mb()
+    with Timer() as load_timer:
+        store = connect()
+    memory_after = rss_mb()
+
+    latencies = []
+    for vector in vectors:
+        with Timer() as timer:
+            store.similarity_search_by_vector_with_relevance_scores(vector, k)
+        latencies.append(timer.elapsed)
+
+    report = {
+        'build_s': build_timer.elapsed,
+        'load_ms': load_timer.elapsed * 1000,
+        'rss_delta_mb': memory_after - memory_before,
+        'search': latency_stats(latencies),
+        'qps': len(vectors) / sum(latencies),
+    }
+    if isinstance(store, NumpyVectorStore):
+        with Timer() as timer:
+            for start in range(0, len(vectors), batch_size):
+                store.similarity_search_by_vectors(vectors[start:start + batch_size], k)
+        report['batched_qps'] = len(vectors) / timer.elapsed
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    chunks = load_chunks(default_corpus_path())
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [chunk.metadata for chunk in chunks]
+    ids = chunk_ids(chunks)
+    embeddings = load_embeddings()
+    # Эмбеддинги считаются один раз (и попадают в кэш), чтобы сравнивать только хранилища
+    embeddings.embed_documents(texts)
+    vectors = embeddings.embed_documents(random.Random(0).choices(texts, k=args.queries))
+
+    report = {'chunks': len(chunks), 'queries': args.queries, 'k': args.k}
+    with tempfile.TemporaryDirectory() as chroma_dir, tempfile.TemporaryDirectory() as numpy_dir:
+        report['chroma'] = bench_store(
+            lambda: Chroma.from_texts(texts, embeddings, metadatas, ids=ids,
+                                      persist_directory=chroma_dir, collection_name=COLLECTION_NAME),
+            lambda: Chroma(persist_directory=chroma_dir, embedding_function=embeddings,
+                           collection_name=COLLECTION_NAME),
+            vectors, args.k, args.batch_size,
+        )
+        report['numpy'] = bench_store(
+            lambda: NumpyVectorStore.from_texts(texts, embeddings, metadatas, ids=ids, persist_directory=numpy_dir),
+            lambda: NumpyVectorStore(embeddings, numpy_dir),
+            vectors, args.k, args.batch_size,
+        )
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,53 @@
+import time
+
+STARTED = time.perf_counter()
+
 import asyncio
+import importlib
+import os
+import signal
+from typing import TYPE_CHECKING
 
 from aiogram import Bot, Dispatcher, types, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
-from aiogram.filters import Command
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.filters import Command, CommandObject
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
 from loguru import logger
-from config import BOT_TOKEN, CHROMA_PATH, COLLECTION_NAME, GIGACHAT_CLIENT_SECRET,JSON_PATH
-from api_utils.gigachat_api_utils import get_token, get_answer
-from parser.links import LINKS
-from vec_db.utils import get_context
-from vec_db.vec_db import initialize_db
+from config import (ADMIN_IDS, BOT_API_URL, BOT_DRAIN_TIMEOUT, BOT_EDIT_INTERVAL, BOT_MODE, BOT_TOKEN, METRICS_HOST,
+                    METRICS_PORT, WARM_UP_BACKOFF, WARM_UP_RETRIES, WEBHOOK_HOST, WEBHOOK_PATH, WEBHOOK_PORT,
+                    WEBHOOK_SECRET, WEBHOOK_URL)
+from rag.scheduler import QueueFullError, RequestScheduler, SupersededError
+from api_utils.http_client import http_client
+from api_utils.token_manager import token_manager
+from monitoring.metrics import STARTUP_SECONDS, metrics_handler, span, start_metrics_server, trace_request
+
+if TYPE_CHECKING:
+    from rag.answer_cache import AnswerCache
+    from rag.pipeline import RagPipeline
 
-bot = Bot(token=BOT_TOKEN)
+IMPORT_SECONDS = time.perf_counter() - STARTED
+
+# BOT_API_URL позволяет направить бота на локальный сервер Bot API (или заглушку для тестов)
+bot = Bot(token=BOT_TOKEN,
+          session=AiohttpSession(api=TelegramAPIServer.from_base(BOT_API_URL)) if BOT_API_URL else None)
 dp = Dispatcher()
 
-db = asyncio.run(initialize_db(CHROMA_PATH, COLLECTION_NAME, JSON_PATH, LINKS))
+STREAM_PLACEHOLDER = '✍️ Готовлю ответ...'
+WARMUP_PLACEHOLDER = '⏳ Загружаю базу знаний, отвечу, как только она будет готова...'
+OVERLOAD_MESSAGE = '😔 Сейчас слишком много вопросов. Пожалуйста, повторите через минуту.'
+
+answer_cache: 'AnswerCache | None' = None
+pipeline: 'RagPipeline | None' = None
+retriever = None
+index = None
+ready = asyncio.Event()
+scheduler = RequestScheduler()
+in_flight: set[asyncio.Task] = set()
+draining = False
 
 
 @dp.message(Command("start"))
@@ -26,37 +60,292 @@ async def cmd_start(message: types.Message):
     await message.answer(welcome_message, parse_mode=ParseMode.HTML)
 
 
+async def edit_reply(reply: types.Message, text: str, parse_mode: str | None = None, final: bool = False):
+    """Редактирует сообщение с ответом с учётом ограничений Telegram.
+
+    Если Markdown в итоговом тексте некорректен, сообщение отправляется без разметки.
+    Промежуточные правки при превышении лимита частоты пропускаются, итоговая — повторяется.
+
+    Args:
+        reply (types.Message): Сообщение бота, которое нужно отредактировать.
+        text (str): Новый текст сообщения.
+        parse_mode (str | None): Режим разметки.
+        final (bool): Является ли правка итоговой.
+    """
+    try:
+        await reply.edit_text(text, parse_mode=parse_mode)
+    except TelegramRetryAfter as ex:
+        if not final:
+            return
+        await asyncio.sleep(ex.retry_after)
+        await edit_reply(reply, text, parse_mode, final)
+    except TelegramBadRequest as ex:
+        if 'message is not modified' in str(ex):
+            return
+        if parse_mode is None:
+            raise
+        logger.warning(f'Некорректная разметка ответа, отправка без неё: {ex}')
+        await edit_reply(reply, text, None, final)
+
+
+async def warm_up():
+    """Загружает тяжёлые модули, модель и индекс после запуска поллинга.
+
+    Пока прогрев не завершён, бот отвечает на `/start`, а вопросы ждут в очереди `scheduler`
+    (сверх её лимита отклоняются).
+    При ошибке (например, недоступен сервис поиска) загрузка повторяется до `WARM_UP_RETRIES` раз
+    с растущей задержкой; если все попытки неудачны, бот завершает работу, чтобы его перезапустил
+    супервизор, а не отвечал ошибкой на каждый вопрос. После прогрева следит за версией индекса
+    (`IndexManager.watch` / `RetrievalClient.watch`).
+    """
+    global answer_cache, pipeline, retriever, index
+    for attempt in range(WARM_UP_RETRIES + 1):
+        try:
+            started = time.perf_counter()
+            answer_cache_module, pipeline_module, prompts, retrieval_client = await asyncio.to_thread(
+                lambda: [importlib.import_module(name) for name in
+                         ('rag.answer_cache', 'rag.pipeline', 'rag.prompts', 'vec_db.retrieval_client')]
+            )
+            logger.info(f'Импорт модулей RAG: {time.perf_counter() - started:.2f} с')
+            STARTUP_SECONDS.set(time.perf_counter() - started, phase='rag_import')
+
+            cache = answer_cache_module.AnswerCache(persist_path=answer_cache_module.cache_path('bot'))
+            retriever, index = await retrieval_client.connect_retriever()
+            cache.bind_index(index.version)
+            index.on_swap(cache.bind_index)
+            answer_cache = cache
+            pipeline = pipeline_module.RagPipeline(retriever, prompts.BOT_PROMPT_TEMPLATE, answer_cache)
+
+            time_to_ready = time.perf_counter() - STARTED
+            STARTUP_SECONDS.set(time_to_ready, phase='ready')
+            logger.success(f'Бот готов отвечать на вопросы: {time_to_ready:.2f} с с момента запуска')
+            break
+        except Exception as ex:
+            if retriever is not None:
+                await retriever.aclose()
+                retriever = None
+            if attempt == WARM_UP_RETRIES:
+                logger.exception(f'Ошибка загрузки базы знаний, бот останавливается: {ex}')
+                ready.set()
+                # Штатная остановка, как по SIGTERM: ожидающие вопросы получат ответ об ошибке
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+            delay = WARM_UP_BACKOFF * 2 ** attempt
+            logger.exception(f'Ошибка загрузки базы знаний, повтор через {delay:.0f} с: {ex}')
+            await asyncio.sleep(delay)
+    ready.set()
+    await index.watch()
+
+
+def is_admin(message: types.Message) -> bool:
+    return message.from_user is not None and message.from_user.id in ADMIN_IDS
+
+
+@dp.message(Command("reindex"))
+async def cmd_reindex(message: types.Message, command: CommandObject):
+    """Пересобирает индекс в фоне и переключает на него бота. `/reindex refresh` — с повторным парсингом."""
+    if not is_admin(message) or index is None:
+        return
+    await message.answer('Пересборка индекса запущена, бот продолжает отвечать на вопросы.')
+    try:
+        version = await index.rebuild(refresh=command.args == 'refresh')
+    except Exception as ex:
+        logger.warning(f'Пересборка индекса не выполнена: {ex!r}')
+        await message.answer(f'Пересборка не выполнена: {ex}')
+        return
+    await message.answer(f'Индекс переключён на версию {version}.')
+
+
+@dp.message(Command("rollback"))
+async def cmd_rollback(message: types.Message, command: CommandObject):
+    """Откатывает индекс к предыдущей версии или к указанной: `/rollback versions/<имя>`."""
+    if not is_admin(message) or index is None:
+        return
+    try:
+        version = await index.rollback(command.args)
+    except Exception as ex:
+        await message.answer(f'Откат не выполнен: {ex}')
+        return
+    await message.answer(f'Индекс откатен на версию {version}.')
+
+
+@dp.message(Command("versions"))
+async def cmd_versions(message: types.Message):
+    if not is_admin(message) or index is None:
+        return
+    lines = [f"{'▶' if item['current'] else '•'} {item['name']} ({item['version']})" for item in await index.versions()]
+    await message.answer('\n'.join(lines) or 'Версий индекса нет')
+
+
 @dp.message(F.text)
 async def handle_text(message: types.Message):
+    task = asyncio.current_task()
+    in_flight.add(task)
+    try:
+        await answer_message(message)
+    finally:
+        in_flight.discard(task)
+
+
+async def answer_message(message: types.Message):
+    reply = None
+    with trace_request('bot', chat_id=message.chat.id) as trace:
+        try:
+            started = time.perf_counter()
+            if not ready.is_set() and not scheduler.full:
+                with span('telegram_send'):
+                    reply = await message.answer(WARMUP_PLACEHOLDER)
+            # Вопросы, пришедшие во время прогрева, ждут его в общей очереди и учитываются в её лимите
+            async with scheduler.admit(message.chat.id, ready):
+                if pipeline is None:
+                    raise RuntimeError('База знаний не загружена')
+                with span('telegram_send'):
+                    if reply is None:
+                        reply = await message.answer(STREAM_PLACEHOLDER)
+                    else:
+                        await edit_reply(reply, STREAM_PLACEHOLDER)
+                answer = ''
+                last_edit = time.monotonic()
+                async for delta in pipeline.stream(message.text):
+                    if not answer:
+                        logger.info(f'Время до первого токена: {time.perf_counter() - started:.2f} с')
+                    answer += delta
+                    if time.monotonic() - last_edit >= BOT_EDIT_INTERVAL:
+                        with span('telegram_send'):
+                            await edit_reply(reply, answer)
+                        last_edit = time.monotonic()
+                with span('telegram_send'):
+                    await edit_reply(reply, answer, ParseMode.MARKDOWN, final=True)
+        except QueueFullError:
+            logger.warning(f'Очередь переполнена, вопрос из чата {message.chat.id} отклонён')
+            trace.status = 'rejected'
+            if reply is not None:
+                await reply.edit_text(OVERLOAD_MESSAGE)
+            else:
+                await message.answer(OVERLOAD_MESSAGE)
+        except SupersededError:
+            logger.info(f'Вопрос из чата {message.chat.id} вытеснен более новым')
+            trace.status = 'superseded'
+            if reply is not None:
+                await reply.delete()
+        except Exception as ex:
+            logger.exception(f'Ошибка ответа на вопрос из чата {message.chat.id}: {ex}')
+            trace.status = 'error'
+            if reply is not None:
+                await reply.edit_text('Что-то пошло не так(')
+            else:
+                await message.answer('Что-то пошло не так(')
+
+
+async def drain(timeout: float = BOT_DRAIN_TIMEOUT):
+    """Дожидается ответов, которые ещё формируются, не дольше `timeout` секунд."""
+    global draining
+    draining = True
+    if not in_flight:
+        return
+    logger.info(f'Ожидание завершения {len(in_flight)} ответов...')
+    _, pending = await asyncio.wait(set(in_flight), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning(f'Не дождались {len(pending)} ответов за {timeout} с')
 
-    context = get_context(db, message.text)
-    prompt = f"""
-            Ты — представитель компании EORA. Отвечай на вопросы от первого лица множественного числа: 
-            "Мы разработали...", "Наша команда внедрила...", "В нашем проекте...".  
 
-            Контекст для ответа:  
-            {context}  
+async def healthz(request: web.Request) -> web.Response:
+    return web.json_response({'status': 'ok'})
 
-            Вопрос: {message.text}  
-            Ответ должен быть кратким и содержать ссылки на источники в формате [[номер](url)].
-            Пример:
 
-            Вопрос: "Какие технологии вы использовали в проекте для Lamoda?"
-            Ответ:
-            "Мы разработали систему поиска похожей одежды на основе трансформенных моделей для изображений и API для поиска [[1](url)].
-            Наша команда также создала удобную систему разметки, которую можно применять в других проектах [[1](url)]."
+async def readyz(request: web.Request) -> web.Response:
+    if draining:
+        return web.json_response({'status': 'draining'}, status=503)
+    if not ready.is_set() or pipeline is None:
+        return web.json_response({'status': 'warming_up'}, status=503)
+    return web.json_response({'status': 'ready', 'in_flight': len(in_flight)})
+
+
+@web.middleware
+async def reject_while_draining(request: web.Request, handler):
+    # 503 вместо приёма обновления, которое уже не успеет обработаться: Telegram доставит его повторно
+    if draining and request.path == WEBHOOK_PATH:
+        return web.json_response({'status': 'draining'}, status=503)
+    return await handler(request)
+
+
+def create_webhook_app() -> web.Application:
+    """Создаёт aiohttp-приложение: вебхук Telegram, /healthz, /readyz и /metrics.
+
+    Обновления принимаются POST-запросами на `WEBHOOK_PATH`; если задан `WEBHOOK_SECRET`,
+    запросы без совпадающего заголовка X-Telegram-Bot-Api-Secret-Token отклоняются.
+    Во время остановки вебхук отвечает 503.
     """
+    app = web.Application(middlewares=[reject_while_draining])
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET or None).register(app, path=WEBHOOK_PATH)
+    app.router.add_get('/healthz', healthz)
+    app.router.add_get('/readyz', readyz)
+    app.router.add_get('/metrics', metrics_handler)
+    return app
+
+
+async def run_webhook():
+    """Обслуживает вебхук до сигнала SIGINT/SIGTERM.
+
+    Если задан `WEBHOOK_URL`, регистрирует вебхук в Telegram; без него приложение можно
+    проверять локально, отправляя записанные обновления (см. `benchmarks.replay_updates`).
+    Без `WEBHOOK_SECRET` вебхук слушает только локальный адрес: иначе любой, кому доступен
+    порт, мог бы присылать поддельные обновления, в том числе от имени администраторов.
+    """
+    global draining
+    if not WEBHOOK_SECRET and WEBHOOK_HOST not in ('127.0.0.1', 'localhost', '::1'):
+        raise RuntimeError(f'Для вебхука на {WEBHOOK_HOST} задайте WEBHOOK_SECRET')
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    runner = web.AppRunner(create_webhook_app())
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+    if WEBHOOK_URL:
+        await bot.set_webhook(WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET or None)
+    logger.success(f'Вебхук слушает http://{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}')
     try:
-        token = await get_token(GIGACHAT_CLIENT_SECRET)
-        answer =  await get_answer(prompt, token)
-        await message.answer(answer, parse_mode=ParseMode.MARKDOWN)
-    except Exception as ex:
-        print('Ошибка: ', ex)
-        await message.answer('Что-то пошло не так(')
+        await stop.wait()
+    finally:
+        logger.info('Остановка вебхука: новые обновления не принимаются')
+        draining = True
+        await site.stop()
+        # Обработчики обновлений выполняются в фоне, поэтому ответы дожидаются после остановки приёма
+        await drain()
+        await runner.cleanup()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
 
 
 async def main():
-    await dp.start_polling(bot)
+    logger.info(f'Импорт модулей бота: {IMPORT_SECONDS:.2f} с')
+    STARTUP_SECONDS.set(IMPORT_SECONDS, phase='import')
+    metrics_server = await start_metrics_server(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+    async with http_client:
+        token_manager.start()
+        warm_up_task = asyncio.create_task(warm_up())
+        try:
+            if BOT_MODE == 'webhook':
+                await run_webhook()
+            else:
+                await dp.start_polling(bot)
+        finally:
+            await drain()
+            warm_up_task.cancel()
+            await token_manager.close()
+            if retriever is not None:
+                await retriever.aclose()
+            if answer_cache is not None:
+                logger.info(f'Кэш ответов: {answer_cache.stats}')
+                answer_cache.save()
+            await bot.session.close()
+            if metrics_server is not None:
+                await metrics_server.cleanup()
 
 
 if __name__ == "__main__":
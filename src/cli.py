@@ -1,18 +1,130 @@
+import argparse
 import asyncio
 import io
+import json
 import sys
 
-from parser.links import LINKS
-from vec_db.utils import get_context
-from vec_db.vec_db import initialize_db
-from config import CHROMA_PATH, COLLECTION_NAME, GIGACHAT_CLIENT_SECRET, JSON_PATH
-from api_utils.gigachat_api_utils import get_answer, get_token
+from monitoring.metrics import trace_request
+from rag.answer_cache import AnswerCache, cache_path
+from rag.pipeline import RagPipeline
+from rag.prompts import BOT_PROMPT_TEMPLATE, CLI_PROMPT_TEMPLATE
+from vec_db.retrieval_client import connect_retriever
+from config import BATCH_CONCURRENCY, BATCH_SIZE, CORPUS_PATH
+from api_utils.http_client import http_client
+from api_utils.token_manager import token_manager
 
 sys.stdin = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='replace')
 
-db = asyncio.run(initialize_db(CHROMA_PATH, COLLECTION_NAME, JSON_PATH, LINKS))
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='RAG QA System для компании EORA')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('chat', help='Интерактивный режим вопросов и ответов (по умолчанию)')
+    sync_parser = subparsers.add_parser('sync', help='Распарсить новые ссылки и собрать по корпусу новую версию индекса')
+    sync_parser.add_argument('--refresh', action='store_true',
+                             help='Перепроверить все страницы условными запросами и обновить изменившиеся')
+    check = subparsers.add_parser('check-embeddings',
+                                  help='Сравнить эмбеддинги оптимизированного бэкенда с эталонными fp32')
+    check.add_argument('--backend', default='int8', choices=['int8', 'onnx'])
+    check.add_argument('--tolerance', type=float, default=0.99, help='Минимальная косинусная близость')
+    check.add_argument('--limit', type=int, default=200, help='Сколько чанков из корпуса сравнить')
+    batch = subparsers.add_parser('batch', help='Ответить на список вопросов из файла и сохранить ответы в JSONL')
+    batch.add_argument('--input', default='-', help="JSONL- или CSV-файл с вопросами; '-' — stdin")
+    batch.add_argument('--output', required=True, help='JSONL-файл для ответов (дописывается, можно продолжить)')
+    batch.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Размер пачки для эмбеддингов и поиска')
+    batch.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY,
+                       help='Число одновременных запросов к GigaChat')
+    batch.add_argument('--prompt', default='cli', choices=['cli', 'bot'],
+                       help='Шаблон промпта и кэш ответов (bot — для прогрева кэша бота)')
+    rebuild = subparsers.add_parser('rebuild', help='Собрать новую версию индекса и переключиться на неё')
+    rebuild.add_argument('--refresh', action='store_true', help='Перепроверить все страницы перед пересборкой')
+    rollback = subparsers.add_parser('rollback', help='Откатить индекс к предыдущей версии')
+    rollback.add_argument('--to', default=None, help='Директория версии, например versions/20250101-120000-ab12cd')
+    serve_parser = subparsers.add_parser('serve', help='Запустить сервис поиска для бота и CLI')
+    serve_parser.add_argument('--socket', help='Путь к UNIX-сокету (вместо HTTP)')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=9200)
+    return parser.parse_args()
+
+
+def check_backend(backend: str, tolerance: float, limit: int):
+    from vec_db.corpus import CorpusStore
+    from vec_db.embeddings import check_embeddings, load_embeddings
+    from vec_db.utils import chunks_from_md, dicts_to_documents
+
+    texts = []
+    for doc in CorpusStore(CORPUS_PATH).iter_documents():
+        texts += [chunk.page_content for chunk in chunks_from_md(dicts_to_documents([doc]))]
+        if len(texts) >= limit:
+            break
+    texts = texts[:limit]
+    result = check_embeddings(load_embeddings(backend, cache_dir=None), load_embeddings('torch', cache_dir=None),
+                              texts, tolerance)
+    print(json.dumps({'backend': backend, 'texts': len(texts), **result}, indent=4))
+    if not result['passed']:
+        sys.exit(1)
+
+
+async def manage_versions(args: argparse.Namespace):
+    """Пересобирает или откатывает индекс: на сервисе поиска, если он запущен, иначе на диске.
+
+    `sync` и `rebuild` собирают новую версию, а не изменяют активную: бот и сервис поиска,
+    работающие с тем же индексом, переключаются на неё сами (`IndexManager.watch`).
+    """
+    async with http_client:
+        retriever, index = await connect_retriever()
+        try:
+            if args.command == 'rollback':
+                await index.rollback(args.to)
+            else:
+                await index.rebuild(refresh=args.refresh)
+            print(json.dumps(await index.versions(), ensure_ascii=False, indent=4))
+        finally:
+            await retriever.aclose()
+            await token_manager.close()
+
+
+async def run_service(socket_path: str | None, host: str, port: int):
+    from vec_db.retrieval_service import serve
+
+    async with http_client:
+        try:
+            await serve(socket_path, host, port)
+        finally:
+            await token_manager.close()
+
+
+async def run_batch(args: argparse.Namespace):
+    from rag.batch import answer_questions, read_questions
+
+    questions = read_questions(args.input)
+    prompt_template = BOT_PROMPT_TEMPLATE if args.prompt == 'bot' else CLI_PROMPT_TEMPLATE
+    async with http_client:
+        retriever, index = await connect_retriever()
+        answer_cache = AnswerCache(persist_path=cache_path(args.prompt))
+        answer_cache.bind_index(index.version)
+        try:
+            await answer_questions(RagPipeline(retriever, prompt_template, answer_cache), questions, args.output,
+                                   args.batch_size, args.concurrency)
+        finally:
+            await retriever.aclose()
+            answer_cache.save()
+            await token_manager.close()
+
 
 async def main():
+    async with http_client:
+        retriever, index = await connect_retriever()
+        answer_cache = AnswerCache(persist_path=cache_path('cli'))
+        answer_cache.bind_index(index.version)
+        try:
+            await dialog(RagPipeline(retriever, CLI_PROMPT_TEMPLATE, answer_cache))
+        finally:
+            await retriever.aclose()
+            answer_cache.save()
+
+
+async def dialog(pipeline: RagPipeline):
     print("\n" + "=" * 50)
     print("RAG QA System (для выхода введите 'quit' или 'exit')")
     print("=" * 50 + "\n")
@@ -28,32 +140,27 @@ async def main():
             print("Пожалуйста, введите вопрос.")
             continue
 
-        context = get_context(db, query)
-        prompt = f"""
-            Ты — представитель компании EORA. Отвечай на вопросы от первого лица множественного числа: 
-            "Мы разработали...", "Наша команда внедрила...", "В нашем проекте...".  
-
-            Контекст для ответа:  
-            {context}  
-
-            Вопрос: {query}  
-            Ответ должен быть кратким и содержать ссылки на источники в формате [номер].
-            Пример:
-
-            Вопрос: "Какие технологии вы использовали в проекте для Lamoda?"
-            Ответ:
-            "Мы разработали систему поиска похожей одежды на основе трансформенных моделей для изображений и API для поиска [1].
-            Наша команда также создала удобную систему разметки, которую можно применять в других проектах [1]."
-            Источники:
-            [1] - url
-            """
-        try:
-            token = await get_token(GIGACHAT_CLIENT_SECRET)
-            print("\n[Ответ] ", await get_answer(prompt, token))
-        except Exception as ex:
-            print('Ошибка: ', ex)
+        with trace_request('cli') as trace:
+            try:
+                print("\n[Ответ] ", end='', flush=True)
+                async for delta in pipeline.stream(query):
+                    print(delta, end='', flush=True)
+                print()
+            except Exception as ex:
+                print('Ошибка: ', ex)
+                trace.status = 'error'
         print("-" * 50 + "\n")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.command == 'check-embeddings':
+        check_backend(args.backend, args.tolerance, args.limit)
+    elif args.command == 'batch':
+        asyncio.run(run_batch(args))
+    elif args.command in ('sync', 'rebuild', 'rollback'):
+        asyncio.run(manage_versions(args))
+    elif args.command == 'serve':
+        asyncio.run(run_service(args.socket, args.host, args.port))
+    else:
+        asyncio.run(main())
@@ -8,3 +8,130 @@ JSON_PATH = 'data.json'
 
 GIGACHAT_CLIENT_SECRET = os.getenv('GIGACHAT_CLIENT_SECRET')
 BOT_TOKEN = os.getenv('BOT_TOKEN')
+
+# За сколько секунд до истечения токена GigaChat его следует обновить
+TOKEN_REFRESH_MARGIN = 60
+
+# Адреса GigaChat API (можно переопределить, например, на локальный тестовый сервер)
+GIGACHAT_AUTH_URL = os.getenv('GIGACHAT_AUTH_URL', 'https://ngw.devices.sberbank.ru:9443/api/v2/oauth')
+GIGACHAT_API_URL = os.getenv('GIGACHAT_API_URL', 'https://gigachat.devices.sberbank.ru/api/v1')
+
+# Пул HTTP-соединений
+HTTP_POOL_LIMIT = 100
+HTTP_POOL_LIMIT_PER_HOST = 20
+HTTP_KEEPALIVE_TIMEOUT = 30
+HTTP_DNS_CACHE_TTL = 300
+HTTP_TOTAL_TIMEOUT = 120
+HTTP_CONNECT_TIMEOUT = 10
+
+# Параллельный парсинг страниц
+PARSER_WORKERS = 8
+PARSER_FETCH_RATE = 5
+PARSER_LLM_RATE = 1
+PARSER_RETRIES = 3
+PARSER_RETRY_BACKOFF = 2
+
+# Асинхронный поиск по векторной базе
+RETRIEVER_BATCH_WINDOW = 0.005
+RETRIEVER_MAX_BATCH = 32
+RETRIEVER_WORKERS = 1
+
+# Кэш ответов
+ANSWER_CACHE_MAX_SIZE = 1000
+ANSWER_CACHE_TTL = 24 * 60 * 60
+ANSWER_CACHE_THRESHOLD = 0.95
+ANSWER_CACHE_DIR = './answer_cache'
+# Сохранять ли кэш ответов на диск: в нём лежат тексты вопросов пользователей
+ANSWER_CACHE_PERSIST = os.getenv('ANSWER_CACHE_PERSIST', '1') == '1'
+
+# Минимальный интервал между правками сообщения при потоковой выдаче ответа в Telegram, с
+BOT_EDIT_INTERVAL = 1.5
+
+# Модель эмбеддингов: бэкенд 'torch', 'int8' или 'onnx'
+EMBEDDING_MODEL = "Qwen/Qwen3-Embedding-0.6B"
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+EMBEDDING_ONNX_FILE = 'onnx/model.onnx'
+EMBEDDING_THREADS = int(os.getenv('EMBEDDING_THREADS', 0))
+EMBEDDING_BATCH_SIZE = 32
+
+# Кэш эмбеддингов на диске
+EMBEDDING_CACHE_DIR = './embedding_cache'
+EMBEDDING_CACHE_DTYPE = 'float16'
+
+# Бэкенд векторного хранилища: 'chroma' или 'numpy' (точный поиск в памяти)
+VECTOR_STORE = os.getenv('VECTOR_STORE', 'chroma')
+
+# HTTP-эндпоинт метрик Prometheus в процессе бота (0 — отключить)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))  # 9100 занят node_exporter
+
+# Сборка контекста: бюджет в токенах, размер пула кандидатов и фильтры
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 1500))
+CONTEXT_CANDIDATES = 20
+CONTEXT_MAX_DISTANCE = 1.2
+CONTEXT_DEDUP_THRESHOLD = 0.8
+CONTEXT_CHARS_PER_TOKEN = 3.5
+
+# Разбор HTML: бэкенд 'html5lib', 'lxml' или 'selectolax', и кэш загруженных страниц
+PARSER_BACKEND = os.getenv('PARSER_BACKEND', 'html5lib')
+PAGE_CACHE_DIR = './page_cache'
+
+# Отказоустойчивость запросов к GigaChat
+GIGACHAT_DEADLINE = 60
+GIGACHAT_RETRIES = 3
+GIGACHAT_BACKOFF = 0.5
+GIGACHAT_HEDGE = os.getenv('GIGACHAT_HEDGE', '0') == '1'
+GIGACHAT_HEDGE_MIN_DELAY = 2.0
+GIGACHAT_BREAKER_THRESHOLD = 5
+GIGACHAT_BREAKER_RESET = 30
+
+# Сервис поиска: unix:///tmp/eora_retrieval.sock или http://127.0.0.1:9200; пусто — поиск в процессе
+RETRIEVAL_SERVICE_URL = os.getenv('RETRIEVAL_SERVICE_URL', '')
+RETRIEVAL_CONCURRENCY = 16
+RETRIEVAL_TIMEOUT = 30
+# Секрет для /rebuild и /rollback сервиса поиска; без него сервис слушает только локальный адрес или UNIX-сокет
+RETRIEVAL_SECRET = os.getenv('RETRIEVAL_SECRET', '')
+
+# Очередь вопросов бота
+BOT_CONCURRENCY = 8
+BOT_QUEUE_SIZE = 100
+BOT_CHAT_CONCURRENCY = 1
+
+# Пакетная обработка вопросов (python src/cli.py batch)
+BATCH_SIZE = 64
+BATCH_CONCURRENCY = 4
+
+# Потоковая индексация
+CORPUS_PATH = './data.jsonl'
+INGEST_QUEUE_SIZE = 16
+INGEST_BATCH_SIZE = 64
+
+# Компактные коды векторов (только для VECTOR_STORE=numpy): 0 — без обрезки
+VECTOR_DIMS = int(os.getenv('VECTOR_DIMS', 0))
+VECTOR_QUANTIZATION = os.getenv('VECTOR_QUANTIZATION', 'none')
+VECTOR_RESCORE = 4
+
+# Режим работы бота: polling или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+BOT_API_URL = os.getenv('BOT_API_URL', '')
+BOT_DRAIN_TIMEOUT = 30
+# Повторы загрузки базы знаний при запуске бота: задержка удваивается после каждой попытки, с
+WARM_UP_RETRIES = int(os.getenv('WARM_UP_RETRIES', 5))
+WARM_UP_BACKOFF = 2.0
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8080))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+ADMIN_IDS = [int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip()]
+
+# Фоновая пересборка индекса в новую версию
+INDEX_REBUILD_INTERVAL = int(os.getenv('INDEX_REBUILD_INTERVAL', 0))  # секунды; 0 — только по команде
+INDEX_KEEP_VERSIONS = 2
+INDEX_REBUILD_BATCH_SIZE = 16
+INDEX_REBUILD_PAUSE = 0.2
+INDEX_REBUILD_MAX_YIELD = 5
+INDEX_SMOKE_QUERIES = 20
+INDEX_SMOKE_RECALL = 0.8
+INDEX_MIN_SIZE_RATIO = 0.5
+RETRIEVAL_WATCH_INTERVAL = 30
@@ -0,0 +1,264 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Tuple
+
+from aiohttp import web
+from loguru import logger
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 1500, 2000, 3000, 4000, 8000)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """Базовый класс метрики с метками.
+
+    Args:
+        name (str): Имя метрики в формате Prometheus.
+        description (str): Описание (HELP).
+        labels (Tuple[str, ...]): Имена меток.
+    """
+
+    kind = ''
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.kind}']
+        lines += list(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Монотонно возрастающий счётчик."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, description, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        # Метрики обновляются из пула потоков, поэтому значения копируются под блокировкой
+        with self._lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labels, key)} {value}'
+
+
+class Gauge(Counter):
+    """Значение, которое может как расти, так и уменьшаться."""
+
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self.values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels: str):
+        """Увеличивает значение на время выполнения блока."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    """Гистограмма наблюдений с фиксированными границами корзин."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self.values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key][1] = total + value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self.values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                yield f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labels, key)} {total}'
+            yield f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}'
+
+
+class Registry:
+    """Набор метрик процесса."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        return '\n'.join(metric.render() for metric in self.metrics.values()) + '\n'
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram('rag_stage_seconds', 'Длительность этапов обработки', ('stage',)))
+REQUESTS_TOTAL = registry.register(Counter('rag_requests_total', 'Обработанные вопросы', ('interface', 'status')))
+REQUESTS_IN_FLIGHT = registry.register(Gauge('rag_requests_in_flight', 'Вопросы в обработке', ('interface',)))
+CACHE_TOTAL = registry.register(Counter('rag_answer_cache_total', 'Обращения к кэшу ответов', ('result',)))
+LLM_ERRORS_TOTAL = registry.register(Counter('rag_llm_errors_total', 'Ошибки запросов к GigaChat', ('operation',)))
+QUEUE_DEPTH = registry.register(Gauge('rag_queue_depth', 'Вопросы, ожидающие обработки'))
+QUEUE_WAIT_SECONDS = registry.register(Histogram('rag_queue_wait_seconds', 'Время ожидания вопроса в очереди'))
+QUEUE_REJECTED_TOTAL = registry.register(Counter('rag_queue_rejected_total', 'Отклонённые вопросы', ('reason',)))
+COALESCED_TOTAL = registry.register(Counter('rag_coalesced_total', 'Вопросы, объединённые с уже выполняющимися',
+                                            ('operation',)))
+INDEX_REBUILDS_TOTAL = registry.register(Counter('rag_index_rebuilds_total', 'Пересборки и откаты индекса',
+                                                ('status',)))
+STARTUP_SECONDS = registry.register(Gauge('rag_startup_seconds', 'Длительность этапов запуска', ('phase',)))
+PROMPT_CHARS = registry.register(Histogram('rag_prompt_chars', 'Размер промпта в символах', buckets=SIZE_BUCKETS))
+CONTEXT_CHARS = registry.register(Histogram('rag_context_chars', 'Размер контекста в символах', buckets=SIZE_BUCKETS))
+PROMPT_TOKENS = registry.register(Histogram('rag_prompt_tokens', 'Оценка размера промпта в токенах',
+                                            buckets=TOKEN_BUCKETS))
+
+_trace: contextvars.ContextVar['RequestTrace | None'] = contextvars.ContextVar('trace', default=None)
+
+
+@contextmanager
+def span(stage: str):
+    """Замеряет длительность блока и записывает её в гистограмму `rag_stage_seconds`
+    и в тайминги текущего запроса (если он отслеживается через `trace_request`).
+
+    Args:
+        stage (str): Название этапа.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        record(stage, elapsed)
+
+
+def record(stage: str, elapsed: float):
+    """Записывает уже измеренную длительность этапа (например, время до первого токена).
+
+    Args:
+        stage (str): Название этапа.
+        elapsed (float): Длительность в секундах.
+    """
+    STAGE_SECONDS.observe(elapsed, stage=stage)
+    trace = _trace.get()
+    if trace is not None:
+        trace.timings[stage] = trace.timings.get(stage, 0.0) + elapsed
+
+
+def annotate(**fields):
+    """Добавляет поля (например, размер промпта) в строку лога текущего запроса."""
+    trace = _trace.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+
+@dataclass
+class RequestTrace:
+    """Тайминги этапов, дополнительные поля и статус обработки одного вопроса."""
+    timings: Dict[str, float] = field(default_factory=dict)
+    fields: Dict[str, object] = field(default_factory=dict)
+    status: str = 'ok'
+
+
+@contextmanager
+def trace_request(interface: str, **fields) -> Iterator[RequestTrace]:
+    """Отслеживает обработку одного вопроса: число запросов в работе, итоговый статус
+    и структурированная строка лога с таймингами всех этапов.
+
+    Args:
+        interface (str): Интерфейс ('bot', 'cli').
+        **fields: Дополнительные поля строки лога (например, chat_id).
+
+    Yields:
+        RequestTrace: Тайминги этапов (заполняются через `span`) и статус, который
+            обработчик может изменить, если ошибка была перехвачена.
+    """
+    trace = RequestTrace()
+    token = _trace.set(trace)
+    started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc(interface=interface)
+    try:
+        yield trace
+    except BaseException:
+        trace.status = 'error'
+        raise
+    finally:
+        REQUESTS_IN_FLIGHT.dec(interface=interface)
+        REQUESTS_TOTAL.inc(interface=interface, status=trace.status)
+        total = time.perf_counter() - started
+        STAGE_SECONDS.observe(total, stage=f'{interface}_request')
+        _trace.reset(token)
+        fields = {'interface': interface, 'status': trace.status, **fields, **trace.fields,
+                  'total_ms': round(total * 1000, 1),
+                  **{f'{stage}_ms': round(elapsed * 1000, 1) for stage, elapsed in trace.timings.items()}}
+        logger.bind(**fields).info('request ' + ' '.join(f'{key}={value}' for key, value in fields.items()))
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8',
+                        headers={'X-Content-Type-Options': 'nosniff'})
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Запускает HTTP-сервер с эндпоинтом /metrics в формате Prometheus.
+
+    Args:
+        host (str): Адрес.
+        port (int): Порт.
+
+    Returns:
+        web.AppRunner: Запущенный сервер; для остановки вызовите `cleanup()`.
+    """
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f'Метрики доступны на http://{host}:{port}/metrics')
+    return runner
@@ -0,0 +1,55 @@
+import re
+
+from bs4 import BeautifulSoup
+
+from config import PARSER_BACKEND
+
+NOISE_TAGS = ["script", "style", "noscript", "meta", "link"]
+
+
+def _text_bs4(html: str, features: str) -> str:
+    soup = BeautifulSoup(html, features)
+    for script in soup(NOISE_TAGS):
+        script.decompose()
+    return soup.get_text(separator=' ', strip=True)
+
+
+def _text_selectolax(html: str) -> str:
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+    except ImportError as ex:
+        raise ImportError("Для бэкенда 'selectolax' установите пакет selectolax") from ex
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(NOISE_TAGS)
+    # Как и BeautifulSoup, берём текст всего документа, включая <title>
+    root = tree.root
+    return root.text(separator=' ', strip=True) if root is not None else ''
+
+
+def extract_text(html: str, backend: str = PARSER_BACKEND) -> str:
+    """Извлекает видимый текст страницы, удаляя скрипты, стили и служебные теги.
+
+    Args:
+        html (str): HTML-код страницы.
+        backend (str): Бэкенд разбора HTML:
+
+            - 'html5lib' — BeautifulSoup с html5lib (самый медленный, эталонный),
+
+            - 'lxml' — BeautifulSoup с lxml,
+
+            - 'selectolax' — парсер Lexbor через selectolax (самый быстрый).
+
+    Returns:
+        str: Очищенный текст страницы.
+    """
+    if backend in ('html5lib', 'lxml'):
+        raw_text = _text_bs4(html, backend)
+    elif backend == 'selectolax':
+        raw_text = _text_selectolax(html)
+    else:
+        raise ValueError(f"Неизвестный бэкенд разбора HTML: {backend}")
+
+    clean_text = re.sub(r'\[\{.*?\}\]', '', raw_text, flags=re.DOTALL)
+
+    clean_text = '\n'.join([line.strip() for line in clean_text.split('\n') if line.strip()])
+    return clean_text
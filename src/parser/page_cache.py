@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import time
+
+from config import PAGE_CACHE_DIR
+
+
+class PageCache:
+    """Кэш загруженных страниц на диске для условных GET-запросов.
+
+    Для каждой страницы хранятся HTML, заголовки ETag/Last-Modified и результат
+    обработки GigaChat, чтобы при ответе 304 Not Modified не вызывать LLM повторно.
+
+    Args:
+        path (str): Директория кэша.
+    """
+
+    def __init__(self, path: str = PAGE_CACHE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _paths(self, url: str) -> tuple[str, str]:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, f'{key}.html'), os.path.join(self.path, f'{key}.json')
+
+    def get_meta(self, url: str) -> dict:
+        """Возвращает сохранённые метаданные страницы (пустой словарь, если их нет).
+
+        Args:
+            url (str): URL страницы.
+
+        Returns:
+            dict: Ключи 'url', 'etag', 'last_modified', 'fetched_at', 'html_hash' и, если есть, 'summary'.
+        """
+        _, meta_path = self._paths(url)
+        if not os.path.exists(meta_path):
+            return {}
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def conditional_headers(self, url: str) -> dict:
+        """Заголовки условного запроса для страницы, уже сохранённой в кэше.
+
+        Args:
+            url (str): URL страницы.
+
+        Returns:
+            dict: Заголовки If-None-Match / If-Modified-Since.
+        """
+        html_path, _ = self._paths(url)
+        if not os.path.exists(html_path):
+            return {}
+        meta = self.get_meta(url)
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def get_html(self, url: str) -> str | None:
+        """Возвращает сохранённый HTML страницы."""
+        html_path, _ = self._paths(url)
+        if not os.path.exists(html_path):
+            return None
+        with open(html_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def put(self, url: str, html: str, etag: str | None, last_modified: str | None) -> bool:
+        """Сохраняет новую версию страницы.
+
+        Прежний результат обработки сбрасывается, только если HTML изменился: сервер может
+        ответить 200 вместо 304 (например, без поддержки ETag) и на неизменённую страницу.
+
+        Args:
+            url (str): URL страницы.
+            html (str): HTML-код.
+            etag (str | None): Заголовок ETag ответа.
+            last_modified (str | None): Заголовок Last-Modified ответа.
+
+        Returns:
+            bool: Изменился ли HTML с предыдущей загрузки.
+        """
+        html_path, meta_path = self._paths(url)
+        html_hash = hashlib.sha256(html.encode('utf-8')).hexdigest()
+        old_meta = self.get_meta(url)
+        changed = old_meta.get('html_hash') != html_hash
+        with open(html_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        meta = {'url': url, 'etag': etag, 'last_modified': last_modified, 'fetched_at': time.time(),
+                'html_hash': html_hash}
+        if not changed and 'summary' in old_meta:
+            meta['summary'] = old_meta['summary']
+        self._write_meta(meta_path, meta)
+        return changed
+
+    def put_summary(self, url: str, summary: str):
+        """Сохраняет результат обработки страницы GigaChat.
+
+        Args:
+            url (str): URL страницы.
+            summary (str): Структурированный текст страницы.
+        """
+        _, meta_path = self._paths(url)
+        self._write_meta(meta_path, {**self.get_meta(url), 'summary': summary})
+
+    @staticmethod
+    def _write_meta(meta_path: str, meta: dict):
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def html_files(self) -> list[str]:
+        """Пути ко всем сохранённым HTML-страницам (используются как фикстуры для проверки парсеров)."""
+        return sorted(os.path.join(self.path, name) for name in os.listdir(self.path) if name.endswith('.html'))
@@ -1,59 +1,100 @@
+import asyncio
 import json
-
-import requests
-import re
+import random
 
 import aiohttp
 from langchain_core.documents import Document
-from typing import List
+from typing import AsyncIterator, List
 from tqdm import tqdm
-from bs4 import BeautifulSoup
-from config import GIGACHAT_CLIENT_SECRET, JSON_PATH
-from api_utils.gigachat_api_utils import get_answer, get_token
+from config import (INGEST_QUEUE_SIZE, JSON_PATH, PAGE_CACHE_DIR, PARSER_FETCH_RATE, PARSER_LLM_RATE, PARSER_RETRIES,
+                    PARSER_RETRY_BACKOFF, PARSER_WORKERS)
+from api_utils.gigachat_client import parser_gigachat_client
+from api_utils.http_client import http_client
+from api_utils.rate_limiter import RateLimiter
+from parser.extract import extract_text
+from parser.page_cache import PageCache
+from vec_db.utils import dicts_to_documents
 from loguru import logger
+from monitoring.metrics import span
 
 
-async def query(url: str) -> str:
-    """Отправляет асинхронный POST-запрос по указанному URL и возвращает ответ в формате JSON.
+async def query(url: str, session: aiohttp.ClientSession | None = None) -> str:
+    """Отправляет асинхронный GET-запрос по указанному URL и возвращает текст ответа.
 
     Args:
-        url (str): URL-адрес, на который отправляется POST-запрос.
-        headers (dict): Заголовки HTTP-запроса.
-        payload (dict | str): Тело запроса. Может быть словарём (будет автоматически
-            сериализовано в JSON) или строкой.
+        url (str): URL-адрес страницы.
+        session (aiohttp.ClientSession | None): Сессия для запроса. По умолчанию
+            используется общий пул соединений `http_client`.
 
     Returns:
-        dict: Ответ сервера, декодированный из JSON.
+        str: HTML-код страницы.
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            resp = await response.text()
-            return resp
+    session = session or http_client.session
+    async with session.get(url) as response:
+        response.raise_for_status()
+        resp = await response.text()
+        return resp
+
+
+async def fetch_page(url: str, cache: PageCache, session: aiohttp.ClientSession | None = None) -> tuple[str, bool]:
+    """Загружает страницу условным GET-запросом с учётом сохранённых ETag/Last-Modified.
+
+    Args:
+        url (str): URL-адрес страницы.
+        cache (PageCache): Кэш страниц.
+        session (aiohttp.ClientSession | None): Сессия для запроса. По умолчанию
+            используется общий пул соединений `http_client`.
+
+    Returns:
+        tuple[str, bool]: HTML-код страницы и флаг того, что её HTML изменился
+            с момента предыдущей загрузки.
+    """
+    session = session or http_client.session
+    async with session.get(url, headers=cache.conditional_headers(url)) as response:
+        if response.status == 304:
+            return cache.get_html(url), False
+        response.raise_for_status()
+        html = await response.text()
+    modified = cache.put(url, html, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return html, modified
+
 
-async def parse(url: str) -> str:
+async def parse(url: str,
+                fetch_limiter: RateLimiter | None = None,
+                llm_limiter: RateLimiter | None = None,
+                cache: PageCache | None = None) -> str:
     """Извлекает и структурирует значимый контент с веб-страницы с помощью парсинга и GigaChat.
 
+    Если задан кэш страниц и сервер ответил, что страница не изменилась, возвращается
+    сохранённый результат без повторного вызова GigaChat.
+
     Args:
         url (str): URL веб-страницы, которую необходимо обработать.
+        fetch_limiter (RateLimiter | None): Ограничитель частоты загрузки страниц.
+        llm_limiter (RateLimiter | None): Ограничитель частоты запросов к GigaChat.
+        cache (PageCache | None): Кэш страниц для условных запросов.
 
     Returns:
         str: Структурированный текст в формате Markdown, содержащий только
         релевантную информацию,очищенный от шума и оформленный по заданному шаблону.
-    """
-    try:
-        response = await query(url)
-    except Exception as ex:
-        logger.error(ex)
-    soup = BeautifulSoup(response, 'html5lib')
-
-    for script in soup(["script", "style", "noscript", "meta", "link"]):
-        script.decompose()
-
-    raw_text = soup.get_text(separator=' ', strip=True)
 
-    clean_text = re.sub(r'\[\{.*?\}\]', '', raw_text, flags=re.DOTALL)
+    Raises:
+        Exception: Если страницу не удалось загрузить или GigaChat не вернул ответ.
+    """
+    if fetch_limiter is not None:
+        await fetch_limiter.acquire()
+    with span('page_fetch'):
+        if cache is None:
+            response = await query(url)
+        else:
+            response, modified = await fetch_page(url, cache)
+            summary = cache.get_meta(url).get('summary')
+            if not modified and summary:
+                logger.debug(f'{url}: страница не изменилась, используется сохранённый результат')
+                return summary
 
-    clean_text = '\n'.join([line.strip() for line in clean_text.split('\n') if line.strip()])
+    with span('html_extract'):
+        clean_text = extract_text(response)
 
     prompt = f"""Анализируй предоставленный текст и выделяй только важные моменты, сохраняя смысловую структуру. Действуй по следующим правилам:
         1. Удаляй:
@@ -106,34 +147,144 @@ async def parse(url: str) -> str:
         Теперь обработай следующий текст:
         {clean_text}
     """
+    if llm_limiter is not None:
+        await llm_limiter.acquire()
+    response = await parser_gigachat_client.complete(prompt)
+    if not response:
+        raise ValueError(f'Пустой ответ GigaChat для {url}')
+    if cache is not None:
+        cache.put_summary(url, response)
+    return response
+
+
+async def parse_with_retry(url: str,
+                           fetch_limiter: RateLimiter | None = None,
+                           llm_limiter: RateLimiter | None = None,
+                           cache: PageCache | None = None,
+                           retries: int = PARSER_RETRIES,
+                           backoff: float = PARSER_RETRY_BACKOFF) -> str:
+    """Вызывает `parse` с повторными попытками и экспоненциальной задержкой между ними.
+
+    Args:
+        url (str): URL веб-страницы.
+        fetch_limiter (RateLimiter | None): Ограничитель частоты загрузки страниц.
+        llm_limiter (RateLimiter | None): Ограничитель частоты запросов к GigaChat.
+        cache (PageCache | None): Кэш страниц для условных запросов.
+        retries (int): Максимальное число попыток.
+        backoff (float): Базовая задержка в секундах; удваивается после каждой неудачи.
+
+    Returns:
+        str: Результат `parse`.
+
+    Raises:
+        Exception: Ошибка последней попытки.
+    """
+    for attempt in range(1, retries + 1):
+        try:
+            with span('parse_page'):
+                return await parse(url, fetch_limiter, llm_limiter, cache)
+        except Exception as ex:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** (attempt - 1) * (1 + random.random() / 2)
+            logger.warning(f'{url}: попытка {attempt}/{retries} не удалась ({ex}), повтор через {delay:.1f} с')
+            await asyncio.sleep(delay)
+
+
+async def iter_parsed(links: List[str],
+                      workers: int = PARSER_WORKERS,
+                      fetch_rate: float = PARSER_FETCH_RATE,
+                      llm_rate: float = PARSER_LLM_RATE,
+                      page_cache_dir: str | None = PAGE_CACHE_DIR,
+                      queue_size: int = INGEST_QUEUE_SIZE) -> AsyncIterator[dict]:
+    """Асинхронно обрабатывает веб-ссылки и отдаёт документы по мере готовности.
+
+    Страницы обрабатываются `workers` обработчиками с отдельными ограничениями частоты
+    загрузки страниц и запросов к GigaChat. Готовые документы передаются через очередь
+    размером `queue_size`: если потребитель не успевает, обработчики ждут. Страницы, которые
+    не удалось обработать после всех попыток, пропускаются и перечисляются в логе.
+
+    Args:
+        links (List[str]): Список URL-адресов, которые необходимо распарсить.
+        workers (int): Максимальное число одновременно обрабатываемых страниц.
+        fetch_rate (float): Допустимое число загрузок страниц в секунду.
+        llm_rate (float): Допустимое число запросов к GigaChat в секунду.
+        page_cache_dir (str | None): Директория кэша страниц для условных запросов. None — без кэша.
+        queue_size (int): Размер очереди готовых документов.
+
+    Yields:
+        dict: Документ с ключами 'text' (структурированный текст страницы) и 'source' (ссылка),
+            в порядке готовности.
+    """
+    fetch_limiter = RateLimiter(fetch_rate)
+    llm_limiter = RateLimiter(llm_rate)
+    cache = PageCache(page_cache_dir) if page_cache_dir else None
+    results = asyncio.Queue(maxsize=queue_size)
+    pending = iter(links)
+    failed = {}
+    progress = tqdm(total=len(links))
+    done = object()
+
+    async def worker():
+        for link in pending:
+            try:
+                text = await parse_with_retry(link, fetch_limiter, llm_limiter, cache)
+            except Exception as ex:
+                failed[link] = repr(ex)
+                text = None
+            progress.update()
+            progress.set_postfix(failed=len(failed))
+            if text is not None:
+                await results.put({'text': text, 'source': link})
+
+    async def run_workers():
+        await asyncio.gather(*(worker() for _ in range(min(workers, len(links)))))
+        await results.put(done)
+
+    runner = asyncio.create_task(run_workers())
     try:
-        token = await get_token(GIGACHAT_CLIENT_SECRET)
-        response = await get_answer(prompt, token)
-        return response
-    except Exception as ex:
-        logger.error(ex)
+        while (doc := await results.get()) is not done:
+            yield doc
+        await runner
+    finally:
+        runner.cancel()
+        progress.close()
+        if failed:
+            logger.error(f'Не удалось обработать {len(failed)} из {len(links)} страниц:')
+            for link, error in failed.items():
+                logger.error(f'{link}: {error}')
 
 
-async def parse_links(links: List[str]) -> List[Document]:
+async def parse_links(links: List[str],
+                      workers: int = PARSER_WORKERS,
+                      fetch_rate: float = PARSER_FETCH_RATE,
+                      llm_rate: float = PARSER_LLM_RATE,
+                      json_path: str | None = JSON_PATH,
+                      page_cache_dir: str | None = PAGE_CACHE_DIR) -> List[Document]:
     """Асинхронно обрабатывает список веб-ссылок: парсит содержимое, очищает и структурирует текст через LLM.
 
+    Собирает в список все документы из `iter_parsed`; для больших списков ссылок используйте
+    `iter_parsed` напрямую.
+
     Args:
         links (List[str]): Список URL-адресов, которые необходимо распарсить.
+        workers (int): Максимальное число одновременно обрабатываемых страниц.
+        fetch_rate (float): Допустимое число загрузок страниц в секунду.
+        llm_rate (float): Допустимое число запросов к GigaChat в секунду.
+        json_path (str | None): Куда сохранить результат в формате JSON. None — не сохранять.
+        page_cache_dir (str | None): Директория кэша страниц для условных запросов. None — без кэша.
 
     Returns:
-        List[langchain_core.documents.Document]: Список объектов Document, каждый из которых содержит:
+        List[langchain_core.documents.Document]: Список объектов Document в порядке `links`, каждый из которых содержит:
             - page_content: структурированный текст, очищенный и обработанный GigaChat,
             - metadata: словарь с ключом 'source' — оригинальной ссылкой.
     """
-    data = []
-    for link in tqdm(links):
-        data.append(
-            {
-                'text': await parse(link),
-                'source': link
-            }
-        )
-    with open(JSON_PATH, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-    return [Document(page_content=doc["text"], metadata={"source": doc["source"]}) for doc in tqdm(data)]
+    parsed = {}
+    async for doc in iter_parsed(links, workers, fetch_rate, llm_rate, page_cache_dir):
+        parsed[doc['source']] = doc
+    data = [parsed[link] for link in links if link in parsed]
 
+    if json_path is not None:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+    return dicts_to_documents(data)
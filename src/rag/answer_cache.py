@@ -0,0 +1,247 @@
+import fcntl
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import List
+
+import numpy as np
+from loguru import logger
+
+from config import (ANSWER_CACHE_DIR, ANSWER_CACHE_MAX_SIZE, ANSWER_CACHE_PERSIST, ANSWER_CACHE_THRESHOLD,
+                    ANSWER_CACHE_TTL)
+
+
+@dataclass
+class CacheEntry:
+    query: str
+    embedding: List[float] | None
+    answer: str
+    created_at: float
+
+
+def normalize_query(query: str) -> str:
+    """Приводит вопрос к каноническому виду для точного совпадения в кэше.
+
+    Args:
+        query (str): Исходный текст вопроса.
+
+    Returns:
+        str: Вопрос в нижнем регистре без лишних пробелов и пунктуации по краям.
+    """
+    query = re.sub(r'\s+', ' ', query.lower().replace('ё', 'е'))
+    return query.strip(' .,!?;:"\'«»')
+
+
+def cache_path(name: str) -> str | None:
+    """Путь к файлу кэша ответов с именем `name` или None, если сохранение отключено.
+
+    Кэш хранит тексты вопросов пользователей, поэтому его сохранение на диск можно
+    отключить переменной окружения `ANSWER_CACHE_PERSIST=0`.
+
+    Args:
+        name (str): Имя кэша, например 'bot' или 'cli'.
+
+    Returns:
+        str | None: Путь для `AnswerCache(persist_path=...)`.
+    """
+    return os.path.join(ANSWER_CACHE_DIR, f'{name}.json') if ANSWER_CACHE_PERSIST else None
+
+
+class AnswerCache:
+    """Двухуровневый кэш ответов: точное совпадение нормализованного вопроса
+    и семантическое совпадение по косинусной близости эмбеддингов.
+
+    Записи вытесняются по принципу LRU и устаревают через `ttl` секунд. Кэш привязан
+    к версии индекса и очищается, когда векторная база пересобирается.
+
+    Args:
+        max_size (int): Максимальное число записей.
+        ttl (float): Время жизни записи в секундах.
+        threshold (float): Минимальная косинусная близость для семантического попадания.
+        persist_path (str | None): Путь к JSON-файлу для сохранения кэша между запусками.
+    """
+
+    def __init__(self,
+                 max_size: int = ANSWER_CACHE_MAX_SIZE,
+                 ttl: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD,
+                 persist_path: str | None = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.persist_path = persist_path
+        self.index_version: str | None = None
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        if persist_path and os.path.exists(persist_path):
+            self.load()
+
+    def bind_index(self, index_version: str):
+        """Привязывает кэш к версии векторной базы, очищая его при смене версии.
+
+        Args:
+            index_version (str): Идентификатор текущей версии индекса.
+        """
+        if self.index_version != index_version:
+            if self.entries:
+                logger.info('Индекс пересобран, кэш ответов очищен')
+            self.clear()
+            self.index_version = index_version
+
+    def clear(self):
+        """Удаляет все записи кэша."""
+        self.entries.clear()
+
+    def _is_expired(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.created_at > self.ttl
+
+    def _evict_expired(self):
+        for key in [key for key, entry in self.entries.items() if self._is_expired(entry)]:
+            del self.entries[key]
+
+    def get_exact(self, query: str) -> str | None:
+        """Ищет ответ по точному совпадению нормализованного вопроса.
+
+        Промах не учитывается в статистике: после него обычно проверяется семантическое совпадение.
+
+        Args:
+            query (str): Текст вопроса.
+
+        Returns:
+            str | None: Кэшированный ответ или None.
+        """
+        key = normalize_query(query)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if self._is_expired(entry):
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        self.exact_hits += 1
+        return entry.answer
+
+    def get_similar(self, embedding: List[float]) -> str | None:
+        """Ищет ответ на наиболее близкий по смыслу вопрос.
+
+        Args:
+            embedding (List[float]): Нормализованный эмбеддинг вопроса.
+
+        Returns:
+            str | None: Кэшированный ответ или None, если близость ниже порога.
+        """
+        self._evict_expired()
+        candidates = [(key, entry) for key, entry in self.entries.items() if entry.embedding is not None]
+        if not candidates:
+            self.misses += 1
+            return None
+        matrix = np.asarray([entry.embedding for _, entry in candidates], dtype=np.float32)
+        scores = matrix @ np.asarray(embedding, dtype=np.float32)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+        key, entry = candidates[best]
+        self.entries.move_to_end(key)
+        self.semantic_hits += 1
+        return entry.answer
+
+    def put(self, query: str, embedding: List[float] | None, answer: str, index_version: str | None = None):
+        """Сохраняет ответ в кэш.
+
+        Args:
+            query (str): Текст вопроса.
+            embedding (List[float] | None): Эмбеддинг вопроса.
+            answer (str): Ответ.
+            index_version (str | None): Версия индекса, по которой искался контекст ответа.
+                Если с тех пор индекс сменился, ответ не сохраняется.
+        """
+        if index_version is not None and index_version != self.index_version:
+            logger.debug(f'Ответ построен по прежней версии индекса и не кэшируется: {query!r}')
+            return
+        key = normalize_query(query)
+        if embedding is not None:
+            embedding = [float(x) for x in embedding]
+        self.entries[key] = CacheEntry(query, embedding, answer, time.time())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    @property
+    def stats(self) -> dict:
+        """Счётчики попаданий и промахов кэша."""
+        return {
+            'size': len(self.entries),
+            'exact_hits': self.exact_hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+        }
+
+    def _read(self) -> dict | None:
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as ex:
+            logger.warning(f'Не удалось загрузить кэш ответов: {ex}')
+            return None
+
+    def _entries(self, data: dict) -> List[CacheEntry]:
+        """Записи из прочитанного файла кэша; повреждённые записи пропускаются."""
+        entries = []
+        for item in data.get('entries', []):
+            try:
+                entry = CacheEntry(**item)
+                entry.created_at = float(entry.created_at)
+                if not isinstance(entry.query, str) or not isinstance(entry.answer, str):
+                    raise TypeError(f'вопрос и ответ должны быть строками: {item!r}')
+                entries.append(entry)
+            except (TypeError, KeyError, ValueError) as ex:
+                logger.warning(f'Пропущена повреждённая запись кэша ответов: {ex}')
+        return entries
+
+    def save(self):
+        """Сохраняет кэш в `persist_path`.
+
+        Одним файлом могут пользоваться несколько процессов (например, бот и `cli.py batch --prompt bot`),
+        поэтому записи, сохранённые другим процессом для той же версии индекса, не затираются,
+        а объединяются с текущими: для одного вопроса остаётся более свежий ответ.
+        """
+        if not self.persist_path:
+            return
+        self._evict_expired()
+        os.makedirs(os.path.dirname(self.persist_path) or '.', exist_ok=True)
+        with open(self.persist_path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = dict(self.entries)
+            data = self._read()
+            if data is not None and data.get('index_version') == self.index_version:
+                for entry in self._entries(data):
+                    key = normalize_query(entry.query)
+                    if not self._is_expired(entry) and (key not in entries
+                                                        or entries[key].created_at < entry.created_at):
+                        entries[key] = entry
+            newest = sorted(entries.values(), key=lambda entry: entry.created_at)[-self.max_size:]
+            data = {
+                'index_version': self.index_version,
+                'entries': [asdict(entry) for entry in newest],
+            }
+            with open(self.persist_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(self.persist_path + '.tmp', self.persist_path)
+
+    def load(self):
+        """Загружает кэш из `persist_path`."""
+        data = self._read()
+        if data is None:
+            return
+        self.index_version = data.get('index_version')
+        for entry in self._entries(data):
+            if not self._is_expired(entry):
+                self.entries[normalize_query(entry.query)] = entry
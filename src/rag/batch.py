@@ -0,0 +1,185 @@
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from typing import IO, Iterator, List, Set
+
+from loguru import logger
+from tqdm import tqdm
+
+from config import BATCH_CONCURRENCY, BATCH_SIZE
+from rag.answer_cache import normalize_query
+from rag.pipeline import RagPipeline
+
+
+def question_id(record: dict) -> str:
+    """Идентификатор вопроса: поле 'id', а если его нет — нормализованный текст вопроса."""
+    return str(record['id']) if record.get('id') not in (None, '') else normalize_query(record['question'])
+
+
+def _read_lines(f: IO[str]) -> Iterator[dict]:
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        yield json.loads(line) if line.startswith('{') else {'question': line}
+
+
+def read_questions(path: str) -> List[dict]:
+    """Читает вопросы из JSONL- или CSV-файла либо из stdin.
+
+    JSONL: объекты с полем 'question' (и необязательным 'id'). CSV: столбец 'question'
+    (или первый столбец) и необязательный 'id'. stdin ('-'): по вопросу на строку или JSONL.
+
+    Args:
+        path (str): Путь к файлу или '-' для stdin.
+
+    Returns:
+        List[dict]: Вопросы без повторов, в порядке первого появления.
+    """
+    if path == '-':
+        records = list(_read_lines(sys.stdin))
+    elif path.endswith('.csv'):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            column = 'question' if 'question' in reader.fieldnames else reader.fieldnames[0]
+            records = [{'id': row.get('id'), 'question': row[column]} for row in reader]
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            records = list(_read_lines(f))
+
+    questions, seen = [], set()
+    for record in records:
+        if not record.get('question', '').strip():
+            continue
+        record['id'] = question_id(record)
+        if record['id'] not in seen:
+            seen.add(record['id'])
+            questions.append(record)
+    return questions
+
+
+def load_answered(output_path: str) -> Set[str]:
+    """Возвращает идентификаторы вопросов, уже успешно обработанных в выходном файле.
+
+    Вопросы, на которые был дан запасной ответ без LLM, успешными не считаются
+    и обрабатываются повторно, как и вопросы с ошибкой.
+
+    Args:
+        output_path (str): Путь к выходному JSONL-файлу.
+
+    Returns:
+        Set[str]: Идентификаторы вопросов без ошибок и запасных ответов.
+    """
+    answered = set()
+    if not os.path.exists(output_path):
+        return answered
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Последняя строка могла остаться недописанной при прерывании
+                continue
+            if not record.get('error') and not record.get('fallback'):
+                answered.add(record['id'])
+    return answered
+
+
+async def answer_questions(pipeline: RagPipeline,
+                           questions: List[dict],
+                           output_path: str,
+                           batch_size: int = BATCH_SIZE,
+                           concurrency: int = BATCH_CONCURRENCY) -> dict:
+    """Отвечает на список вопросов и дописывает результаты в JSONL-файл по мере готовности.
+
+    Вопросы, на которые в `output_path` уже есть ответ LLM или из кэша, пропускаются,
+    поэтому прерванный запуск можно продолжить той же командой. Эмбеддинги и поиск выполняются пачками по
+    `batch_size` вопросов, запросы к GigaChat — не более `concurrency` одновременно.
+
+    Каждая строка результата содержит 'id', 'question', 'answer', 'sources', 'scores'
+    (расстояние до ближайшего чанка источника), 'cached', 'fallback', 'timings' (секунды;
+    'embedding' и 'search' — доля времени пачки) и 'error' при ошибке.
+
+    Args:
+        pipeline (RagPipeline): RAG-конвейер.
+        questions (List[dict]): Вопросы из `read_questions`.
+        output_path (str): Путь к выходному JSONL-файлу.
+        batch_size (int): Размер пачки для эмбеддингов и поиска.
+        concurrency (int): Число одновременных запросов к GigaChat.
+
+    Returns:
+        dict: Статистика: всего, пропущено, отвечено, из кэша, без LLM, с ошибкой.
+    """
+    answered = load_answered(output_path)
+    pending = [question for question in questions if question['id'] not in answered]
+    stats = {'total': len(questions), 'skipped': len(questions) - len(pending),
+             'answered': 0, 'cached': 0, 'fallback': 0, 'errors': 0}
+    logger.info(f'Вопросов: {len(questions)}, уже обработано: {stats["skipped"]}')
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with open(output_path, 'a', encoding='utf-8') as out, tqdm(total=len(pending), desc='Ответы') as progress:
+        def write(record: dict):
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            stats['errors' if record.get('error') else 'answered'] += 1
+            stats['cached'] += record.get('cached', False)
+            stats['fallback'] += record.get('fallback', False)
+            progress.update()
+
+        async def answer_one(question: dict, embedding: List[float], relevant_docs: list, timings: dict,
+                             index_version: str | None):
+            record = {'id': question['id'], 'question': question['question']}
+            started = time.perf_counter()
+            try:
+                cached = pipeline.cached(question['question'], embedding)
+                prompt, context = pipeline.build_prompt(question['question'], relevant_docs)
+                timings['prompt'] = time.perf_counter() - started
+                record.update(sources=context.sources, scores=context.scores, cached=cached is not None)
+                if cached is not None:
+                    answer, fallback = cached, False
+                else:
+                    async with semaphore:
+                        llm_started = time.perf_counter()
+                        answer, fallback = await pipeline.complete(prompt, context)
+                        timings['llm'] = time.perf_counter() - llm_started
+                    if pipeline.cache is not None and not fallback:
+                        pipeline.cache.put(question['question'], embedding, answer, index_version)
+                record.update(answer=answer, fallback=fallback)
+            except Exception as ex:
+                logger.error(f'Ошибка ответа на вопрос {question["id"]!r}: {ex!r}')
+                record['error'] = repr(ex)
+            timings['total'] = timings['embedding'] + timings['search'] + time.perf_counter() - started
+            record['timings'] = {stage: round(seconds, 4) for stage, seconds in timings.items()}
+            write(record)
+
+        tasks = []
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            texts = [question['question'] for question in batch]
+            index_version = pipeline.index_version
+            try:
+                started = time.perf_counter()
+                embeddings = await pipeline.retriever.embed_many(texts)
+                embedded = time.perf_counter()
+                results = await pipeline.retriever.search_many(embeddings, k=pipeline.k)
+                searched = time.perf_counter()
+            except Exception as ex:
+                logger.error(f'Ошибка поиска для пачки из {len(batch)} вопросов: {ex!r}')
+                for question in batch:
+                    write({'id': question['id'], 'question': question['question'], 'error': repr(ex)})
+                continue
+            timings = {'embedding': (embedded - started) / len(batch), 'search': (searched - embedded) / len(batch)}
+            tasks += [asyncio.create_task(answer_one(question, embedding, relevant_docs, dict(timings), index_version))
+                      for question, embedding, relevant_docs in zip(batch, embeddings, results)]
+            # Не накапливаем больше пачки ожидающих ответов GigaChat
+            tasks = [task for task in tasks if not task.done()]
+            while len(tasks) > batch_size:
+                _, rest = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                tasks = list(rest)
+        await asyncio.gather(*tasks)
+
+    logger.info(f'Пакетная обработка завершена: {stats}')
+    return stats
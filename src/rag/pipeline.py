@@ -0,0 +1,209 @@
+import asyncio
+from typing import AsyncIterator, List, Tuple
+
+import aiohttp
+from langchain_core.documents import Document
+
+from loguru import logger
+
+from api_utils.gigachat_api_utils import GigaChatError
+from api_utils.gigachat_client import CircuitOpenError, GigaChatClient, gigachat_client
+from config import CONTEXT_CANDIDATES, CONTEXT_TOKEN_BUDGET
+from monitoring.metrics import CACHE_TOTAL, CONTEXT_CHARS, PROMPT_CHARS, PROMPT_TOKENS, annotate, span
+from rag.answer_cache import AnswerCache, normalize_query
+from rag.single_flight import SingleFlight
+from vec_db.retrieval_client import RemoteSnapshot, RetrievalClient
+from vec_db.retriever import AsyncRetriever, IndexSnapshot
+from vec_db.context import PackedContext, count_tokens, pack_context
+
+FALLBACK_ERRORS = (CircuitOpenError, GigaChatError, aiohttp.ClientError, asyncio.TimeoutError)
+
+
+def fallback_answer(context: PackedContext) -> str:
+    """Формирует ответ без LLM: список найденных по запросу источников.
+
+    Args:
+        context (PackedContext): Собранный контекст.
+
+    Returns:
+        str: Текст ответа.
+    """
+    if not context.sources:
+        return 'Сервис генерации ответов временно недоступен. Попробуйте позже.'
+    lines = ['Сервис генерации ответов временно недоступен. Возможно, ответ есть в этих материалах:']
+    for number, (source, title) in enumerate(zip(context.sources, context.titles), start=1):
+        lines.append(f'{number}. {title} — {source}' if title else f'{number}. {source}')
+    return '\n'.join(lines)
+
+
+class RagPipeline:
+    """Полный путь ответа на вопрос: кэш → поиск контекста → промпт → GigaChat.
+
+    Args:
+        retriever (AsyncRetriever | RetrievalClient): Поисковик в процессе или клиент сервиса поиска.
+        prompt_template (str): Шаблон промпта с полями {context} и {query}.
+        cache (AnswerCache | None): Кэш ответов. Если не задан, ответы не кэшируются.
+        k (int): Размер пула кандидатов для сборки контекста.
+        budget (int): Бюджет контекста в токенах.
+        client (GigaChatClient): Клиент GigaChat.
+
+    Если GigaChat недоступен, возвращается список найденных источников (такой ответ не кэшируется).
+    Одновременные одинаковые (после нормализации) вопросы выполняются один раз.
+    """
+
+    def __init__(self,
+                 retriever: AsyncRetriever | RetrievalClient,
+                 prompt_template: str,
+                 cache: AnswerCache | None = None,
+                 k: int = CONTEXT_CANDIDATES,
+                 budget: int = CONTEXT_TOKEN_BUDGET,
+                 client: GigaChatClient = gigachat_client):
+        self.retriever = retriever
+        self.prompt_template = prompt_template
+        self.cache = cache
+        self.k = k
+        self.budget = budget
+        self.client = client
+        self.flights = SingleFlight()
+
+    def cached(self, query: str, embedding: List[float] | None = None) -> str | None:
+        """Ищет ответ в кэше: по точному совпадению вопроса, а если передан эмбеддинг — и по смыслу.
+
+        Args:
+            query (str): Вопрос пользователя.
+            embedding (List[float] | None): Эмбеддинг вопроса.
+
+        Returns:
+            str | None: Кэшированный ответ или None.
+        """
+        if self.cache is None:
+            return None
+        cached = self.cache.get_exact(query)
+        if cached is not None:
+            logger.debug(f'Кэш ответов (точное совпадение): {query!r}')
+            CACHE_TOTAL.inc(result='exact_hit')
+            return cached
+        if embedding is None:
+            return None
+        cached = self.cache.get_similar(embedding)
+        if cached is not None:
+            logger.debug(f'Кэш ответов (семантическое совпадение): {query!r}')
+            CACHE_TOTAL.inc(result='semantic_hit')
+            return cached
+        CACHE_TOTAL.inc(result='miss')
+        return None
+
+    async def _lookup(self, index: IndexSnapshot | RemoteSnapshot,
+                      query: str) -> tuple[str | None, List[float] | None]:
+        cached = self.cached(query)
+        if cached is not None:
+            return cached, None
+        embedding = await index.embed(query)
+        return self.cached(query, embedding), embedding
+
+    def build_prompt(self, query: str, relevant_docs: List[Tuple[Document, float]]) -> tuple[str, PackedContext]:
+        """Собирает промпт из найденных документов.
+
+        Args:
+            query (str): Вопрос пользователя.
+            relevant_docs (List[Tuple[Document, float]]): Пары (документ, расстояние до запроса).
+
+        Returns:
+            tuple[str, PackedContext]: Промпт и собранный контекст.
+        """
+        with span('prompt_build'):
+            context = pack_context(relevant_docs, self.budget)
+            prompt = self.prompt_template.format(context=context.text, query=query)
+        prompt_tokens = count_tokens(prompt)
+        CONTEXT_CHARS.observe(len(context.text))
+        PROMPT_CHARS.observe(len(prompt))
+        PROMPT_TOKENS.observe(prompt_tokens)
+        annotate(prompt_tokens=prompt_tokens, context_tokens=context.tokens, context_chunks=context.chunks,
+                 context_sources=len(context.sources), candidates=context.candidates)
+        return prompt, context
+
+    async def _build_prompt(self, index: IndexSnapshot | RemoteSnapshot,
+                            query: str, embedding: List[float]) -> tuple[str, PackedContext]:
+        relevant_docs = await index.search_by_vector(embedding, k=self.k)
+        return self.build_prompt(query, relevant_docs)
+
+    async def complete(self, prompt: str, context: PackedContext) -> tuple[str, bool]:
+        """Генерирует ответ по готовому промпту.
+
+        Args:
+            prompt (str): Промпт.
+            context (PackedContext): Контекст промпта (для ответа без LLM).
+
+        Returns:
+            tuple[str, bool]: Ответ и признак того, что GigaChat был недоступен и ответ
+                составлен из найденных источников.
+        """
+        try:
+            return await self.client.complete(prompt), False
+        except FALLBACK_ERRORS as ex:
+            logger.error(f'GigaChat недоступен, ответ из найденных источников: {ex!r}')
+            annotate(fallback=True)
+            return fallback_answer(context), True
+
+    async def answer(self, query: str) -> str:
+        """Отвечает на вопрос пользователя.
+
+        Args:
+            query (str): Вопрос пользователя.
+
+        Returns:
+            str: Ответ GigaChat (или кэшированный ответ).
+        """
+        return await self.flights.run(normalize_query(query), lambda: self._answer(query))
+
+    async def _answer(self, query: str) -> str:
+        # Эмбеддинг, поиск и запись в кэш выполняются на одной версии индекса
+        index = self.retriever.snapshot()
+        cached, embedding = await self._lookup(index, query)
+        if cached is not None:
+            return cached
+
+        prompt, context = await self._build_prompt(index, query, embedding)
+        answer, fallback = await self.complete(prompt, context)
+        if self.cache is not None and not fallback:
+            self.cache.put(query, embedding, answer, index.version)
+        return answer
+
+    async def stream(self, query: str) -> AsyncIterator[str]:
+        """Отвечает на вопрос пользователя, отдавая текст ответа по мере генерации.
+
+        Кэшированный ответ отдаётся одним фрагментом.
+
+        Args:
+            query (str): Вопрос пользователя.
+
+        Yields:
+            str: Очередной фрагмент ответа.
+        """
+        async for delta in self.flights.stream(normalize_query(query), lambda: self._stream(query)):
+            yield delta
+
+    async def _stream(self, query: str) -> AsyncIterator[str]:
+        # Эмбеддинг, поиск и запись в кэш выполняются на одной версии индекса
+        index = self.retriever.snapshot()
+        cached, embedding = await self._lookup(index, query)
+        if cached is not None:
+            yield cached
+            return
+
+        prompt, context = await self._build_prompt(index, query, embedding)
+        parts = []
+        try:
+            async for delta in self.client.stream(prompt):
+                parts.append(delta)
+                yield delta
+        except FALLBACK_ERRORS as ex:
+            if parts:
+                raise
+            logger.error(f'GigaChat недоступен, ответ из найденных источников: {ex!r}')
+            annotate(fallback=True)
+            yield fallback_answer(context)
+            return
+
+        if self.cache is not None and parts:
+            self.cache.put(query, embedding, ''.join(parts), index.version)
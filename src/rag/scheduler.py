@@ -0,0 +1,100 @@
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable
+
+from config import BOT_CHAT_CONCURRENCY, BOT_CONCURRENCY, BOT_QUEUE_SIZE
+from monitoring.metrics import QUEUE_DEPTH, QUEUE_REJECTED_TOTAL, QUEUE_WAIT_SECONDS, span
+
+
+class QueueFullError(Exception):
+    """Очередь запросов переполнена."""
+
+
+class SupersededError(Exception):
+    """Запрос вытеснен более новым сообщением из того же чата, пока ждал в очереди."""
+
+
+class RequestScheduler:
+    """Ограничивает число одновременно обрабатываемых вопросов.
+
+    - не более `concurrency` вопросов обрабатываются одновременно, остальные ждут;
+    - если ждут уже `max_queue` вопросов, новый сразу отклоняется (`QueueFullError`);
+    - в одном чате одновременно обрабатывается не более `per_chat` вопросов;
+    - ожидающий вопрос отбрасывается (`SupersededError`), если из того же чата пришёл более новый;
+    - вопросы, ждущие готовности бота (`ready`), тоже занимают место в очереди.
+
+    Args:
+        concurrency (int): Число одновременно обрабатываемых вопросов.
+        max_queue (int): Максимальное число ожидающих вопросов.
+        per_chat (int): Число одновременно обрабатываемых вопросов одного чата.
+    """
+
+    def __init__(self,
+                 concurrency: int = BOT_CONCURRENCY,
+                 max_queue: int = BOT_QUEUE_SIZE,
+                 per_chat: int = BOT_CHAT_CONCURRENCY):
+        self.slots = asyncio.Semaphore(concurrency)
+        self.max_queue = max_queue
+        self.per_chat = per_chat
+        self.waiting = 0
+        self._tickets = itertools.count()
+        self._latest: Dict[Hashable, int] = {}
+        self._chat_slots: Dict[Hashable, asyncio.Semaphore] = {}
+        self._chat_users: Dict[Hashable, int] = {}
+
+    def _check_latest(self, chat_id: Hashable, ticket: int):
+        if self._latest.get(chat_id) != ticket:
+            QUEUE_REJECTED_TOTAL.inc(reason='superseded')
+            raise SupersededError(f'Вопрос из чата {chat_id} вытеснен более новым')
+
+    @property
+    def full(self) -> bool:
+        """Очередь заполнена: новый вопрос будет отклонён."""
+        return self.waiting >= self.max_queue
+
+    @asynccontextmanager
+    async def admit(self, chat_id: Hashable, ready: asyncio.Event | None = None) -> AsyncIterator[None]:
+        """Ожидает очереди на обработку вопроса из чата `chat_id`.
+
+        Args:
+            chat_id (Hashable): Идентификатор чата.
+            ready (asyncio.Event | None): Событие готовности (например, окончания прогрева бота),
+                которого вопрос ждёт, уже заняв место в очереди.
+
+        Raises:
+            QueueFullError: Если очередь переполнена.
+            SupersededError: Если во время ожидания из чата пришёл более новый вопрос.
+        """
+        if self.full:
+            QUEUE_REJECTED_TOTAL.inc(reason='full')
+            raise QueueFullError('Очередь запросов переполнена')
+        ticket = next(self._tickets)
+        self._latest[chat_id] = ticket
+        chat_slots = self._chat_slots.setdefault(chat_id, asyncio.Semaphore(self.per_chat))
+        self._chat_users[chat_id] = self._chat_users.get(chat_id, 0) + 1
+        self.waiting += 1
+        QUEUE_DEPTH.set(self.waiting)
+        started = time.perf_counter()
+        queued = True
+        try:
+            if ready is not None and not ready.is_set():
+                with span('warmup_wait'):
+                    await ready.wait()
+            async with chat_slots:
+                self._check_latest(chat_id, ticket)
+                async with self.slots:
+                    self._check_latest(chat_id, ticket)
+                    self.waiting -= 1
+                    queued = False
+                    QUEUE_DEPTH.set(self.waiting)
+                    QUEUE_WAIT_SECONDS.observe(time.perf_counter() - started)
+                    yield
+        finally:
+            if queued:
+                self.waiting -= 1
+                QUEUE_DEPTH.set(self.waiting)
+            self._chat_users[chat_id] -= 1
+            if not self._chat_users[chat_id]:
+                del self._chat_users[chat_id], self._chat_slots[chat_id], self._latest[chat_id]
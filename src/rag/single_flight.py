@@ -0,0 +1,120 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Set
+
+from monitoring.metrics import COALESCED_TOTAL
+
+
+def _copy_error(error: BaseException) -> BaseException:
+    # Копия без вызова __init__: у исключений вроде GigaChatError он требует других аргументов, чем args
+    copy = type(error).__new__(type(error), *error.args)
+    copy.__dict__.update(error.__dict__)
+    return copy
+
+
+class Broadcast:
+    """Поток фрагментов, который могут читать несколько подписчиков.
+
+    Подписчик, подключившийся позже, сначала получает уже накопленные фрагменты.
+    Ошибку источника каждый подписчик получает в виде своей копии (исходная — в `__cause__`),
+    чтобы трассировки разных подписчиков не накапливались в одном объекте исключения.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error: BaseException | None = None
+        self._changed = asyncio.Event()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def push(self, part: str):
+        self.parts.append(part)
+        self._wake()
+
+    def finish(self, error: BaseException | None = None):
+        self.done = True
+        self.error = error
+        self._wake()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            while position < len(self.parts):
+                yield self.parts[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise _copy_error(self.error) from self.error
+                return
+            await self._changed.wait()
+
+
+class SingleFlight:
+    """Объединяет одновременные одинаковые вызовы: пока вызов с ключом выполняется,
+    новые вызовы с тем же ключом получают его результат, а не запускают работу заново.
+
+    Работа выполняется в отдельной задаче, поэтому отключение первого вызывающего
+    не прерывает ответ для остальных.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, Broadcast] = {}
+        # Цикл событий хранит только слабые ссылки на задачи, поэтому ссылки на них держим сами
+        self._pumps: Set[asyncio.Task] = set()
+
+    async def run(self, key: str, factory: Callable[[], Awaitable]):
+        """Выполняет `factory()` или присоединяется к уже выполняющемуся вызову с ключом `key`.
+
+        Args:
+            key (str): Ключ вызова.
+            factory (Callable[[], Awaitable]): Создаёт корутину для выполнения.
+
+        Returns:
+            Результат корутины.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            COALESCED_TOTAL.inc(operation='answer')
+        return await asyncio.shield(task)
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Потоковый вариант `run`: все вызывающие получают одни и те же фрагменты.
+
+        Args:
+            key (str): Ключ вызова.
+            factory (Callable[[], AsyncIterator[str]]): Создаёт асинхронный генератор фрагментов.
+
+        Yields:
+            str: Очередной фрагмент.
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = Broadcast()
+            self._streams[key] = broadcast
+            pump = asyncio.ensure_future(self._pump(key, factory, broadcast))
+            self._pumps.add(pump)
+            pump.add_done_callback(self._pumps.discard)
+        else:
+            COALESCED_TOTAL.inc(operation='stream')
+        async for part in broadcast.subscribe():
+            yield part
+
+    async def _pump(self, key: str, factory: Callable[[], AsyncIterator[str]], broadcast: Broadcast):
+        try:
+            async for part in factory():
+                broadcast.push(part)
+        except BaseException as ex:
+            broadcast.finish(ex)
+            if not isinstance(ex, Exception):
+                raise
+        else:
+            broadcast.finish()
+        finally:
+            self._streams.pop(key, None)
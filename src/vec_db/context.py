@@ -0,0 +1,144 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+from config import CONTEXT_CHARS_PER_TOKEN, CONTEXT_DEDUP_THRESHOLD, CONTEXT_MAX_DISTANCE, CONTEXT_TOKEN_BUDGET
+
+FRAGMENT_GAP = "\n[…]\n"
+
+
+@dataclass
+class PackedContext:
+    """Контекст, собранный в пределах бюджета токенов.
+
+    Attributes:
+        text (str): Текст контекста для промпта.
+        sources (List[str]): Источники в порядке их номеров в контексте.
+        titles (List[str]): Заголовки источников (первый найденный заголовок чанка или пустая строка).
+        scores (List[float]): Наименьшее расстояние до запроса среди чанков каждого источника.
+        tokens (int): Оценка размера контекста в токенах.
+        chunks (int): Сколько чанков вошло в контекст.
+        candidates (int): Сколько кандидатов было получено из поиска.
+    """
+    text: str
+    sources: List[str] = field(default_factory=list)
+    titles: List[str] = field(default_factory=list)
+    scores: List[float] = field(default_factory=list)
+    tokens: int = 0
+    chunks: int = 0
+    candidates: int = 0
+
+
+def count_tokens(text: str, chars_per_token: float = CONTEXT_CHARS_PER_TOKEN) -> int:
+    """Приблизительно оценивает число токенов GigaChat в тексте по его длине.
+
+    Args:
+        text (str): Текст.
+        chars_per_token (float): Среднее число символов на токен.
+
+    Returns:
+        int: Оценка числа токенов.
+    """
+    return int(len(text) / chars_per_token) + 1
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r'\w+', text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+
+def _is_near_duplicate(shingles: set, selected: List[set], threshold: float) -> bool:
+    for other in selected:
+        union = len(shingles | other)
+        if union and len(shingles & other) / union >= threshold:
+            return True
+    return False
+
+
+def pack_context(relevant_docs: List[Tuple[Document, float]],
+                 budget: int = CONTEXT_TOKEN_BUDGET,
+                 max_distance: float = CONTEXT_MAX_DISTANCE,
+                 dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD) -> PackedContext:
+    """Собирает контекст из кандидатов поиска в пределах бюджета токенов.
+
+    Отбрасывает далёкие от запроса чанки (лучший кандидат остаётся всегда) и почти
+    повторяющиеся чанки, объединяет чанки одного источника в один блок и добавляет блоки
+    по убыванию релевантности. Чанки источника допускаются в бюджет тоже по убыванию
+    релевантности, а выводятся в порядке следования в документе (несоседние фрагменты
+    разделяются пометкой `[…]`). Если в бюджет не помещается
+    даже лучший чанк, в контекст попадает его начало. Каждый источник получает номер,
+    на который может сослаться модель.
+
+    Args:
+        relevant_docs (List[Tuple[Document, float]]): Пары (документ, расстояние до запроса),
+            отсортированные по релевантности.
+        budget (int): Бюджет контекста в токенах.
+        max_distance (float): Максимальное расстояние до запроса.
+        dedup_threshold (float): Порог сходства Жаккара по триграммам слов для удаления повторов.
+
+    Returns:
+        PackedContext: Собранный контекст и его размер.
+    """
+    selected: List[Tuple[Document, float]] = []
+    selected_shingles: List[set] = []
+    for rank, (doc, score) in enumerate(relevant_docs):
+        if rank and score > max_distance:
+            continue
+        shingles = _shingles(doc.page_content)
+        if _is_near_duplicate(shingles, selected_shingles, dedup_threshold):
+            continue
+        selected.append((doc, score))
+        selected_shingles.append(shingles)
+
+    groups: Dict[str, List[Tuple[int, Document]]] = {}
+    best_scores: Dict[str, float] = {}
+    for rank, (doc, score) in enumerate(selected):
+        source = doc.metadata.get('source', 'Источник не указан')
+        groups.setdefault(source, []).append((rank, doc))
+        best_scores[source] = min(score, best_scores.get(source, score))
+
+    packed = PackedContext(text='', candidates=len(relevant_docs))
+    blocks = []
+    for source, items in groups.items():
+        number = len(packed.sources) + 1
+        header = f"[{number}] Источник: {source}\n"
+        used = count_tokens(header)
+        # Чанки допускаются в бюджет по релевантности, чтобы ранние в документе не вытеснили лучший
+        admitted: List[Tuple[int, Document]] = []
+        for rank, doc in items:
+            cost = count_tokens(doc.page_content)
+            if packed.tokens + used + cost > budget:
+                continue
+            admitted.append((rank, doc))
+            used += cost
+        # Чанки с номером выводятся в порядке документа, без номера — после них в порядке релевантности
+        admitted.sort(key=lambda item: ('chunk' not in item[1].metadata, item[1].metadata.get('chunk', 0), item[0]))
+        fragments: List[List[str]] = []
+        previous = None
+        for _, doc in admitted:
+            chunk = doc.metadata.get('chunk')
+            # Подряд склеиваются только соседние чанки документа, между остальными — разрыв
+            if not fragments or chunk is None or previous is None or chunk != previous + 1:
+                fragments.append([])
+            fragments[-1].append(doc.page_content)
+            previous = chunk
+        if not fragments and not blocks:
+            # Заголовок и лучший чанк не помещаются в бюджет: лучший чанк обрезается, а не теряется
+            best = items[0][1]
+            room = int((budget - used - 1) * CONTEXT_CHARS_PER_TOKEN)
+            if room > 0:
+                fragments.append([best.page_content[:room]])
+                used += count_tokens(fragments[0][0])
+        if not fragments:
+            continue
+        packed.sources.append(source)
+        packed.scores.append(best_scores[source])
+        packed.titles.append(next((doc.metadata['Header'] for _, doc in items if doc.metadata.get('Header')), ''))
+        packed.tokens += used
+        packed.chunks += sum(len(fragment) for fragment in fragments)
+        blocks.append(header + FRAGMENT_GAP.join("\n".join(fragment) for fragment in fragments) + "\n")
+
+    packed.text = "\n".join(blocks)
+    return packed
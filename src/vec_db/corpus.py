@@ -0,0 +1,148 @@
+import json
+import os
+from typing import Dict, Iterable, Iterator, List
+
+from loguru import logger
+
+
+class CorpusStore:
+    """Корпус извлечённых документов в JSONL-файле: по документу `{"source", "text"}` на строку.
+
+    Документы только дописываются в конец файла, поэтому прерванный парсинг не теряет
+    уже обработанные страницы. Если источник записан несколько раз, действует последняя запись.
+    В памяти хранятся только смещения последних записей, тексты читаются с диска по мере обхода.
+
+    Файл при открытии только читается. Недописанная при прерывании последняя запись
+    отбрасывается перед первой дозаписью и только если файл действительно JSONL-корпус.
+
+    Args:
+        path (str): Путь к JSONL-файлу.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets: Dict[str, int] = {}
+        self.records = 0
+        # Смещение недописанной последней записи, которая будет отброшена перед дозаписью
+        self._torn_offset: int | None = None
+        if os.path.exists(path):
+            self._scan()
+
+    def _scan(self):
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    logger.warning(f'{self.path}: недописанная запись по смещению {offset} не читается')
+                    self._torn_offset = offset
+                    break
+                try:
+                    self.offsets[json.loads(line)['source']] = offset
+                    self.records += 1
+                except (json.JSONDecodeError, KeyError):
+                    logger.warning(f'{self.path}: пропущена повреждённая запись по смещению {offset}')
+                offset += len(line)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __contains__(self, source: str) -> bool:
+        return source in self.offsets
+
+    @property
+    def sources(self) -> List[str]:
+        """Источники в порядке их последней записи."""
+        return sorted(self.offsets, key=self.offsets.get)
+
+    def append(self, doc: dict):
+        """Дописывает документ в корпус.
+
+        Args:
+            doc (dict): Документ с ключами 'source' и 'text'.
+        """
+        line = (json.dumps({'source': doc['source'], 'text': doc['text']}, ensure_ascii=False) + '\n').encode('utf-8')
+        if self._torn_offset is not None:
+            self._repair_tail()
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            f.write(line)
+        self.offsets[doc['source']] = offset
+        self.records += 1
+
+    def _repair_tail(self):
+        # Обрезается только JSONL-корпус, иначе запись в чужой файл (например, `data.json`) испортила бы его
+        if not self.path.endswith('.jsonl') or (self._torn_offset and not self.records):
+            raise ValueError(f'{self.path} не является JSONL-корпусом, дозапись в него невозможна')
+        with open(self.path, 'rb+') as f:
+            f.truncate(self._torn_offset)
+        logger.warning(f'{self.path}: отброшена недописанная запись по смещению {self._torn_offset}')
+        self._torn_offset = None
+
+    def get(self, source: str) -> dict | None:
+        """Читает последнюю запись источника.
+
+        Args:
+            source (str): Источник документа.
+
+        Returns:
+            dict | None: Документ или None, если источника нет в корпусе.
+        """
+        offset = self.offsets.get(source)
+        if offset is None:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def iter_documents(self, sources: Iterable[str] | None = None) -> Iterator[dict]:
+        """Последовательно читает документы, не загружая корпус в память целиком.
+
+        Args:
+            sources (Iterable[str] | None): Какие источники и в каком порядке читать.
+                По умолчанию — все источники корпуса.
+
+        Yields:
+            dict: Документ с ключами 'source' и 'text'.
+        """
+        sources = self.sources if sources is None else sources
+        if not self.offsets:
+            return
+        with open(self.path, 'rb') as f:
+            for source in sources:
+                offset = self.offsets.get(source)
+                if offset is None:
+                    continue
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def compact(self):
+        """Переписывает файл, оставляя только последние записи источников."""
+        if self.records == len(self.offsets):
+            return
+        tmp_path = self.path + '.tmp'
+        offsets = {}
+        with open(tmp_path, 'wb') as out:
+            for doc in self.iter_documents():
+                offsets[doc['source']] = out.tell()
+                out.write((json.dumps(doc, ensure_ascii=False) + '\n').encode('utf-8'))
+        os.replace(tmp_path, self.path)
+        self.offsets, self.records = offsets, len(offsets)
+        self._torn_offset = None
+
+    def import_json(self, json_path: str) -> int:
+        """Переносит документы из JSON-файла прежнего формата (`data.json`), если корпус пуст.
+
+        Args:
+            json_path (str): Путь к JSON-файлу со списком документов.
+
+        Returns:
+            int: Число перенесённых документов.
+        """
+        if len(self) or not os.path.exists(json_path):
+            return 0
+        with open(json_path, 'r', encoding='utf-8') as f:
+            documents = json.load(f)
+        for doc in documents:
+            self.append(doc)
+        logger.info(f'Перенесено {len(documents)} документов из {json_path} в {self.path}')
+        return len(documents)
@@ -0,0 +1,202 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class EmbeddingCache:
+    """Хранилище эмбеддингов на диске с адресацией по содержимому.
+
+    Векторы хранятся в одной матрице (файл `vectors.bin`, читается через memory-map),
+    ключи — в файле `keys.txt`, где номер строки совпадает с номером строки матрицы.
+    Оба файла только дописываются под межпроцессной блокировкой (`fcntl.flock`), поэтому бот,
+    CLI и сервис поиска могут пользоваться одним кэшем. Перед чтением и записью файлы
+    сверяются: если запись была прервана, лишние строки векторов или ключей отбрасываются.
+
+    Args:
+        path (str): Директория кэша.
+        dtype (str): Тип хранения векторов: 'float16' или 'float32'.
+    """
+
+    def __init__(self, path: str, dtype: str = 'float16'):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.keys_path = os.path.join(path, 'keys.txt')
+        self.vectors_path = os.path.join(path, 'vectors.bin')
+        self.meta_path = os.path.join(path, 'meta.json')
+        self.lock_path = os.path.join(path, '.lock')
+        self.dtype = np.dtype(dtype)
+        self.dim: int | None = None
+        self.index: Dict[str, int] = {}
+        self.rows = 0
+        self._keys_offset = 0
+        self._matrix: np.memmap | None = None
+        self._lock = threading.Lock()
+        with self._lock, self._file_lock():
+            self._sync()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _sync(self):
+        """Подхватывает строки, дописанные другими процессами, и обрезает недописанные.
+
+        Вызывается под `_file_lock`, поэтому одновременно файлы не дописываются.
+        """
+        if self.dim is None:
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            self.dim = meta['dim']
+            self.dtype = np.dtype(meta['dtype'])
+        row_bytes = self.dim * self.dtype.itemsize
+        vector_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        if not os.path.exists(self.keys_path):
+            open(self.keys_path, 'a').close()
+        with open(self.keys_path, 'rb') as f:
+            f.seek(self._keys_offset)
+            tail = f.read()
+        lines = tail.split(b'\n')[:-1]  # последняя часть — пустая строка или недописанный ключ
+        rows = min(vector_rows, self.rows + len(lines))
+        for line in lines[:rows - self.rows]:
+            self.index[line.decode('utf-8')] = self.rows
+            self.rows += 1
+            self._keys_offset += len(line) + 1
+        if os.path.getsize(self.keys_path) != self._keys_offset:
+            os.truncate(self.keys_path, self._keys_offset)
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) != self.rows * row_bytes:
+            os.truncate(self.vectors_path, self.rows * row_bytes)
+        self._matrix = None
+
+    def _get_matrix(self) -> np.memmap:
+        if self._matrix is None:
+            self._matrix = np.memmap(self.vectors_path, dtype=self.dtype, mode='r', shape=(self.rows, self.dim))
+        return self._matrix
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Возвращает сохранённые векторы для известных ключей.
+
+        Args:
+            keys (List[str]): Ключи.
+
+        Returns:
+            Dict[str, np.ndarray]: Векторы float32 для найденных ключей.
+        """
+        with self._lock:
+            rows = {key: self.index[key] for key in keys if key in self.index}
+            if not rows:
+                return {}
+            matrix = self._get_matrix()
+            return {key: np.asarray(matrix[row], dtype=np.float32) for key, row in rows.items()}
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Дописывает новые векторы в кэш.
+
+        Args:
+            keys (List[str]): Ключи.
+            vectors (np.ndarray): Матрица векторов в порядке `keys`.
+        """
+        with self._lock, self._file_lock():
+            self._sync()
+            new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self.index]
+            if not new:
+                return
+            if self.dim is None:
+                self.dim = len(new[0][1])
+                with open(self.meta_path, 'w', encoding='utf-8') as f:
+                    json.dump({'dim': self.dim, 'dtype': self.dtype.name}, f)
+            # Сначала векторы, затем ключи: ключ без вектора при чтении отбрасывается
+            with open(self.vectors_path, 'ab') as f:
+                f.write(np.asarray([vector for _, vector in new], dtype=self.dtype).tobytes())
+            with open(self.keys_path, 'ab') as f:
+                f.write(''.join(f'{key}\n' for key, _ in new).encode('utf-8'))
+            self._sync()
+
+
+class CachedEmbeddings(Embeddings):
+    """Обёртка над эмбеддингами, читающая и пополняющая `EmbeddingCache`.
+
+    Ключ записи — хэш от имени модели, флага нормализации и текста, поэтому
+    трансформер запускается только для ещё не встречавшихся текстов.
+
+    Args:
+        embeddings (Embeddings): Исходные эмбеддинги с атрибутами `model_name` и `normalize`.
+        cache (EmbeddingCache): Хранилище векторов.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
+
+    def _key(self, text: str) -> str:
+        raw = f"{self.embeddings.model_name}\n{self.embeddings.normalize}\n{text}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def embed_documents(self, texts: List[str], store: bool = True) -> List[List[float]]:
+        """Вычисляет эмбеддинги, используя кэш для уже известных текстов.
+
+        Args:
+            texts (List[str]): Тексты для кодирования.
+            store (bool): Дописывать ли новые векторы в кэш. Для пользовательских запросов
+                не нужно: они почти не повторяются, и кэш рос бы без ограничений.
+
+        Returns:
+            List[List[float]]: Эмбеддинги в порядке `texts`.
+        """
+        keys = [self._key(text) for text in texts]
+        found = self.cache.get_many(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = np.asarray(self.embeddings.embed_documents(list(missing.values())), dtype=np.float32)
+            if store:
+                self.cache.put_many(list(missing.keys()), vectors)
+            found.update(zip(missing.keys(), vectors))
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Вычисляет эмбеддинг запроса, читая кэш, но не пополняя его.
+
+        Args:
+            text (str): Текст запроса.
+
+        Returns:
+            List[float]: Эмбеддинг.
+        """
+        return self.embed_documents([text], store=False)[0]
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Вычисляет эмбеддинги пачки пользовательских запросов, не записывая их в `EmbeddingCache`.
+
+    Args:
+        embeddings (Embeddings): Эмбеддинги векторной базы (с кэшем или без).
+        texts (List[str]): Тексты запросов.
+
+    Returns:
+        List[List[float]]: Эмбеддинги в порядке `texts`.
+    """
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.embed_documents(texts, store=False)
+    return embeddings.embed_documents(texts)
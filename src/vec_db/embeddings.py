@@ -0,0 +1,172 @@
+import os
+from typing import List
+
+import numpy as np
+import torch
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+from sentence_transformers import SentenceTransformer
+
+from config import (EMBEDDING_BACKEND, EMBEDDING_BATCH_SIZE, EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_DTYPE,
+                    EMBEDDING_MODEL, EMBEDDING_ONNX_FILE, EMBEDDING_THREADS)
+from vec_db.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """Эмбеддинги на основе SentenceTransformer с пакетной обработкой по длине текста.
+
+    Тексты сортируются по длине в токенах и кодируются пачками близкой длины,
+    что сокращает долю паддинга при массовом кодировании.
+
+    Args:
+        model (SentenceTransformer): Загруженная модель.
+        model_name (str): Имя модели.
+        normalize (bool): Нормализовать ли эмбеддинги.
+        batch_size (int): Размер пачки при кодировании.
+    """
+
+    def __init__(self,
+                 model: SentenceTransformer,
+                 model_name: str = EMBEDDING_MODEL,
+                 normalize: bool = True,
+                 batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.model = model
+        self.model_name = model_name
+        self.normalize = normalize
+        self.batch_size = batch_size
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=len(texts),
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        ).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Вычисляет эмбеддинги списка текстов.
+
+        Args:
+            texts (List[str]): Тексты для кодирования.
+
+        Returns:
+            List[List[float]]: Эмбеддинги в порядке `texts`.
+        """
+        if not texts:
+            return []
+        if len(texts) <= self.batch_size:
+            return self._encode(texts).tolist()
+
+        lengths = [len(ids) for ids in self.model.tokenizer(texts, truncation=True)['input_ids']]
+        order = np.argsort(lengths, kind='stable')
+        result = np.empty((len(texts), self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            bucket = order[start:start + self.batch_size]
+            result[bucket] = self._encode([texts[i] for i in bucket])
+        return result.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Вычисляет эмбеддинг запроса.
+
+        Args:
+            text (str): Текст запроса.
+
+        Returns:
+            List[float]: Эмбеддинг.
+        """
+        return self.embed_documents([text])[0]
+
+
+def load_embeddings(backend: str = EMBEDDING_BACKEND,
+                    model_name: str = EMBEDDING_MODEL,
+                    threads: int = EMBEDDING_THREADS,
+                    cache_dir: str | None = EMBEDDING_CACHE_DIR) -> Embeddings:
+    """Загружает модель эмбеддингов с выбранным бэкендом.
+
+    Args:
+        backend (str): Бэкенд модели:
+
+            - 'torch' — исходная модель в fp32 (на GPU, если он доступен),
+
+            - 'int8' — динамическое int8-квантование линейных слоёв для CPU,
+
+            - 'onnx' — модель, экспортированная в ONNX Runtime.
+
+        model_name (str): Имя модели на HuggingFace.
+        threads (int): Число потоков для вычислений на CPU. 0 — значение по умолчанию.
+        cache_dir (str | None): Директория кэша эмбеддингов. None — без кэша.
+
+    Returns:
+        Embeddings: Эмбеддинги, совместимые с LangChain.
+    """
+    logger.info(f"Загрузка модели эмбеддингов ({backend})...")
+    if threads:
+        torch.set_num_threads(threads)
+
+    if backend == 'onnx':
+        try:
+            import onnxruntime
+            import optimum.onnxruntime  # noqa: F401
+        except ImportError as ex:
+            raise ImportError("Для бэкенда 'onnx' установите пакеты onnxruntime и optimum: "
+                              "pip install onnxruntime optimum[onnxruntime]") from ex
+        if os.path.isdir(model_name) and not os.path.exists(os.path.join(model_name, EMBEDDING_ONNX_FILE)):
+            raise FileNotFoundError(f"В модели {model_name} нет файла {EMBEDDING_ONNX_FILE}. Экспортируйте её "
+                                    f"в ONNX (optimum-cli export onnx) или выберите другой EMBEDDING_BACKEND")
+        session_options = onnxruntime.SessionOptions()
+        if threads:
+            session_options.intra_op_num_threads = threads
+        try:
+            model = SentenceTransformer(
+                model_name,
+                device='cpu',
+                backend='onnx',
+                model_kwargs={
+                    'file_name': EMBEDDING_ONNX_FILE,
+                    'provider': 'CPUExecutionProvider',
+                    'session_options': session_options,
+                    'export': False,
+                },
+            )
+        except (OSError, ValueError) as ex:
+            raise FileNotFoundError(f"Не удалось загрузить {EMBEDDING_ONNX_FILE} модели {model_name}: {ex}. "
+                                    "Экспортируйте модель в ONNX (optimum-cli export onnx) "
+                                    "или выберите другой EMBEDDING_BACKEND") from ex
+    elif backend == 'int8':
+        model = SentenceTransformer(model_name, device='cpu')
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    elif backend == 'torch':
+        model = SentenceTransformer(model_name, device="cuda" if torch.cuda.is_available() else "cpu")
+    else:
+        raise ValueError(f"Неизвестный бэкенд эмбеддингов: {backend}")
+    embeddings = SentenceTransformerEmbeddings(model, model_name)
+    if cache_dir:
+        # Векторы разных бэкендов немного отличаются, поэтому кэш у каждого свой
+        return CachedEmbeddings(embeddings, EmbeddingCache(os.path.join(cache_dir, backend), EMBEDDING_CACHE_DTYPE))
+    return embeddings
+
+
+def check_embeddings(candidate: Embeddings,
+                     reference: Embeddings,
+                     texts: List[str],
+                     tolerance: float = 0.99) -> dict:
+    """Проверяет, что эмбеддинги оптимизированного бэкенда близки к эталонным fp32.
+
+    Args:
+        candidate (Embeddings): Проверяемые эмбеддинги (например, int8 или ONNX).
+        reference (Embeddings): Эталонные эмбеддинги.
+        texts (List[str]): Тексты для сравнения.
+        tolerance (float): Минимально допустимая косинусная близость.
+
+    Returns:
+        dict: Минимальная и средняя косинусная близость и флаг 'passed'.
+    """
+    a = np.asarray(candidate.embed_documents(texts), dtype=np.float32)
+    b = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {
+        'min_cosine': float(cosine.min()),
+        'mean_cosine': float(cosine.mean()),
+        'passed': bool(cosine.min() >= tolerance),
+    }
@@ -0,0 +1,218 @@
+import asyncio
+from typing import Awaitable, Callable, Iterable, List
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from loguru import logger
+
+from config import INGEST_BATCH_SIZE, INGEST_QUEUE_SIZE
+from monitoring.metrics import span
+from parser.parser import iter_parsed
+from vec_db.corpus import CorpusStore
+from vec_db.manifest import (build_manifest, chunk_ids, load_index_config, load_manifest, save_index_config,
+                             save_manifest)
+from vec_db.numpy_store import NumpyVectorStore
+from vec_db.utils import chunks_from_md
+
+
+def _prepare(doc: dict, manifest: dict) -> dict | None:
+    """Разбивает документ на чанки и сравнивает их с манифестом.
+
+    Returns:
+        dict | None: Новые чанки, устаревшие идентификаторы и запись манифеста источника
+            или None, если документ не изменился.
+    """
+    chunks = chunks_from_md([Document(page_content=doc['text'], metadata={'source': doc['source']})])
+    ids = chunk_ids(chunks)
+    entry = build_manifest(chunks, ids).get(doc['source'], {'hash': '', 'chunk_ids': []})
+    old_entry = manifest.get(doc['source'])
+    if old_entry is not None and old_entry['hash'] == entry['hash']:
+        return None
+    old_ids = set(old_entry['chunk_ids']) if old_entry else set()
+    return {
+        'source': doc['source'],
+        'entry': entry,
+        'chunks': [(chunk_id, chunk) for chunk_id, chunk in zip(ids, chunks) if chunk_id not in old_ids],
+        'stale': list(old_ids - set(ids)),
+    }
+
+
+def log_missing_links(links: List[str], indexed: Iterable[str], limit: int = 5) -> List[str]:
+    """Пишет в лог ссылки из `links`, которых нет в индексе: по ним бот не сможет ответить.
+
+    Args:
+        links (List[str]): Актуальный список URL-адресов.
+        indexed (Iterable[str]): Источники, которые есть в индексе (ключи манифеста).
+        limit (int): Сколько ссылок перечислить в сообщении.
+
+    Returns:
+        List[str]: Отсутствующие в индексе ссылки.
+    """
+    indexed = set(indexed)
+    missing = [link for link in links if link not in indexed]
+    if missing:
+        more = f' и ещё {len(missing) - limit}' if len(missing) > limit else ''
+        logger.warning(f'В индексе нет {len(missing)} из {len(links)} ссылок: {", ".join(missing[:limit])}{more}. '
+                       f'Их нет в корпусе или не удалось распарсить; добавить: python src/cli.py sync')
+    return missing
+
+
+async def _save(db: VectorStore, chroma_path: str, manifest: dict):
+    # NumpyVectorStore пишет на диск только по `persist`: он сохраняется перед манифестом,
+    # чтобы манифест на диске не опережал коллекцию
+    if isinstance(db, NumpyVectorStore):
+        await asyncio.to_thread(db.persist)
+    save_manifest(chroma_path, manifest)
+
+
+def _clear(db: VectorStore, ids: List[str]):
+    # Размерность коллекции Chroma фиксируется первой записью, поэтому при смене модели она пересоздаётся
+    if hasattr(db, 'reset_collection'):
+        db.reset_collection()
+    else:
+        db.delete(ids=ids)
+
+
+async def ingest(db: VectorStore,
+                 chroma_path: str,
+                 corpus: CorpusStore,
+                 links: List[str],
+                 parse_missing: bool = False,
+                 refresh: bool = False,
+                 batch_size: int = INGEST_BATCH_SIZE,
+                 queue_size: int = INGEST_QUEUE_SIZE,
+                 throttle: Callable[[], Awaitable[None]] | None = None,
+                 index_config: dict | None = None) -> dict:
+    """Потоково приводит коллекцию к документам корпуса и ссылкам `links`.
+
+    Этапы соединены очередью размером `queue_size` и работают одновременно:
+    загрузка, извлечение и обработка страниц GigaChat (`iter_parsed`) → запись в корпус →
+    разбиение на чанки и сравнение с манифестом → эмбеддинги и запись в коллекцию пачками
+    по `batch_size` чанков. Устаревшие чанки изменившегося источника удаляются в той же пачке,
+    сразу после записи новых, поэтому поиск не остаётся без этого источника между пачками.
+    Для Chroma манифест сохраняется после каждой пачки, поэтому прерванный
+    запуск продолжается с места остановки: распарсенные страницы уже лежат в корпусе,
+    а проиндексированные источники не эмбеддятся повторно. NumpyVectorStore записывается
+    вместе с манифестом один раз в конце: перезапись файлов на каждой пачке сделала бы загрузку
+    квадратичной, а повторные эмбеддинги после прерывания берутся из кэша эмбеддингов.
+
+    Args:
+        db (VectorStore): Коллекция (Chroma или NumpyVectorStore).
+        chroma_path (str): Путь к директории индекса (для манифеста).
+        corpus (CorpusStore): Корпус извлечённых документов.
+        links (List[str]): Актуальный список URL-адресов.
+        parse_missing (bool): Распарсить ли ссылки, которых нет в корпусе.
+            Если корпус пуст, ссылки парсятся всегда.
+        refresh (bool): Перепроверить все ссылки условными запросами и обновить изменившиеся страницы.
+        batch_size (int): Размер пачки чанков для эмбеддингов и записи в коллекцию.
+        queue_size (int): Размер очередей между этапами.
+        throttle (Callable[[], Awaitable[None]] | None): Ожидается перед записью каждой пачки;
+            позволяет фоновой пересборке уступать ресурсы обработке запросов.
+        index_config (dict | None): Параметры индекса (`current_index_config`). Если они отличаются
+            от сохранённых, коллекция пересобирается целиком.
+
+    Returns:
+        dict: Статистика: списки добавленных, изменённых и удалённых источников,
+            число добавленных и удалённых чанков, число распарсенных страниц.
+    """
+    manifest = load_manifest(chroma_path)
+    existing = (await asyncio.to_thread(db.get, include=[]))['ids']
+    config_changed = index_config is not None and load_index_config(chroma_path) != index_config
+    if manifest is None or not existing or config_changed:
+        # Индекс создаётся впервые, создан до появления манифеста или сменились модель эмбеддингов
+        # или бэкенд хранилища (в коллекции другого бэкенда могли остаться устаревшие чанки)
+        if existing:
+            logger.info('Манифест индекса не соответствует коллекции, коллекция будет пересобрана')
+            await asyncio.to_thread(_clear, db, existing)
+        manifest = {}
+        await _save(db, chroma_path, manifest)
+    if index_config is not None:
+        save_index_config(chroma_path, index_config)
+    old_sources = set(manifest)
+
+    if refresh:
+        targets = list(links)
+    elif parse_missing or not len(corpus):
+        targets = [link for link in links if link not in corpus]
+    else:
+        targets = []
+    stats = {'added_sources': [], 'changed_sources': [], 'removed_sources': [],
+             'added_chunks': 0, 'deleted_chunks': 0, 'parsed': 0}
+    queue = asyncio.Queue(maxsize=queue_size)
+    deferred = isinstance(db, NumpyVectorStore)
+
+    async def produce():
+        try:
+            target_set = set(targets)
+            for doc in corpus.iter_documents(link for link in links if link not in target_set):
+                if (item := _prepare(doc, manifest)) is not None:
+                    await queue.put(item)
+            if targets:
+                logger.info(f'Парсинг {len(targets)} страниц...')
+            parsed = set()
+            async for doc in iter_parsed(targets, queue_size=queue_size):
+                corpus.append(doc)
+                parsed.add(doc['source'])
+                if (item := _prepare(doc, manifest)) is not None:
+                    await queue.put(item)
+            stats['parsed'] = len(parsed)
+            # Страницы, которые не удалось обновить, индексируются по последней сохранённой версии
+            for doc in corpus.iter_documents(link for link in targets if link not in parsed):
+                if (item := _prepare(doc, manifest)) is not None:
+                    await queue.put(item)
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            await queue.put(None)
+            raise
+        await queue.put(None)
+
+    async def flush(buffer: list, stale: list, ready: dict):
+        if buffer:
+            if throttle is not None:
+                await throttle()
+            with span('index_upsert'):
+                await asyncio.to_thread(
+                    db.add_texts,
+                    texts=[chunk.page_content for _, chunk in buffer],
+                    metadatas=[chunk.metadata for _, chunk in buffer],
+                    ids=[chunk_id for chunk_id, _ in buffer],
+                )
+            stats['added_chunks'] += len(buffer)
+            buffer.clear()
+        # Устаревшие чанки удаляются после записи их замены: в коллекции всегда есть версия источника
+        if stale:
+            await asyncio.to_thread(db.delete, ids=list(stale))
+            stats['deleted_chunks'] += len(stale)
+            stale.clear()
+        if ready:
+            manifest.update(ready)
+            ready.clear()
+            if not deferred:
+                save_manifest(chroma_path, manifest)
+
+    producer = asyncio.create_task(produce())
+    try:
+        buffer, stale, ready = [], [], {}
+        while (item := await queue.get()) is not None:
+            stale += item['stale']
+            source = item['source']
+            stats['changed_sources' if source in old_sources else 'added_sources'].append(source)
+            buffer += item['chunks']
+            ready[source] = item['entry']
+            if len(buffer) >= batch_size:
+                await flush(buffer, stale, ready)
+        await flush(buffer, stale, ready)
+        await producer
+    finally:
+        producer.cancel()
+
+    removed = sorted(set(manifest) - set(links))
+    if removed:
+        stale = [chunk_id for source in removed for chunk_id in manifest.pop(source)['chunk_ids']]
+        await asyncio.to_thread(db.delete, ids=stale)
+        stats['deleted_chunks'] += len(stale)
+        stats['removed_sources'] = removed
+    await _save(db, chroma_path, manifest)
+    log_missing_links(links, manifest)
+    return stats
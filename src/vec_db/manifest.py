@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+from typing import Dict, List
+
+from langchain_core.documents import Document
+
+MANIFEST_FILE = 'manifest.json'
+INDEX_CONFIG_FILE = 'index_config.json'
+# Версия схемы идентификаторов и метаданных чанков: при её смене индекс пересобирается
+CHUNK_SCHEMA_VERSION = 2
+
+
+def chunk_ids(chunks: List[Document]) -> List[str]:
+    """Вычисляет стабильные идентификаторы чанков по источнику, позиции в документе и тексту.
+
+    Позиция (`chunk` из `chunks_from_md`) входит в идентификатор, поэтому при изменении страницы
+    все сдвинувшиеся чанки перезаписываются с актуальными номерами, а сборка контекста
+    не склеивает как соседние чанки, которые больше не стоят рядом.
+
+    Args:
+        chunks (List[Document]): Чанки, полученные из `chunks_from_md`.
+
+    Returns:
+        List[str]: Идентификаторы в порядке `chunks`.
+    """
+    ids = []
+    seen = defaultdict(int)
+    for chunk in chunks:
+        source = chunk.metadata.get('source', '')
+        position = chunk.metadata.get('chunk', '')
+        digest = hashlib.sha256(f"{source}\n{position}\n{chunk.page_content}".encode('utf-8')).hexdigest()[:32]
+        seen[digest] += 1
+        ids.append(digest if seen[digest] == 1 else f"{digest}-{seen[digest]}")
+    return ids
+
+
+def build_manifest(chunks: List[Document], ids: List[str]) -> Dict[str, dict]:
+    """Строит манифест индекса: для каждого источника — хэш содержимого и идентификаторы чанков.
+
+    Args:
+        chunks (List[Document]): Чанки документов.
+        ids (List[str]): Идентификаторы чанков из `chunk_ids`.
+
+    Returns:
+        Dict[str, dict]: Словарь {source: {'hash': str, 'chunk_ids': List[str]}}.
+    """
+    by_source = defaultdict(list)
+    for chunk, chunk_id in zip(chunks, ids):
+        by_source[chunk.metadata.get('source', '')].append(chunk_id)
+    return {
+        source: {
+            'hash': hashlib.sha256('\n'.join(source_ids).encode('utf-8')).hexdigest(),
+            'chunk_ids': source_ids,
+        }
+        for source, source_ids in by_source.items()
+    }
+
+
+def load_manifest(chroma_path: str) -> Dict[str, dict] | None:
+    """Загружает манифест индекса.
+
+    Args:
+        chroma_path (str): Путь к директории Chroma DB.
+
+    Returns:
+        Dict[str, dict] | None: Манифест или None, если он ещё не создан.
+    """
+    path = os.path.join(chroma_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(chroma_path: str, manifest: Dict[str, dict]):
+    """Сохраняет манифест индекса.
+
+    Args:
+        chroma_path (str): Путь к директории Chroma DB.
+        manifest (Dict[str, dict]): Манифест из `build_manifest`.
+    """
+    path = os.path.join(chroma_path, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+    os.replace(path + '.tmp', path)
+
+
+def load_index_config(chroma_path: str) -> dict | None:
+    """Загружает параметры, с которыми построен индекс (бэкенд и модель эмбеддингов, хранилище).
+
+    Args:
+        chroma_path (str): Путь к директории Chroma DB.
+
+    Returns:
+        dict | None: Параметры индекса или None, если индекс построен до их появления.
+    """
+    path = os.path.join(chroma_path, INDEX_CONFIG_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_index_config(chroma_path: str, index_config: dict):
+    """Сохраняет параметры, с которыми построен индекс.
+
+    Args:
+        chroma_path (str): Путь к директории Chroma DB.
+        index_config (dict): Параметры индекса.
+    """
+    path = os.path.join(chroma_path, INDEX_CONFIG_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(index_config, f, ensure_ascii=False, indent=4)
+    os.replace(path + '.tmp', path)
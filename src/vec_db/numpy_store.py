@@ -0,0 +1,294 @@
+import json
+import os
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from vec_db.quantization import CompressedCodes
+
+
+def _matches(metadata: dict, filter: Dict[str, Any] | None) -> bool:
+    if not filter:
+        return True
+    for key, value in filter.items():
+        if isinstance(value, (list, tuple, set)):
+            if metadata.get(key) not in value:
+                return False
+        elif metadata.get(key) != value:
+            return False
+    return True
+
+
+class NumpyVectorStore(VectorStore):
+    """Векторное хранилище с точным поиском на NumPy для небольших корпусов.
+
+    Нормализованные эмбеддинги хранятся в одной непрерывной матрице float32 (`vectors-<версия>.npy`,
+    открывается через memory-map), тексты и метаданные — в `docs.json`. Поиск top-k —
+    одно матрично-векторное произведение и `argpartition`.
+
+    `add_texts` и `delete` изменяют только память, на диск хранилище записывается
+    вызовом `persist` (например, один раз в конце индексации), поэтому потоковая загрузка
+    пачками не переписывает файлы целиком на каждой пачке. Матрица записывается в новый файл,
+    а `docs.json` со ссылкой на него заменяется атомарно, поэтому прерванная запись
+    не рассинхронизирует векторы и тексты.
+
+    Оценки возвращаются как квадрат евклидова расстояния между нормализованными векторами
+    (2 - 2·cos), как и в Chroma по умолчанию: меньше — ближе.
+
+    Если заданы `dims` или `quantization`, в памяти держатся только компактные коды
+    (`CompressedCodes`): поиск сначала идёт по ним, а `k * rescore` лучших кандидатов
+    пересчитываются по полным векторам, которые читаются из memory-map только для кандидатов.
+    После изменения хранилища коды строятся заново один раз, при первом поиске, а не после
+    каждой записи, поэтому потоковая загрузка пачками не пересчитывает их для всей матрицы
+    на каждой пачке. Коды сохраняются вместе с версией векторов (меняется при каждой записи
+    на диск) и загружаются, только если версия совпадает.
+
+    Args:
+        embedding_function (Embeddings): Модель эмбеддингов.
+        persist_directory (str | None): Директория для хранения. None — только в памяти.
+        dims (int | None): Обрезать коды до первых `dims` компонент. None — все компоненты.
+        quantization (str): Квантование кодов: 'none', 'int8' или 'binary'.
+        rescore (int): Во сколько раз больше кандидатов, чем `k`, пересчитывать по полным векторам.
+    """
+
+    def __init__(self,
+                 embedding_function: Embeddings,
+                 persist_directory: str | None = None,
+                 dims: int | None = None,
+                 quantization: str = 'none',
+                 rescore: int = 4):
+        self._embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[dict] = []
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.compressed = CompressedCodes(dims, quantization) if dims or quantization != 'none' else None
+        self.rescore = rescore
+        self.version: str | None = None
+        self._codes_stale = False
+        self._dirty = False
+        self._vectors_file: str | None = None
+        if persist_directory and os.path.exists(os.path.join(persist_directory, 'docs.json')):
+            self._load()
+            if self.compressed is not None and not self.compressed.load(persist_directory, len(self.ids),
+                                                                        self.version):
+                self._update_codes()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def _load(self):
+        with open(os.path.join(self.persist_directory, 'docs.json'), 'r', encoding='utf-8') as f:
+            docs = json.load(f)
+        self.ids, self.texts, self.metadatas = docs['ids'], docs['texts'], docs['metadatas']
+        self.version = docs.get('version')
+        self._vectors_file = docs.get('vectors', 'vectors.npy')
+        self.matrix = np.load(os.path.join(self.persist_directory, self._vectors_file), mmap_mode='r')
+
+    def persist(self):
+        """Записывает хранилище на диск, если оно изменилось после последней записи."""
+        if not self.persist_directory or not self._dirty:
+            return
+        os.makedirs(self.persist_directory, exist_ok=True)
+        version = uuid.uuid4().hex
+        vectors_file = f'vectors-{version}.npy'
+        vectors_path = os.path.join(self.persist_directory, vectors_file)
+        with open(vectors_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        docs_path = os.path.join(self.persist_directory, 'docs.json')
+        with open(docs_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'ids': self.ids, 'texts': self.texts, 'metadatas': self.metadatas, 'version': version,
+                       'vectors': vectors_file}, f, ensure_ascii=False)
+        # docs.json со ссылкой на новый файл векторов — точка фиксации записи
+        os.replace(docs_path + '.tmp', docs_path)
+        if self._vectors_file and self._vectors_file != vectors_file:
+            try:
+                os.remove(os.path.join(self.persist_directory, self._vectors_file))
+            except FileNotFoundError:
+                pass
+        self.version, self._vectors_file, self._dirty = version, vectors_file, False
+        self.matrix = np.load(vectors_path, mmap_mode='r')
+        if self.compressed is not None and not self._codes_stale:
+            self.compressed.save(self.persist_directory, self.version)
+
+    def _update_codes(self):
+        if self.compressed is None:
+            return
+        self.compressed.fit(self.matrix)
+        self._codes_stale = False
+        # Коды несохранённых изменений записываются вместе с ними в `persist`
+        if self.persist_directory and not self._dirty:
+            self.compressed.save(self.persist_directory, self.version)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def add_texts(self,
+                  texts: Iterable[str],
+                  metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None,
+                  **kwargs: Any) -> List[str]:
+        """Добавляет тексты в хранилище (существующие идентификаторы перезаписываются).
+
+        Args:
+            texts (Iterable[str]): Тексты.
+            metadatas (Optional[List[dict]]): Метаданные текстов.
+            ids (Optional[List[str]]): Идентификаторы. По умолчанию генерируются.
+
+        Returns:
+            List[str]: Идентификаторы добавленных текстов.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+        existing = set(self.ids)
+        self.delete([i for i in ids if i in existing])
+
+        vectors = self._normalize(np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32))
+        self.matrix = vectors if not len(self.ids) else np.concatenate([self.matrix, vectors])
+        self.ids += ids
+        self.texts += texts
+        self.metadatas += metadatas
+        self._dirty = True
+        self._codes_stale = self.compressed is not None
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Удаляет тексты по идентификаторам (на диск изменения записывает `persist`).
+
+        Args:
+            ids (Optional[List[str]]): Идентификаторы удаляемых текстов.
+
+        Returns:
+            Optional[bool]: True после удаления.
+        """
+        removed = set(ids or [])
+        if not removed:
+            return True
+        keep = [i for i, doc_id in enumerate(self.ids) if doc_id not in removed]
+        self.matrix = np.asarray(self.matrix[keep], dtype=np.float32)
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self._dirty = True
+        self._codes_stale = self.compressed is not None
+        return True
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None) -> dict:
+        """Возвращает сохранённые записи в формате, совместимом с `Chroma.get`.
+
+        Args:
+            ids (Optional[List[str]]): Идентификаторы. По умолчанию — все записи.
+            include (Optional[List[str]]): Какие поля вернуть помимо ids: 'documents', 'metadatas'.
+
+        Returns:
+            dict: Словарь с ключами 'ids' и запрошенными полями.
+        """
+        include = ['documents', 'metadatas'] if include is None else include
+        wanted = set(ids) if ids is not None else None
+        rows = [i for i, doc_id in enumerate(self.ids) if wanted is None or doc_id in wanted]
+        result = {'ids': [self.ids[i] for i in rows]}
+        if 'documents' in include:
+            result['documents'] = [self.texts[i] for i in rows]
+        if 'metadatas' in include:
+            result['metadatas'] = [self.metadatas[i] for i in rows]
+        return result
+
+    def similarity_search_by_vectors(self,
+                                     embeddings: List[List[float]],
+                                     k: int = 4,
+                                     filter: Dict[str, Any] | None = None) -> List[List[Tuple[Document, float]]]:
+        """Поиск top-k сразу для пачки запросов: точный или по компактным кодам с пересчётом.
+
+        Args:
+            embeddings (List[List[float]]): Эмбеддинги запросов.
+            k (int): Количество результатов на запрос.
+            filter (Dict[str, Any] | None): Фильтр по метаданным, например {'source': url}
+                или {'Header': ['### Решение', '### Результат']}.
+
+        Returns:
+            List[List[Tuple[Document, float]]]: Для каждого запроса пары (документ, расстояние).
+        """
+        if not self.ids:
+            return [[] for _ in embeddings]
+        queries = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        rows = np.array([i for i, metadata in enumerate(self.metadatas) if _matches(metadata, filter)], dtype=np.int64) \
+            if filter else None
+        if rows is not None and not len(rows):
+            return [[] for _ in embeddings]
+        if self.compressed is not None:
+            if self._codes_stale:
+                self._update_codes()
+            return self._search_compressed(queries, k, rows)
+
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        scores = queries @ matrix.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for query_scores, candidates in zip(scores, top):
+            candidates = candidates[np.argsort(-query_scores[candidates])]
+            results.append([
+                (self._document(int(i if rows is None else rows[i])), float(2 - 2 * query_scores[i]))
+                for i in candidates
+            ])
+        return results
+
+    def _search_compressed(self, queries: np.ndarray, k: int, rows: np.ndarray | None) -> List[List[Tuple[Document, float]]]:
+        approx = self.compressed.scores(queries, rows)
+        candidates_count = min(max(k * self.rescore, k), approx.shape[1])
+        candidates = np.argpartition(-approx, candidates_count - 1, axis=1)[:, :candidates_count]
+        results = []
+        for query, query_candidates in zip(queries, candidates):
+            # Полные векторы читаются из memory-map только для кандидатов, по возрастанию смещения
+            candidate_rows = np.sort(query_candidates if rows is None else rows[query_candidates])
+            scores = np.asarray(self.matrix[candidate_rows], dtype=np.float32) @ query
+            top = np.argsort(-scores)[:k]
+            results.append([(self._document(int(candidate_rows[i])), float(2 - 2 * scores[i])) for i in top])
+        return results
+
+    def _document(self, row: int) -> Document:
+        return Document(page_content=self.texts[row], metadata=self.metadatas[row], id=self.ids[row])
+
+    def similarity_search_by_vector_with_relevance_scores(self,
+                                                          embedding: List[float],
+                                                          k: int = 4,
+                                                          filter: Dict[str, Any] | None = None,
+                                                          **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vectors([embedding], k, filter)[0]
+
+    def similarity_search_with_score(self,
+                                     query: str,
+                                     k: int = 4,
+                                     filter: Dict[str, Any] | None = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(self.embeddings.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return lambda distance: 1.0 - distance / 2
+
+    @classmethod
+    def from_texts(cls,
+                   texts: List[str],
+                   embedding: Embeddings,
+                   metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None,
+                   persist_directory: str | None = None,
+                   **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(embedding, persist_directory, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        store.persist()
+        return store
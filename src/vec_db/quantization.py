@@ -0,0 +1,135 @@
+import os
+
+import numpy as np
+
+QUANTIZATIONS = ('none', 'int8', 'binary')
+
+# Коды int8 переводятся в float32 блоками, чтобы не создавать полную копию матрицы
+BLOCK_ROWS = 4096
+
+# Число единичных битов в каждом значении байта
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def truncate(vectors: np.ndarray, dims: int | None) -> np.ndarray:
+    """Оставляет первые `dims` компонент векторов (Matryoshka) и заново нормализует их.
+
+    Args:
+        vectors (np.ndarray): Матрица векторов (n, d).
+        dims (int | None): Число компонент. None — не обрезать.
+
+    Returns:
+        np.ndarray: Нормализованная матрица (n, dims) в float32.
+    """
+    vectors = np.asarray(vectors[:, :dims] if dims else vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class CompressedCodes:
+    """Компактные коды векторов для первичного (приближённого) поиска.
+
+    - `dims` — обрезка эмбеддингов до первых `dims` компонент (Qwen3-Embedding обучен
+      с Matryoshka-представлениями, поэтому префикс остаётся осмысленным эмбеддингом);
+    - `quantization='int8'` — скалярное квантование с масштабом по каждой компоненте;
+    - `quantization='binary'` — знак каждой компоненты, 1 бит; сходство — расстояние Хэмминга.
+
+    Оценки приближённые: кандидатов нужно досчитывать по полным векторам.
+
+    Args:
+        dims (int | None): Число компонент. None — все.
+        quantization (str): 'none', 'int8' или 'binary'.
+    """
+
+    def __init__(self, dims: int | None = None, quantization: str = 'none'):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f'Неизвестное квантование {quantization!r}, допустимо: {QUANTIZATIONS}')
+        self.dims = dims or None
+        self.quantization = quantization
+        self.codes = np.empty((0, 0), dtype=np.float32)
+        self.scale = np.empty(0, dtype=np.float32)
+
+    @property
+    def name(self) -> str:
+        """Имя настройки, например 'codes-256-int8'."""
+        return f"codes-{self.dims or 'full'}-{self.quantization}"
+
+    @property
+    def nbytes(self) -> int:
+        """Объём кодов в байтах."""
+        return self.codes.nbytes + self.scale.nbytes
+
+    def fit(self, matrix: np.ndarray):
+        """Строит коды для всех векторов хранилища.
+
+        Args:
+            matrix (np.ndarray): Нормализованные полные векторы (n, d).
+        """
+        vectors = truncate(matrix, self.dims) if len(matrix) else np.empty((0, 0), dtype=np.float32)
+        if self.quantization == 'int8':
+            self.scale = np.maximum(np.abs(vectors).max(axis=0), 1e-12) / 127 if len(vectors) \
+                else np.empty(0, dtype=np.float32)
+            self.codes = np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+        elif self.quantization == 'binary':
+            self.codes = np.packbits(vectors > 0, axis=1)
+        else:
+            self.codes = vectors
+
+    def scores(self, queries: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """Приближённые оценки сходства запросов со всеми (или выбранными) векторами: больше — ближе.
+
+        Args:
+            queries (np.ndarray): Нормализованные полные эмбеддинги запросов (q, d).
+            rows (np.ndarray | None): Номера строк, среди которых искать. None — все.
+
+        Returns:
+            np.ndarray: Матрица оценок (q, n).
+        """
+        codes = self.codes if rows is None else self.codes[rows]
+        queries = truncate(queries, self.dims)
+        if self.quantization == 'int8':
+            queries = queries * self.scale
+            scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+            for start in range(0, len(codes), BLOCK_ROWS):
+                block = codes[start:start + BLOCK_ROWS]
+                scores[:, start:start + len(block)] = queries @ block.T.astype(np.float32)
+            return scores
+        if self.quantization == 'binary':
+            bits = np.packbits(queries > 0, axis=1)
+            return -np.stack([POPCOUNT[np.bitwise_xor(codes, query_bits)].sum(axis=1, dtype=np.int32)
+                              for query_bits in bits])
+        return queries @ codes.T
+
+    def save(self, directory: str, version: str | None = None):
+        """Сохраняет коды в `directory/<name>.npz`.
+
+        Args:
+            directory (str): Директория хранилища.
+            version (str | None): Версия векторов, по которым построены коды.
+        """
+        path = os.path.join(directory, self.name + '.npz')
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, codes=self.codes, scale=self.scale, version=np.array(version or ''))
+        os.replace(path + '.tmp', path)
+
+    def load(self, directory: str, rows: int, version: str | None = None) -> bool:
+        """Загружает коды из `directory/<name>.npz`, если они построены по тем же векторам.
+
+        Args:
+            directory (str): Директория хранилища.
+            rows (int): Число векторов в хранилище.
+            version (str | None): Текущая версия векторов. Коды другой версии
+                (или сохранённые без версии) не загружаются.
+
+        Returns:
+            bool: Удалось ли загрузить коды.
+        """
+        path = os.path.join(directory, self.name + '.npz')
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            saved_version = str(data['version']) if 'version' in data else ''
+            if len(data['codes']) != rows or not version or saved_version != version:
+                return False
+            self.codes, self.scale = data['codes'], data['scale']
+        return True
@@ -0,0 +1,261 @@
+import asyncio
+import importlib
+from typing import Callable, List, Tuple
+
+import aiohttp
+from langchain_core.documents import Document
+from loguru import logger
+
+from config import (CHROMA_PATH, COLLECTION_NAME, CONTEXT_TOKEN_BUDGET, CORPUS_PATH, RETRIEVAL_SECRET,
+                    RETRIEVAL_SERVICE_URL, RETRIEVAL_TIMEOUT, RETRIEVAL_WATCH_INTERVAL)
+from monitoring.metrics import span
+
+SECRET_HEADER = 'X-Retrieval-Secret'
+
+
+def document_to_dict(doc: Document, score: float) -> dict:
+    """Сериализует пару (документ, расстояние) для передачи по сети."""
+    return {'page_content': doc.page_content, 'metadata': doc.metadata, 'score': score}
+
+
+def document_from_dict(data: dict) -> Tuple[Document, float]:
+    """Восстанавливает пару (документ, расстояние) из `document_to_dict`."""
+    return Document(page_content=data['page_content'], metadata=data['metadata']), data['score']
+
+
+class RetrievalClient:
+    """Асинхронный клиент сервиса поиска (`python src/cli.py serve`).
+
+    Повторяет интерфейс `AsyncRetriever`, поэтому может использоваться в `RagPipeline` вместо него,
+    а также интерфейс версий `IndexManager` (`version`, `rebuild`, `rollback`, `versions`, `on_swap`),
+    выполняя пересборку и откат на стороне сервиса.
+
+    Args:
+        url (str): Адрес сервиса: `unix:///путь/к/сокету` или `http://host:port`.
+        timeout (float): Таймаут запроса в секундах.
+        secret (str): Секрет для пересборки и отката (`RETRIEVAL_SECRET` сервиса).
+    """
+
+    def __init__(self, url: str, timeout: float = RETRIEVAL_TIMEOUT, secret: str = RETRIEVAL_SECRET):
+        if url.startswith('unix://'):
+            connector = aiohttp.UnixConnector(path=url.removeprefix('unix://'))
+            self.base_url = 'http://localhost'
+        else:
+            connector = aiohttp.TCPConnector()
+            self.base_url = url.rstrip('/')
+        headers = {SECRET_HEADER: secret} if secret else None
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout),
+                                             headers=headers)
+        self.version: str | None = None
+        self._listeners: List[Callable[[str], None]] = []
+
+    async def _post(self, path: str, payload: dict, timeout: aiohttp.ClientTimeout | None = None) -> dict:
+        # Явный timeout=None отключил бы таймаут сессии, поэтому он передаётся только если задан
+        kwargs = {'timeout': timeout} if timeout is not None else {}
+        async with self.session.post(self.base_url + path, json=payload, **kwargs) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    def _set_version(self, version: str | None):
+        if version is not None and version != self.version:
+            changed = self.version is not None
+            self.version = version
+            if changed:
+                for callback in self._listeners:
+                    callback(version)
+
+    def on_swap(self, callback: Callable[[str], None]):
+        """Регистрирует обработчик смены версии индекса на сервисе."""
+        self._listeners.append(callback)
+
+    async def health(self) -> dict:
+        """Проверяет доступность сервиса.
+
+        Returns:
+            dict: Состояние сервиса и версия индекса ('index_version').
+        """
+        async with self.session.get(self.base_url + '/health') as response:
+            response.raise_for_status()
+            health = await response.json()
+        self._set_version(health.get('index_version'))
+        return health
+
+    async def versions(self) -> List[dict]:
+        """Возвращает версии индекса на сервисе (см. `IndexManager.versions`)."""
+        async with self.session.get(self.base_url + '/versions') as response:
+            response.raise_for_status()
+            return (await response.json())['versions']
+
+    async def rebuild(self, refresh: bool = False) -> str:
+        """Пересобирает индекс на сервисе и дожидается переключения на новую версию.
+
+        Args:
+            refresh (bool): Перепроверить все ссылки и обновить изменившиеся страницы.
+
+        Returns:
+            str: Идентификатор новой версии.
+        """
+        result = await self._post('/rebuild', {'refresh': refresh}, timeout=aiohttp.ClientTimeout(total=None))
+        self._set_version(result['index_version'])
+        return self.version
+
+    async def rollback(self, name: str | None = None) -> str:
+        """Откатывает индекс на сервисе к предыдущей (или указанной) версии.
+
+        Args:
+            name (str | None): Директория версии из `versions()`.
+
+        Returns:
+            str: Идентификатор версии, ставшей активной.
+        """
+        self._set_version((await self._post('/rollback', {'name': name}))['index_version'])
+        return self.version
+
+    async def watch(self, interval: float = RETRIEVAL_WATCH_INTERVAL):
+        """Периодически сверяет версию индекса с сервисом, чтобы заметить его плановую пересборку."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.health()
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as ex:
+                logger.warning(f'Сервис поиска недоступен: {ex!r}')
+
+    def snapshot(self) -> 'RemoteSnapshot':
+        """Фиксирует версию индекса для одного запроса (см. `AsyncRetriever.snapshot`).
+
+        Returns:
+            RemoteSnapshot: Эмбеддинг и поиск через сервис и известная клиенту версия индекса.
+        """
+        return RemoteSnapshot(self, self.version)
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Вычисляет эмбеддинги пачки текстов одним запросом.
+
+        Args:
+            texts (List[str]): Тексты.
+
+        Returns:
+            List[List[float]]: Векторы эмбеддингов.
+        """
+        with span('query_embedding'):
+            return (await self._post('/embed', {'texts': texts}))['vectors']
+
+    async def embed(self, text: str) -> List[float]:
+        """Вычисляет эмбеддинг запроса.
+
+        Args:
+            text (str): Текст запроса.
+
+        Returns:
+            List[float]: Вектор эмбеддинга.
+        """
+        return (await self.embed_many([text]))[0]
+
+    async def search_many(self, vectors: List[List[float]], k: int = 5) -> List[List[Tuple[Document, float]]]:
+        """Ищет документы для пачки эмбеддингов одним запросом.
+
+        Args:
+            vectors (List[List[float]]): Эмбеддинги запросов.
+            k (int): Количество документов на запрос.
+
+        Returns:
+            List[List[Tuple[Document, float]]]: Для каждого запроса — пары (документ, расстояние).
+        """
+        with span('vector_search'):
+            results = (await self._post('/search', {'vectors': vectors, 'k': k}))['results']
+        return [[document_from_dict(item) for item in result] for result in results]
+
+    async def search_by_vector(self, vector: List[float], k: int = 5) -> List[Tuple[Document, float]]:
+        """Ищет документы, ближайшие к уже вычисленному эмбеддингу.
+
+        Args:
+            vector (List[float]): Эмбеддинг запроса.
+            k (int): Количество возвращаемых документов.
+
+        Returns:
+            List[Tuple[Document, float]]: Пары (документ, расстояние до запроса).
+        """
+        return (await self.search_many([vector], k))[0]
+
+    async def search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        """Ищет документы, релевантные запросу.
+
+        Args:
+            query (str): Текстовый запрос.
+            k (int): Количество возвращаемых документов.
+
+        Returns:
+            List[Tuple[Document, float]]: Пары (документ, расстояние до запроса).
+        """
+        return await self.search_by_vector(await self.embed(query), k)
+
+    async def get_context(self, query: str, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+        """Собирает контекст для запроса на стороне сервиса.
+
+        Args:
+            query (str): Текстовый запрос.
+            budget (int): Бюджет контекста в токенах.
+
+        Returns:
+            str: Контекст с нумерованными источниками.
+        """
+        with span('get_context'):
+            return (await self._post('/context', {'query': query, 'budget': budget}))['text']
+
+    async def aclose(self):
+        """Закрывает сессию."""
+        await self.session.close()
+
+
+class RemoteSnapshot:
+    """Версия индекса сервиса, зафиксированная на время одного запроса (`RetrievalClient.snapshot`).
+
+    Базу на сервисе закрепить нельзя, поэтому фиксируется только версия: если сервис переключился
+    во время запроса, ответ не попадёт в кэш (`AnswerCache.put`).
+
+    Args:
+        client (RetrievalClient): Клиент сервиса поиска.
+        version (str | None): Версия индекса в начале запроса.
+    """
+
+    def __init__(self, client: RetrievalClient, version: str | None):
+        self.client = client
+        self.version = version
+
+    async def embed(self, text: str) -> List[float]:
+        """Вычисляет эмбеддинг запроса (см. `RetrievalClient.embed`)."""
+        return await self.client.embed(text)
+
+    async def search_by_vector(self, vector: List[float], k: int = 5) -> List[Tuple[Document, float]]:
+        """Ищет документы по эмбеддингу (см. `RetrievalClient.search_by_vector`)."""
+        return await self.client.search_by_vector(vector, k)
+
+
+async def connect_retriever(url: str = RETRIEVAL_SERVICE_URL, links: List[str] | None = None):
+    """Подключается к сервису поиска, а если он не задан или недоступен — поднимает поиск в процессе.
+
+    Args:
+        url (str): Адрес сервиса поиска; пустая строка — сразу использовать локальный поиск.
+        links (List[str] | None): Ссылки для локального построения индекса (см. `initialize_db`).
+
+    Returns:
+        Tuple[RetrievalClient | AsyncRetriever, RetrievalClient | IndexManager]: Поисковик и объект,
+            управляющий версиями индекса (`version`, `rebuild`, `rollback`, `on_swap`, `watch`).
+    """
+    if url:
+        client = RetrievalClient(url)
+        try:
+            await client.health()
+            logger.info(f'Используется сервис поиска {url}')
+            return client, client
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as ex:
+            logger.warning(f'Сервис поиска {url} недоступен ({ex!r}), поиск будет выполняться в процессе')
+            await client.aclose()
+
+    # torch, sentence-transformers и chroma импортируются только здесь и в отдельном потоке
+    versions = await asyncio.to_thread(importlib.import_module, 'vec_db.versions')
+    from parser.links import LINKS
+
+    index = await versions.IndexManager.open(CHROMA_PATH, COLLECTION_NAME, CORPUS_PATH,
+                                             LINKS if links is None else links)
+    return index.retriever, index
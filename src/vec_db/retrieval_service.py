@@ -0,0 +1,203 @@
+import asyncio
+import hmac
+import json
+from numbers import Real
+from typing import List
+
+from aiohttp import web
+from loguru import logger
+
+from config import (CHROMA_PATH, COLLECTION_NAME, CONTEXT_CANDIDATES, CONTEXT_TOKEN_BUDGET, CORPUS_PATH,
+                    RETRIEVAL_CONCURRENCY, RETRIEVAL_SECRET)
+from monitoring.metrics import metrics_handler
+from parser.links import LINKS
+from vec_db.context import pack_context
+from vec_db.retrieval_client import SECRET_HEADER, document_to_dict
+from vec_db.versions import IndexManager, RebuildError
+
+# Эндпоинты, меняющие общий индекс
+ADMIN_PATHS = ('/rebuild', '/rollback')
+
+
+def _bad_request(message: str) -> web.HTTPBadRequest:
+    return web.HTTPBadRequest(text=json.dumps({'error': message}, ensure_ascii=False), content_type='application/json')
+
+
+async def _payload(request: web.Request, optional: bool = False) -> dict:
+    """Читает JSON-объект из тела запроса. При `optional=True` пустое тело означает `{}`.
+
+    Raises:
+        web.HTTPBadRequest: Если тело — не JSON-объект.
+    """
+    if optional and not await request.read():
+        return {}
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise _bad_request('Тело запроса должно быть JSON-объектом') from None
+    if not isinstance(payload, dict):
+        raise _bad_request('Тело запроса должно быть JSON-объектом')
+    return payload
+
+
+def _strings(payload: dict, name: str) -> List[str]:
+    value = payload.get(name)
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise _bad_request(f'Поле {name!r} должно быть списком строк')
+    return value
+
+
+def _vectors(payload: dict, name: str) -> List[List[float]]:
+    value = payload.get(name)
+    if not isinstance(value, list) or not all(
+            isinstance(vector, list) and vector
+            and all(isinstance(x, Real) and not isinstance(x, bool) for x in vector) for vector in value):
+        raise _bad_request(f'Поле {name!r} должно быть списком векторов из чисел')
+    if len({len(vector) for vector in value}) > 1:
+        raise _bad_request(f'Векторы в поле {name!r} должны быть одной длины')
+    return value
+
+
+def _positive_int(payload: dict, name: str, default: int) -> int:
+    value = payload.get(name, default)
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        raise _bad_request(f'Поле {name!r} должно быть положительным целым числом')
+    return value
+
+
+class RetrievalService:
+    """HTTP-сервис поиска: модель эмбеддингов и индекс загружаются один раз и используются
+    всеми процессами бота и CLI через `RetrievalClient`.
+
+    Эндпоинты:
+        - `POST /embed` `{"texts": [...]}` → `{"vectors": [...]}`;
+        - `POST /search` `{"vectors": [...]}` или `{"queries": [...]}`, `"k"` → `{"results": [[...]]}`;
+        - `POST /context` `{"query": "...", "budget": 1500}` → собранный контекст;
+        - `GET /health` → состояние и версия индекса; `GET /metrics` — метрики Prometheus;
+        - `POST /rebuild` `{"refresh": false}` → пересборка в новую версию с переключением на неё,
+          `POST /rollback` `{"name": null}` → откат, `GET /versions` → версии на диске.
+
+    Некорректное тело запроса (не JSON, нет обязательного поля, поле неверного типа)
+    отклоняется с кодом 400 и описанием ошибки в поле 'error'. Если задан `secret`,
+    запросы к `/rebuild` и `/rollback` без совпадающего заголовка X-Retrieval-Secret отклоняются с кодом 403.
+
+    Одновременно обрабатывается не более `concurrency` запросов, остальные ждут в очереди.
+    Эмбеддинги запросов разных клиентов объединяются в пачки `AsyncRetriever`.
+
+    Args:
+        index (IndexManager): Версии индекса и поисковик по активной версии.
+        concurrency (int): Максимальное число одновременно обрабатываемых запросов.
+        secret (str): Секрет для `/rebuild` и `/rollback`; пустая строка — без проверки.
+    """
+
+    def __init__(self, index: IndexManager, concurrency: int = RETRIEVAL_CONCURRENCY, secret: str = RETRIEVAL_SECRET):
+        self.index = index
+        self.retriever = index.retriever
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.secret = secret
+
+    def app(self) -> web.Application:
+        """Создаёт aiohttp-приложение сервиса."""
+        app = web.Application(middlewares=[self.check_secret, self.limit_concurrency])
+        app.router.add_post('/embed', self.embed)
+        app.router.add_post('/search', self.search)
+        app.router.add_post('/context', self.context)
+        app.router.add_get('/health', self.health)
+        app.router.add_get('/metrics', metrics_handler)
+        app.router.add_post('/rebuild', self.rebuild)
+        app.router.add_post('/rollback', self.rollback)
+        app.router.add_get('/versions', self.versions)
+        return app
+
+    @web.middleware
+    async def check_secret(self, request: web.Request, handler):
+        if self.secret and request.path in ADMIN_PATHS and not hmac.compare_digest(
+                request.headers.get(SECRET_HEADER, '').encode(), self.secret.encode()):
+            return web.json_response({'error': 'Неверный секрет сервиса поиска'}, status=403)
+        return await handler(request)
+
+    @web.middleware
+    async def limit_concurrency(self, request: web.Request, handler):
+        if request.path in ('/health', '/metrics', '/versions', *ADMIN_PATHS):
+            return await handler(request)
+        async with self.semaphore:
+            return await handler(request)
+
+    async def embed(self, request: web.Request) -> web.Response:
+        texts = _strings(await _payload(request), 'texts')
+        return web.json_response({'vectors': await self.retriever.embed_many(texts)})
+
+    async def search(self, request: web.Request) -> web.Response:
+        payload = await _payload(request)
+        k = _positive_int(payload, 'k', 5)
+        if payload.get('vectors') is not None:
+            vectors = _vectors(payload, 'vectors')
+        else:
+            vectors = await self.retriever.embed_many(_strings(payload, 'queries'))
+        results = await self.retriever.search_many(vectors, k)
+        return web.json_response(
+            {'results': [[document_to_dict(doc, score) for doc, score in result] for result in results]}
+        )
+
+    async def context(self, request: web.Request) -> web.Response:
+        payload = await _payload(request)
+        if not isinstance(payload.get('query'), str):
+            raise _bad_request("Поле 'query' должно быть строкой")
+        relevant_docs = await self.retriever.search(payload['query'],
+                                                    k=_positive_int(payload, 'k', CONTEXT_CANDIDATES))
+        packed = pack_context(relevant_docs, _positive_int(payload, 'budget', CONTEXT_TOKEN_BUDGET))
+        return web.json_response({'text': packed.text, 'sources': packed.sources, 'titles': packed.titles,
+                                  'tokens': packed.tokens, 'chunks': packed.chunks})
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({'status': 'ok', 'index_version': self.index.version,
+                                  'rebuilding': self.index.rebuilding})
+
+    async def rebuild(self, request: web.Request) -> web.Response:
+        payload = await _payload(request, optional=True)
+        if not isinstance(payload.get('refresh', False), bool):
+            raise _bad_request("Поле 'refresh' должно быть true или false")
+        try:
+            version = await self.index.rebuild(refresh=payload.get('refresh', False))
+        except RebuildError as ex:
+            return web.json_response({'error': str(ex)}, status=409)
+        return web.json_response({'index_version': version})
+
+    async def rollback(self, request: web.Request) -> web.Response:
+        payload = await _payload(request, optional=True)
+        if not isinstance(payload.get('name'), (str, type(None))):
+            raise _bad_request("Поле 'name' должно быть строкой или null")
+        try:
+            version = await self.index.rollback(payload.get('name'))
+        except RebuildError as ex:
+            return web.json_response({'error': str(ex)}, status=409)
+        return web.json_response({'index_version': version})
+
+    async def versions(self, request: web.Request) -> web.Response:
+        return web.json_response({'versions': await self.index.versions()})
+
+
+async def serve(socket_path: str | None = None, host: str = '127.0.0.1', port: int = 9200):
+    """Загружает индекс и запускает сервис поиска до остановки процесса.
+
+    Без `RETRIEVAL_SECRET` сервис слушает только UNIX-сокет или локальный адрес: иначе любой,
+    кому доступен порт, мог бы пересобрать или откатить общий индекс.
+
+    Args:
+        socket_path (str | None): Путь к UNIX-сокету. Если задан, `host` и `port` не используются.
+        host (str): Адрес HTTP-сервера.
+        port (int): Порт HTTP-сервера.
+    """
+    if not socket_path and not RETRIEVAL_SECRET and host not in ('127.0.0.1', 'localhost', '::1'):
+        raise RuntimeError(f'Для сервиса поиска на {host} задайте RETRIEVAL_SECRET')
+    index = await IndexManager.open(CHROMA_PATH, COLLECTION_NAME, CORPUS_PATH, LINKS)
+    runner = web.AppRunner(RetrievalService(index).app())
+    await runner.setup()
+    site = web.UnixSite(runner, socket_path) if socket_path else web.TCPSite(runner, host, port)
+    await site.start()
+    logger.success(f'Сервис поиска запущен: {site.name}')
+    try:
+        await index.watch()
+    finally:
+        await runner.cleanup()
+        index.retriever.close()
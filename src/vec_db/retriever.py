@@ -0,0 +1,238 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Set, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from config import RETRIEVER_BATCH_WINDOW, RETRIEVER_MAX_BATCH, RETRIEVER_WORKERS
+from monitoring.metrics import span
+from vec_db.embedding_cache import embed_queries
+
+
+class AsyncRetriever:
+    """Асинхронный поиск по векторной базе, не блокирующий цикл событий.
+
+    Эмбеддинги запросов и поиск выполняются в пуле потоков. Запросы, пришедшие в течение
+    `batch_window` секунд, объединяются в один вызов `embed_documents` (в кэш эмбеддингов
+    они не записываются, см. `embed_queries`). Базу можно заменить на лету (`swap`): запрос,
+    начатый через `snapshot()`, выполняется целиком на той версии, на которой начался.
+
+    Args:
+        db (VectorStore): Экземпляр векторной базы данных (Chroma или NumpyVectorStore).
+        batch_window (float): Сколько секунд ждать накопления запросов в пачку.
+        max_batch (int): Максимальный размер пачки; при его достижении пачка отправляется сразу.
+        workers (int): Число потоков для вычисления эмбеддингов и поиска.
+    """
+
+    def __init__(self,
+                 db: VectorStore,
+                 batch_window: float = RETRIEVER_BATCH_WINDOW,
+                 max_batch: int = RETRIEVER_MAX_BATCH,
+                 workers: int = RETRIEVER_WORKERS):
+        self.db = db
+        self.version: str | None = None
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='retriever')
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._pending_db: VectorStore | None = None
+        self._flush_handle: asyncio.TimerHandle | None = None
+        # Цикл событий хранит только слабые ссылки на задачи, поэтому ссылки на пачки держим сами
+        self._batches: Set[asyncio.Task] = set()
+        self.active = 0
+
+    def swap(self, db: VectorStore, version: str | None = None) -> VectorStore:
+        """Переключает поиск на другую версию базы.
+
+        Новые запросы идут в `db`, а уже начатые завершаются на прежней базе, ссылку на которую
+        они захватили при запуске (`snapshot`).
+
+        Args:
+            db (VectorStore): Новая версия базы.
+            version (str | None): Идентификатор новой версии.
+
+        Returns:
+            VectorStore: Прежняя версия базы.
+        """
+        previous, self.db, self.version = self.db, db, version
+        return previous
+
+    def snapshot(self) -> 'IndexSnapshot':
+        """Фиксирует текущую версию базы для одного запроса.
+
+        Returns:
+            IndexSnapshot: Эмбеддинг и поиск по базе, активной в момент вызова, и её версия.
+        """
+        return IndexSnapshot(self, self.db, self.version)
+
+    async def embed(self, text: str, db: VectorStore | None = None) -> List[float]:
+        """Вычисляет эмбеддинг запроса в составе ближайшей пачки.
+
+        Args:
+            text (str): Текст запроса.
+            db (VectorStore | None): Версия базы, модель эмбеддингов которой нужно использовать.
+                По умолчанию — текущая.
+
+        Returns:
+            List[float]: Вектор эмбеддинга.
+        """
+        db = self.db if db is None else db
+        if self._pending and db is not self._pending_db:
+            # Пачка считается одной моделью: запросы к разным версиям базы не смешиваются
+            self._flush()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self._pending_db = db
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        self.active += 1
+        try:
+            with span('query_embedding'):
+                return await future
+        finally:
+            self.active -= 1
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Вычисляет эмбеддинги нескольких запросов (одной или несколькими пачками).
+
+        Args:
+            texts (List[str]): Тексты запросов.
+
+        Returns:
+            List[List[float]]: Векторы эмбеддингов.
+        """
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        db, self._pending_db = self._pending_db, None
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._embed_batch(db, batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _embed_batch(self, db: VectorStore, batch: List[Tuple[str, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        try:
+            vectors = await loop.run_in_executor(
+                self.executor, embed_queries, db.embeddings, [text for text, _ in batch]
+            )
+        except BaseException as ex:
+            # Ошибку (и отмену) получают все ожидающие запросы пачки, иначе они зависли бы навсегда
+            for _, future in batch:
+                if future.done():
+                    continue
+                if isinstance(ex, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(ex)
+            if not isinstance(ex, Exception):
+                raise
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    async def search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        """Ищет документы, релевантные запросу.
+
+        Args:
+            query (str): Текстовый запрос.
+            k (int): Количество возвращаемых документов.
+
+        Returns:
+            List[Tuple[Document, float]]: Пары (документ, расстояние до запроса).
+        """
+        db = self.db
+        vector = await self.embed(query, db)
+        return await self.search_by_vector(vector, k, db)
+
+    async def search_by_vector(self,
+                               vector: List[float],
+                               k: int = 5,
+                               db: VectorStore | None = None) -> List[Tuple[Document, float]]:
+        """Ищет документы, ближайшие к уже вычисленному эмбеддингу.
+
+        Args:
+            vector (List[float]): Эмбеддинг запроса.
+            k (int): Количество возвращаемых документов.
+            db (VectorStore | None): Версия базы для поиска. По умолчанию — текущая.
+
+        Returns:
+            List[Tuple[Document, float]]: Пары (документ, расстояние до запроса).
+        """
+        db = self.db if db is None else db
+        loop = asyncio.get_running_loop()
+        self.active += 1
+        try:
+            with span('vector_search'):
+                return await loop.run_in_executor(
+                    self.executor, db.similarity_search_by_vector_with_relevance_scores, vector, k
+                )
+        finally:
+            self.active -= 1
+
+    async def search_many(self, vectors: List[List[float]], k: int = 5) -> List[List[Tuple[Document, float]]]:
+        """Ищет документы для пачки эмбеддингов.
+
+        Если хранилище умеет искать пачкой (`NumpyVectorStore.similarity_search_by_vectors`),
+        выполняется один векторизованный поиск, иначе — поиск по каждому эмбеддингу.
+
+        Args:
+            vectors (List[List[float]]): Эмбеддинги запросов.
+            k (int): Количество документов на запрос.
+
+        Returns:
+            List[List[Tuple[Document, float]]]: Для каждого запроса — пары (документ, расстояние).
+        """
+        db = self.db
+        if not hasattr(db, 'similarity_search_by_vectors'):
+            return list(await asyncio.gather(*(self.search_by_vector(vector, k, db) for vector in vectors)))
+        loop = asyncio.get_running_loop()
+        self.active += 1
+        try:
+            with span('vector_search'):
+                return await loop.run_in_executor(self.executor, db.similarity_search_by_vectors, vectors, k)
+        finally:
+            self.active -= 1
+
+    def close(self):
+        """Останавливает пул потоков."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def aclose(self):
+        """Асинхронный вариант `close` (совместим с `RetrievalClient`)."""
+        self.close()
+
+
+class IndexSnapshot:
+    """Версия базы, зафиксированная на время одного запроса (`AsyncRetriever.snapshot`).
+
+    Эмбеддинг, поиск и версия для кэша ответов берутся из одной и той же базы, даже если
+    во время запроса индекс переключился на новую версию.
+
+    Args:
+        retriever (AsyncRetriever): Поисковик, выполняющий запросы.
+        db (VectorStore): Зафиксированная версия базы.
+        version (str | None): Идентификатор этой версии.
+    """
+
+    def __init__(self, retriever: AsyncRetriever, db: VectorStore, version: str | None):
+        self.retriever = retriever
+        self.db = db
+        self.version = version
+
+    async def embed(self, text: str) -> List[float]:
+        """Вычисляет эмбеддинг запроса (см. `AsyncRetriever.embed`)."""
+        return await self.retriever.embed(text, self.db)
+
+    async def search_by_vector(self, vector: List[float], k: int = 5) -> List[Tuple[Document, float]]:
+        """Ищет документы по эмбеддингу (см. `AsyncRetriever.search_by_vector`)."""
+        return await self.retriever.search_by_vector(vector, k, self.db)
@@ -1,9 +1,14 @@
 from typing import List
 
-from langchain_chroma import Chroma
 from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
 from langchain_text_splitters import MarkdownHeaderTextSplitter
 
+from config import CONTEXT_CANDIDATES, CONTEXT_TOKEN_BUDGET
+from monitoring.metrics import span
+from vec_db.context import pack_context
+from vec_db.retriever import AsyncRetriever
+
 
 def chunks_from_md(docs: List[Document]) -> List[Document]:
     """Разбивает список документов с Markdown-содержимым на чанки по заголовкам.
@@ -19,7 +24,7 @@ def chunks_from_md(docs: List[Document]) -> List[Document]:
 
             - часть исходного текста разбитого по ###,
 
-            - объединённые метаданные: оригинальные + новые ({'Header': '...'}).
+            - объединённые метаданные: оригинальные + новые ({'Header': '...', 'chunk': номер чанка в документе}).
     """
     headers_to_split_on = [
         ("###", "Header"),
@@ -28,41 +33,52 @@ def chunks_from_md(docs: List[Document]) -> List[Document]:
     text_splitter = MarkdownHeaderTextSplitter(headers_to_split_on, strip_headers=False)
 
     splitted_docs = []
-    for doc in docs:
-        chunks = text_splitter.split_text(doc.page_content)
-        splitted_docs += [
-            Document(
-                page_content=chunk.page_content,
-                metadata={
-                    **doc.metadata,
-                    **chunk.metadata
-                }
-            ) for chunk in chunks
-        ]
+    with span('chunking'):
+        for doc in docs:
+            chunks = text_splitter.split_text(doc.page_content)
+            splitted_docs += [
+                Document(
+                    page_content=chunk.page_content,
+                    metadata={
+                        **doc.metadata,
+                        **chunk.metadata,
+                        'chunk': i
+                    }
+                ) for i, chunk in enumerate(chunks)
+            ]
     return splitted_docs
 
 
-def get_context(db: Chroma, query: str) -> str:
+def get_context(db: VectorStore, query: str, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
     """Извлекает релевантный контекст из векторной базы данных на основе запроса.
 
      Args:
-         db (Chroma): Экземпляр векторной базы данных Chroma.
+         db (VectorStore): Экземпляр векторной базы данных (Chroma или NumpyVectorStore).
+         query (str): Входной текстовый запрос, по которому ищутся релевантные фрагменты.
+         budget (int): Бюджет контекста в токенах.
+
+     Returns:
+         str: Строка, содержащая объединённый контент релевантных документов с нумерованными источниками.
+     """
+    with span('get_context'):
+        relevant_docs = db.similarity_search_with_score(query, k=CONTEXT_CANDIDATES)
+        return pack_context(relevant_docs, budget).text
+
+
+async def aget_context(retriever: AsyncRetriever, query: str, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Асинхронная версия `get_context`: поиск выполняется вне цикла событий.
+
+     Args:
+         retriever (AsyncRetriever): Асинхронный поисковик по векторной базе.
          query (str): Входной текстовый запрос, по которому ищутся релевантные фрагменты.
+         budget (int): Бюджет контекста в токенах.
 
      Returns:
-         str: Строка, содержащая объединённый контент релевантных документов.
+         str: Строка, содержащая объединённый контент релевантных документов с нумерованными источниками.
      """
-    relevant_docs = db.similarity_search_with_score(query, k=5)
-    context_parts = []
-    for doc, score in relevant_docs:
-        source = doc.metadata.get('source', 'Источник не указан')
-        context_parts.append(
-            f"{doc.page_content}\n"
-            f"Источник: {source}*\n"
-        )
-
-    context = "\n".join(context_parts)
-    return context
+    with span('get_context'):
+        relevant_docs = await retriever.search(query, k=CONTEXT_CANDIDATES)
+        return pack_context(relevant_docs, budget).text
 
 
 def dicts_to_documents(docs: List[dict]) -> List[Document]:
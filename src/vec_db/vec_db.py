@@ -1,106 +1,146 @@
-import json
+import asyncio
 import os
+import uuid
 
-import torch
-
-from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
 from loguru import logger
 from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
 from typing import List
 
-from parser.parser import parse_links
-from vec_db.utils import chunks_from_md, dicts_to_documents
+from config import (EMBEDDING_BACKEND, EMBEDDING_MODEL, JSON_PATH, VECTOR_DIMS, VECTOR_QUANTIZATION, VECTOR_RESCORE,
+                    VECTOR_STORE)
+from monitoring.metrics import span
+from vec_db.corpus import CorpusStore
+from vec_db.embeddings import load_embeddings
+from vec_db.ingest import ingest
+from vec_db.manifest import CHUNK_SCHEMA_VERSION
+from vec_db.numpy_store import NumpyVectorStore
+
+INDEX_VERSION_FILE = 'index_version'
 
 
-def generate_vecdb(chroma_path: str, collection_name: str, data: List[Document]) -> Chroma:
-    """Создаёт векторную базу данных Chroma из списка документов с использованием HuggingFace-эмбеддингов.
+def write_index_version(chroma_path: str, version: str | None = None) -> str:
+    """Записывает новый идентификатор версии индекса в директорию базы.
 
     Args:
-        chroma_path (str): Путь к директории, где будет сохранена.
-        collection_name (str): Имя коллекции в Chroma.
-        data: Список объектов Document, каждый из которых содержит текст (page_content) и метаданные (metadata).
+        chroma_path (str): Путь к директории Chroma DB.
+        version (str | None): Идентификатор версии. По умолчанию — случайный.
 
     Returns:
-        Chroma: Экземпляр векторной базы данных Chroma
+        str: Новый идентификатор версии.
     """
-    try:
+    version = version or uuid.uuid4().hex
+    with open(os.path.join(chroma_path, INDEX_VERSION_FILE), 'w', encoding='utf-8') as f:
+        f.write(version)
+    return version
+
+
+def get_index_version(chroma_path: str) -> str:
+    """Возвращает идентификатор версии индекса. Меняется при каждой пересборке базы.
+
+    Args:
+        chroma_path (str): Путь к директории Chroma DB.
+
+    Returns:
+        str: Идентификатор версии индекса.
+    """
+    path = os.path.join(chroma_path, INDEX_VERSION_FILE)
+    if not os.path.exists(path):
+        return write_index_version(chroma_path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
 
-        logger.info("Загрузка модели эмбеддингов...")
-        embeddings = HuggingFaceEmbeddings(
-            model_name="Qwen/Qwen3-Embedding-0.6B",
-            model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"},
-            encode_kwargs={"normalize_embeddings": True},
-        )
-        logger.info("Создание Chroma DB...")
-        chroma_db = Chroma.from_texts(
-            texts=[item.page_content for item in data],
-            metadatas=[item.metadata for item in data],
-            embedding=embeddings,
-            persist_directory=chroma_path,
-            collection_name=collection_name,
-        )
-        return chroma_db
-    except Exception as e:
-        logger.error(f"Ошибка: {e}")
-        raise
 
+def current_index_config(vector_store: str = VECTOR_STORE) -> dict:
+    """Возвращает параметры, с которыми строится индекс при текущей конфигурации.
 
-def connect_to_vecdb(chroma_path: str, collection_name: str) -> Chroma:
-    """Подключается к существующей векторной базе данных Chroma.
+    Векторы разных моделей и бэкендов эмбеддингов несовместимы, у каждого хранилища
+    своя коллекция, а в индексах прежней схемы у чанков нет номера позиции (`chunk`),
+    поэтому при смене любого из параметров индекс пересобирается.
+
+    Args:
+        vector_store (str): Бэкенд хранилища: 'chroma' или 'numpy'.
+
+    Returns:
+        dict: Бэкенд и модель эмбеддингов, бэкенд хранилища, версия схемы чанков.
+    """
+    return {'embedding_backend': EMBEDDING_BACKEND, 'embedding_model': EMBEDDING_MODEL, 'vector_store': vector_store,
+            'chunk_schema': CHUNK_SCHEMA_VERSION}
+
+
+def connect_to_vecdb(chroma_path: str,
+                     collection_name: str,
+                     vector_store: str = VECTOR_STORE,
+                     embeddings: Embeddings | None = None) -> VectorStore:
+    """Подключается к векторной базе данных. Пустая коллекция создаётся при первом подключении.
 
         Args:
             chroma_path (str): Путь к директории, где хранится сохранённая
                 векторная база данных.
             collection_name (str): Имя коллекции.
+            vector_store (str): Бэкенд хранилища: 'chroma' или 'numpy'.
+            embeddings (Embeddings | None): Уже загруженная модель эмбеддингов
+                (например, модель текущей версии индекса). По умолчанию модель загружается заново.
 
         Returns:
-            Chroma: Экземпляр векторной базы данных Chroma.
+            VectorStore: Экземпляр векторной базы данных (Chroma или NumpyVectorStore).
     """
     try:
-        logger.info("Загрузка модели эмбеддингов...")
-        embeddings = HuggingFaceEmbeddings(
-            model_name="Qwen/Qwen3-Embedding-0.6B",
-            model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"},
-            encode_kwargs={"normalize_embeddings": True},
-        )
-
-        chroma_db = Chroma(
-            persist_directory=chroma_path,
-            embedding_function=embeddings,
-            collection_name=collection_name,
-        )
-
-        logger.success("Успешное подключение к базе Chroma")
+        embeddings = embeddings or load_embeddings()
+
+        if vector_store == 'numpy':
+            chroma_db = NumpyVectorStore(embeddings, os.path.join(chroma_path, collection_name),
+                                         dims=VECTOR_DIMS or None, quantization=VECTOR_QUANTIZATION,
+                                         rescore=VECTOR_RESCORE)
+        else:
+            chroma_db = Chroma(
+                persist_directory=chroma_path,
+                embedding_function=embeddings,
+                collection_name=collection_name,
+            )
+
+        logger.success(f"Успешное подключение к векторной базе ({vector_store})")
         return chroma_db
     except Exception as e:
-        logger.error(f"Ошибка подключения к Chroma: {e}")
+        logger.error(f"Ошибка подключения к векторной базе ({vector_store}): {e}")
         raise
 
 
-async def initialize_db(chroma_path, collection_name, json_path, links):
-    """Инициализирует векторную базу данных: либо загружает существующую, либо создаёт новую.
+async def initialize_db(chroma_path: str,
+                        collection_name: str,
+                        corpus_path: str,
+                        links: List[str],
+                        parse_missing: bool = False,
+                        refresh: bool = False) -> VectorStore:
+    """Инициализирует векторную базу данных: подключается к ней (или создаёт пустую) и потоково
+    синхронизирует её с корпусом документов и списком ссылок (см. `vec_db.ingest.ingest`).
+
+    Загрузка модели и запись в коллекцию выполняются в отдельном потоке,
+    чтобы не блокировать цикл событий (например, обработку `/start` ботом во время прогрева).
 
     Args:
         chroma_path (str): Путь к директории для хранения/загрузки Chroma DB.
         collection_name (str): Имя коллекции в Chroma.
-        json_path (str): Путь к JSON-файлу, в котором хранятся предварительно
-            извлечённые документы.
-        links (List[str]): Список URL-адресов, которые будут распаршены,
-            если JSON-файл не найден. Используется для получения исходных данных.
+        corpus_path (str): Путь к JSONL-корпусу извлечённых документов. Если корпуса нет,
+            в него переносится `data.json` прежнего формата.
+        links (List[str]): Список URL-адресов. Если корпус пуст, все они будут распаршены.
+        parse_missing (bool): Распарсить ли ссылки из `links`, которых нет в корпусе.
+        refresh (bool): Перепроверить все ссылки и обновить изменившиеся страницы.
 
     Returns:
-        Chroma: Готовый экземпляр векторной базы данных Chroma.
+        VectorStore: Готовый экземпляр векторной базы данных.
     """
-    if not os.path.exists(chroma_path):
-        logger.info('Сбор документов...')
-        if os.path.exists(json_path):
-            with open(json_path, 'r', encoding='utf-8') as f:
-                documents = json.load(f)
-                documents = chunks_from_md(dicts_to_documents(documents))
-        else:
-            documents = chunks_from_md(await parse_links(links))
-        return generate_vecdb(chroma_path, collection_name, documents)
-    return connect_to_vecdb(chroma_path, collection_name)
-
-
+    os.makedirs(chroma_path, exist_ok=True)
+    corpus = CorpusStore(corpus_path)
+    corpus.import_json(JSON_PATH)
+    chroma_db = await asyncio.to_thread(connect_to_vecdb, chroma_path, collection_name)
+    with span('index_sync'):
+        stats = await ingest(chroma_db, chroma_path, corpus, links, parse_missing, refresh,
+                             index_config=current_index_config())
+    if stats['added_chunks'] or stats['deleted_chunks']:
+        write_index_version(chroma_path)
+        logger.info(f"Индекс синхронизирован: {stats}")
+    if corpus.records > 2 * len(corpus):
+        corpus.compact()
+    return chroma_db
@@ -0,0 +1,423 @@
+import asyncio
+import fcntl
+import json
+import os
+import random
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+
+from langchain_core.vectorstores import VectorStore
+from loguru import logger
+
+from config import (INDEX_KEEP_VERSIONS, INDEX_MIN_SIZE_RATIO, INDEX_REBUILD_BATCH_SIZE, INDEX_REBUILD_INTERVAL,
+                    INDEX_REBUILD_MAX_YIELD, INDEX_REBUILD_PAUSE, INDEX_SMOKE_QUERIES, INDEX_SMOKE_RECALL,
+                    RETRIEVAL_WATCH_INTERVAL)
+from monitoring.metrics import INDEX_REBUILDS_TOTAL, span
+from vec_db.corpus import CorpusStore
+from vec_db.ingest import ingest, log_missing_links
+from vec_db.manifest import load_index_config, load_manifest
+from vec_db.retriever import AsyncRetriever
+from vec_db.vec_db import (connect_to_vecdb, current_index_config, get_index_version, initialize_db,
+                           write_index_version)
+
+VERSIONS_DIR = 'versions'
+STATE_FILE = 'versions.json'
+STATE_LOCK_FILE = 'versions.lock'
+REBUILD_LOCK_FILE = 'rebuild.lock'
+LEASE_FILE = '.in_use'
+SMOKE_QUERY_CHARS = 300
+
+
+class RebuildError(Exception):
+    """Пересборка индекса не выполнена: уже идёт другая или новая версия не прошла проверку."""
+
+
+@contextmanager
+def state_lock(chroma_path: str) -> Iterator[None]:
+    """Межпроцессная блокировка `versions.json` на время чтения-изменения-записи."""
+    os.makedirs(chroma_path, exist_ok=True)
+    with open(os.path.join(chroma_path, STATE_LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+@contextmanager
+def rebuild_lock(chroma_path: str) -> Iterator[None]:
+    """Межпроцессная блокировка пересборки и отката: активную версию меняет один процесс за раз.
+
+    Raises:
+        RebuildError: Блокировку держит другой процесс.
+    """
+    os.makedirs(chroma_path, exist_ok=True)
+    with open(os.path.join(chroma_path, REBUILD_LOCK_FILE), 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RebuildError('Пересборка или откат индекса уже выполняется другим процессом') from None
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def load_state(chroma_path: str) -> dict:
+    """Читает, какая версия индекса активна и на какие можно откатиться.
+
+    Версии хранятся в `<chroma_path>/versions/<имя>`. Индекс, построенный до появления версий,
+    лежит в самой `chroma_path` и обозначается как '.'.
+
+    Args:
+        chroma_path (str): Корневая директория индекса.
+
+    Returns:
+        dict: 'current' — директория активной версии относительно `chroma_path`,
+            'history' — предыдущие активные версии, последняя — самая новая,
+            'rebuilt_at' — время последней успешной пересборки (если она была).
+    """
+    path = os.path.join(chroma_path, STATE_FILE)
+    if not os.path.exists(path):
+        return {'current': '.', 'history': []}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(chroma_path: str, state: dict):
+    """Атомарно сохраняет состояние версий (запись во временный файл и `os.replace`)."""
+    path = os.path.join(chroma_path, STATE_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def active_path(chroma_path: str) -> str:
+    """Возвращает директорию активной версии индекса."""
+    return os.path.normpath(os.path.join(chroma_path, load_state(chroma_path)['current']))
+
+
+class IndexManager:
+    """Версии индекса: фоновая пересборка, проверка, переключение и откат без остановки поиска.
+
+    Новая версия строится из корпуса в отдельной директории `versions/<имя>`. Запись идёт
+    небольшими пачками с паузами, а пока поисковик обслуживает запросы, пересборка ждёт
+    (не дольше `INDEX_REBUILD_MAX_YIELD` секунд на пачку). Готовая версия проходит проверку:
+    она не пуста, не меньше `INDEX_MIN_SIZE_RATIO` от текущей, а по фрагментам случайных чанков
+    находятся их источники. После проверки активная версия записывается в `versions.json`,
+    а поисковик переключается на неё (`AsyncRetriever.swap`). Предыдущая версия остаётся
+    открытой для мгновенного отката, на диске хранятся `keep` предыдущих версий.
+
+    Одним индексом могут пользоваться несколько процессов (бот, CLI, сервис поиска):
+    `versions.json` изменяется под файловой блокировкой, пересборку и откат одновременно выполняет
+    только один процесс (`rebuild.lock`), процесс держит разделяемую блокировку
+    (`.in_use`) на каждой открытой версии, и такие версии не удаляются. `watch` замечает
+    переключение, сделанное другим процессом, и переключает поиск вслед за ним.
+
+    Args:
+        retriever (AsyncRetriever): Поисковик, обслуживающий запросы.
+        chroma_path (str): Корневая директория индекса.
+        collection_name (str): Имя коллекции.
+        corpus_path (str): Путь к JSONL-корпусу.
+        links (List[str]): Актуальный список URL-адресов.
+        keep (int): Сколько предыдущих версий хранить на диске.
+    """
+
+    def __init__(self,
+                 retriever: AsyncRetriever,
+                 chroma_path: str,
+                 collection_name: str,
+                 corpus_path: str,
+                 links: List[str],
+                 keep: int = INDEX_KEEP_VERSIONS):
+        self.retriever = retriever
+        self.chroma_path = chroma_path
+        self.collection_name = collection_name
+        self.corpus_path = corpus_path
+        self.links = links
+        self.keep = keep
+        self.state = load_state(chroma_path)
+        self.version = get_index_version(self._path(self.state['current']))
+        self.retriever.version = self.version
+        self._previous: tuple[str, VectorStore] | None = None
+        self._leases: dict[str, object] = {}
+        self._lock = asyncio.Lock()
+        self._listeners: List[Callable[[str], None]] = []
+        self._acquire(self.state['current'])
+
+    @classmethod
+    async def open(cls, chroma_path: str, collection_name: str, corpus_path: str, links: List[str]) -> 'IndexManager':
+        """Подключается к активной версии индекса и создаёт менеджер.
+
+        Если индекса ещё нет, он строится на месте (см. `initialize_db`). Существующая версия
+        не изменяется: её могут обслуживать другие процессы, а обновления попадают в индекс
+        через новую версию (`rebuild`, `python src/cli.py sync`). Если активная версия построена
+        с другой моделью эмбеддингов или другим хранилищем, до начала работы строится новая версия.
+        """
+        path = active_path(chroma_path)
+        manifest = load_manifest(path)
+        if manifest is None:
+            db = await initialize_db(path, collection_name, corpus_path, links)
+        else:
+            log_missing_links(links, manifest)
+            db = await asyncio.to_thread(connect_to_vecdb, path, collection_name)
+        manager = cls(AsyncRetriever(db), chroma_path, collection_name, corpus_path, links)
+        if load_index_config(path) != current_index_config():
+            logger.warning(f'Индекс {path} построен с другими параметрами эмбеддингов, хранилища или схемы чанков, '
+                           'он будет пересобран')
+            try:
+                await manager.rebuild()
+            except RebuildError as ex:
+                # Версию собирает другой процесс, `watch` переключится на неё после проверки
+                logger.warning(f'Пересборка индекса отложена: {ex}')
+        return manager
+
+    def _path(self, name: str) -> str:
+        return os.path.normpath(os.path.join(self.chroma_path, name))
+
+    def _check_name(self, name: str) -> str:
+        """Проверяет, что версия — корневой индекс '.' или директория внутри `versions/`."""
+        name = os.path.normpath(name)
+        if name == '.':
+            return name
+        versions_dir = os.path.realpath(os.path.join(self.chroma_path, VERSIONS_DIR))
+        path = os.path.realpath(self._path(name))
+        if os.path.isabs(name) or os.path.dirname(path) != versions_dir:
+            raise RebuildError(f'Версия индекса {name} не находится в {VERSIONS_DIR}/')
+        return name
+
+    def _acquire(self, name: str):
+        if name not in self._leases:
+            lease = open(os.path.join(self._path(name), LEASE_FILE), 'a')
+            fcntl.flock(lease, fcntl.LOCK_SH)
+            self._leases[name] = lease
+
+    def _release(self, name: str):
+        lease = self._leases.pop(name, None)
+        if lease is not None:
+            lease.close()
+
+    @property
+    def rebuilding(self) -> bool:
+        return self._lock.locked()
+
+    def on_swap(self, callback: Callable[[str], None]):
+        """Регистрирует обработчик смены версии (например, `AnswerCache.bind_index`)."""
+        self._listeners.append(callback)
+
+    async def versions(self) -> List[dict]:
+        """Возвращает версии индекса на диске.
+
+        Returns:
+            List[dict]: Имя директории, идентификатор версии и признак активной версии.
+        """
+        names = ['.'] if os.path.exists(os.path.join(self.chroma_path, 'index_version')) else []
+        versions_dir = os.path.join(self.chroma_path, VERSIONS_DIR)
+        if os.path.isdir(versions_dir):
+            names += [os.path.join(VERSIONS_DIR, name) for name in sorted(os.listdir(versions_dir))
+                      if os.path.exists(os.path.join(versions_dir, name, 'index_version'))]
+        return [{'name': name, 'version': get_index_version(self._path(name)), 'current': name == self.state['current']}
+                for name in names]
+
+    async def _throttle(self):
+        await asyncio.sleep(INDEX_REBUILD_PAUSE)
+        deadline = time.monotonic() + INDEX_REBUILD_MAX_YIELD
+        while self.retriever.active and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def _validate(self, db: VectorStore):
+        records = await asyncio.to_thread(db.get, include=['documents', 'metadatas'])
+        count = len(records['ids'])
+        if not count:
+            raise RebuildError('Новая версия индекса пуста')
+        current = len((await asyncio.to_thread(self.retriever.db.get, include=[]))['ids'])
+        if count < INDEX_MIN_SIZE_RATIO * current:
+            raise RebuildError(f'В новой версии {count} чанков, в текущей — {current}')
+
+        sample = random.sample(range(count), min(INDEX_SMOKE_QUERIES, count))
+        queries = [records['documents'][i][:SMOKE_QUERY_CHARS] for i in sample]
+        vectors = await asyncio.to_thread(db.embeddings.embed_documents, queries)
+        hits = 0
+        for i, vector in zip(sample, vectors):
+            results = await asyncio.to_thread(db.similarity_search_by_vector_with_relevance_scores, vector, 5)
+            hits += any(doc.metadata.get('source') == records['metadatas'][i]['source'] for doc, _ in results)
+        if hits < INDEX_SMOKE_RECALL * len(sample):
+            raise RebuildError(f'Проверка новой версии не пройдена: источник найден для {hits} из {len(sample)} чанков')
+
+    def _activate(self, name: str, db: VectorStore, state: dict):
+        """Переключает поиск на версию `name`, уже записанную в `state` на диске."""
+        self._acquire(name)
+        self.version = get_index_version(self._path(name))
+        previous = (self.state['current'], self.retriever.swap(db, self.version))
+        self.state = state
+        if self._previous is not None and self._previous[0] not in (previous[0], name):
+            self._release(self._previous[0])
+        self._previous = previous
+        for callback in self._listeners:
+            callback(self.version)
+
+    def _commit(self, name: str, rollback: bool = False) -> dict:
+        """Записывает новую активную версию, перечитав `versions.json` под блокировкой."""
+        with state_lock(self.chroma_path):
+            state = load_state(self.chroma_path)
+            history = state['history']
+            if rollback:
+                history = history[:history.index(name)] if name in history else history
+            elif state['current'] != name:
+                history = history + [state['current']]
+            rebuilt_at = state.get('rebuilt_at') if rollback else time.time()
+            state = {'current': name, 'history': history, 'rebuilt_at': rebuilt_at}
+            save_state(self.chroma_path, state)
+        return state
+
+    def _prune(self):
+        with state_lock(self.chroma_path):
+            state = load_state(self.chroma_path)
+            keep = set(state['history'][-self.keep:]) | {state['current']} | set(self._leases)
+            versions_dir = os.path.join(self.chroma_path, VERSIONS_DIR)
+            for name in os.listdir(versions_dir) if os.path.isdir(versions_dir) else []:
+                path = os.path.join(versions_dir, name)
+                if os.path.join(VERSIONS_DIR, name) in keep:
+                    continue
+                with open(os.path.join(path, LEASE_FILE), 'a') as lease:
+                    try:
+                        fcntl.flock(lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        logger.debug(f'Версия индекса {name} открыта другим процессом и не удаляется')
+                        continue
+                    logger.info(f'Удаление старой версии индекса {name}')
+                    shutil.rmtree(path, ignore_errors=True)
+            state['history'] = [name for name in state['history'] if os.path.exists(self._path(name))]
+            save_state(self.chroma_path, state)
+        self.state = state
+
+    async def rebuild(self, refresh: bool = False, max_age: float | None = None) -> str:
+        """Строит новую версию индекса в фоне, проверяет её и переключает на неё поиск.
+
+        Args:
+            refresh (bool): Перепроверить все ссылки и обновить изменившиеся страницы в корпусе.
+                Ссылки, которых нет в корпусе, парсятся всегда.
+            max_age (float | None): Пересобирать, только если последняя пересборка (в любом процессе)
+                была больше `max_age` секунд назад. Проверяется под блокировкой пересборки.
+
+        Returns:
+            str: Идентификатор новой версии (или активной, если пересборка не понадобилась).
+
+        Raises:
+            RebuildError: Пересборка уже выполняется (в этом или другом процессе) или новая версия
+                не прошла проверку.
+        """
+        if self._lock.locked():
+            raise RebuildError('Пересборка индекса уже выполняется')
+        async with self._lock:
+            with rebuild_lock(self.chroma_path):
+                rebuilt_at = load_state(self.chroma_path).get('rebuilt_at')
+                if max_age is not None and rebuilt_at is not None and time.time() - rebuilt_at < max_age:
+                    logger.debug('Индекс недавно пересобран другим процессом, плановая пересборка пропущена')
+                    return self.version
+                return await self._rebuild(refresh)
+
+    async def _rebuild(self, refresh: bool) -> str:
+        name = os.path.join(VERSIONS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}")
+        path = self._path(name)
+        logger.info(f'Пересборка индекса в {path}...')
+        with state_lock(self.chroma_path):
+            # Под блокировкой, чтобы `_prune` другого процесса не удалил недостроенную версию
+            os.makedirs(path)
+            self._acquire(name)
+        try:
+            with span('index_rebuild'):
+                db = await asyncio.to_thread(connect_to_vecdb, path, self.collection_name,
+                                             embeddings=self.retriever.db.embeddings)
+                stats = await ingest(db, path, CorpusStore(self.corpus_path), self.links, parse_missing=True,
+                                     refresh=refresh, batch_size=INDEX_REBUILD_BATCH_SIZE,
+                                     throttle=self._throttle, index_config=current_index_config())
+                await self._validate(db)
+        except BaseException:
+            INDEX_REBUILDS_TOTAL.inc(status='failed')
+            self._release(name)
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        write_index_version(path, os.path.basename(name))
+        self._activate(name, db, self._commit(name))
+        await asyncio.to_thread(self._prune)
+        INDEX_REBUILDS_TOTAL.inc(status='ok')
+        logger.success(f"Индекс переключён на версию {self.version}: {stats['added_chunks']} чанков")
+        return self.version
+
+    async def _connect(self, name: str) -> VectorStore:
+        if self._previous is not None and self._previous[0] == name:
+            return self._previous[1]
+        return await asyncio.to_thread(connect_to_vecdb, self._path(name), self.collection_name,
+                                       embeddings=self.retriever.db.embeddings)
+
+    async def rollback(self, name: str | None = None) -> str:
+        """Переключает поиск на предыдущую (или указанную) версию индекса.
+
+        Args:
+            name (str | None): Директория версии из `versions()`. По умолчанию — предыдущая активная.
+
+        Returns:
+            str: Идентификатор версии, ставшей активной.
+
+        Raises:
+            RebuildError: Откатываться некуда, версия не находится в `versions/` или выполняется пересборка.
+        """
+        if self._lock.locked():
+            raise RebuildError('Выполняется пересборка индекса')
+        async with self._lock:
+            with rebuild_lock(self.chroma_path):
+                state = load_state(self.chroma_path)
+                if name is None:
+                    if not state['history']:
+                        raise RebuildError('Нет предыдущих версий индекса')
+                    name = state['history'][-1]
+                name = self._check_name(name)
+                if name == state['current'] == self.state['current']:
+                    return self.version
+                if not os.path.exists(os.path.join(self._path(name), 'index_version')):
+                    raise RebuildError(f'Версия индекса {name} не найдена')
+                db = await self._connect(name)
+                self._activate(name, db, self._commit(name, rollback=True))
+                INDEX_REBUILDS_TOTAL.inc(status='rollback')
+                logger.warning(f'Индекс откатен на версию {self.version} ({name})')
+                return self.version
+
+    async def _follow(self):
+        """Переключает поиск на версию, которую сделал активной другой процесс."""
+        state = load_state(self.chroma_path)
+        if state['current'] == self.state['current'] or self._lock.locked():
+            return
+        async with self._lock:
+            name = state['current']
+            logger.info(f'Индекс переключён другим процессом на {name}')
+            self._activate(name, await self._connect(name), state)
+
+    async def watch(self, interval: int = INDEX_REBUILD_INTERVAL, poll: float = RETRIEVAL_WATCH_INTERVAL):
+        """Следит за версиями индекса, пока процесс работает.
+
+        Каждые `poll` секунд сверяется с `versions.json` и переключается вслед за другими процессами;
+        каждые `interval` секунд (0 — только по команде) пересобирает индекс. Если индекс за это время
+        уже пересобрал другой процесс (время пересборки хранится в `versions.json`), пересборка
+        пропускается, поэтому при нескольких процессах плановую пересборку выполняет один из них.
+        """
+        last_rebuild = time.monotonic()
+        while True:
+            await asyncio.sleep(poll)
+            try:
+                await self._follow()
+            except Exception as ex:
+                logger.error(f'Ошибка переключения на новую версию индекса: {ex!r}')
+            if not interval or time.monotonic() - last_rebuild < interval:
+                continue
+            last_rebuild = time.monotonic()
+            try:
+                await self.rebuild(max_age=interval)
+            except RebuildError as ex:
+                logger.warning(f'Плановая пересборка индекса отменена: {ex}')
+            except Exception as ex:
+                logger.error(f'Ошибка плановой пересборки индекса: {ex!r}')
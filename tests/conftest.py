@@ -0,0 +1,8 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# Значения по умолчанию для импорта bot.py и config.py без .env
+os.environ.setdefault('BOT_TOKEN', '123456:TEST-token-for-local-tests')
+os.environ.setdefault('WEBHOOK_SECRET', 'test-secret')
@@ -0,0 +1,102 @@
+import json
+import time
+
+from rag.answer_cache import AnswerCache
+
+
+def make_cache(**kwargs) -> AnswerCache:
+    cache = AnswerCache(**{'max_size': 10, 'ttl': 60, 'threshold': 0.9, **kwargs})
+    cache.bind_index('v1')
+    return cache
+
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = make_cache()
+    cache.put('Что такое RAG?', None, 'ответ')
+
+    assert cache.get_exact('  что такое   rag') == 'ответ'
+    assert cache.get_exact('что такое LLM') is None
+    assert cache.stats['exact_hits'] == 1
+
+
+def test_semantic_hit_respects_threshold():
+    cache = make_cache()
+    cache.put('вопрос', [1.0, 0.0], 'ответ')
+
+    assert cache.get_similar([0.95, 0.312]) == 'ответ'
+    assert cache.get_similar([0.6, 0.8]) is None
+    assert (cache.stats['semantic_hits'], cache.stats['misses']) == (1, 1)
+
+
+def test_expired_entries_are_not_returned():
+    cache = make_cache(ttl=10)
+    cache.put('вопрос', [1.0, 0.0], 'ответ')
+    cache.entries['вопрос'].created_at -= 11
+
+    assert cache.get_exact('вопрос') is None
+    cache.put('другой', [1.0, 0.0], 'ответ')
+    cache.entries['другой'].created_at -= 11
+    assert cache.get_similar([1.0, 0.0]) is None
+    assert not cache.entries
+
+
+def test_new_index_version_clears_cache_and_rejects_stale_answers():
+    cache = make_cache()
+    cache.put('вопрос', [1.0, 0.0], 'ответ', 'v1')
+
+    cache.bind_index('v2')
+    assert cache.get_exact('вопрос') is None
+    cache.put('вопрос', [1.0, 0.0], 'ответ по v1', 'v1')
+    assert not cache.entries
+    cache.put('вопрос', [1.0, 0.0], 'ответ по v2', 'v2')
+    assert cache.get_exact('вопрос') == 'ответ по v2'
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = make_cache(persist_path=path)
+    cache.put('вопрос', [1.0, 0.0], 'ответ')
+    cache.save()
+
+    loaded = AnswerCache(max_size=10, ttl=60, threshold=0.9, persist_path=path)
+    assert loaded.index_version == 'v1'
+    assert loaded.get_exact('вопрос') == 'ответ'
+    assert loaded.get_similar([1.0, 0.0]) == 'ответ'
+
+
+def test_save_merges_entries_of_other_processes(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    first, second = make_cache(persist_path=path), make_cache(persist_path=path)
+    first.put('общий', None, 'старый')
+    first.put('первый', None, 'ответ 1')
+    first.save()
+    time.sleep(0.01)
+    second.put('общий', None, 'новый')
+    second.put('второй', None, 'ответ 2')
+    second.save()
+
+    loaded = AnswerCache(max_size=10, ttl=60, persist_path=path)
+    assert {key: entry.answer for key, entry in loaded.entries.items()} == {
+        'первый': 'ответ 1', 'общий': 'новый', 'второй': 'ответ 2'
+    }
+
+    other = AnswerCache(max_size=10, ttl=60, persist_path=path)
+    other.bind_index('v2')
+    other.put('свежий', None, 'ответ')
+    other.save()
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['index_version'] == 'v2'
+    assert [entry['query'] for entry in data['entries']] == ['свежий']
+
+
+def test_malformed_entries_are_skipped_on_load(tmp_path):
+    path = tmp_path / 'cache.json'
+    path.write_text(json.dumps({'index_version': 'v1', 'entries': [
+        {'query': 'вопрос', 'embedding': None, 'answer': 'ответ', 'created_at': time.time()},
+        {'query': 'без ответа'},
+        {'query': 'дата', 'embedding': None, 'answer': 'ответ', 'created_at': 'вчера'},
+    ]}, ensure_ascii=False), encoding='utf-8')
+
+    cache = AnswerCache(max_size=10, ttl=60, persist_path=str(path))
+    assert list(cache.entries) == ['вопрос']
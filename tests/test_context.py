@@ -0,0 +1,50 @@
+from langchain_core.documents import Document
+
+from vec_db.context import FRAGMENT_GAP, count_tokens, pack_context
+
+
+def chunk(text, source='https://example.com/a', **metadata):
+    return Document(page_content=text, metadata={'source': source, **metadata})
+
+
+def test_chunks_follow_document_order_and_gaps_are_marked():
+    docs = [
+        (chunk('третий чанк про котов', chunk=3), 0.1),
+        (chunk('первый чанк про собак', chunk=1), 0.2),
+        (chunk('второй чанк про птиц', chunk=2), 0.3),
+        (chunk('чанк без номера про рыб'), 0.4),
+        (chunk('седьмой чанк про хомяков', chunk=7), 0.5),
+    ]
+    packed = pack_context(docs, budget=1000)
+
+    assert packed.chunks == 5
+    body = packed.text.split('\n', 1)[1]
+    assert body.split(FRAGMENT_GAP) == [
+        'первый чанк про собак\nвторой чанк про птиц\nтретий чанк про котов',
+        'седьмой чанк про хомяков',
+        'чанк без номера про рыб\n',
+    ]
+
+
+def test_best_chunk_is_truncated_when_it_exceeds_budget():
+    docs = [(chunk('очень длинный чанк ' * 100, chunk=0), 0.1), (chunk('другой', 'https://example.com/b'), 0.2)]
+    packed = pack_context(docs, budget=50)
+
+    assert packed.sources == ['https://example.com/a']
+    assert packed.chunks == 1
+    assert 0 < packed.tokens <= 50
+    assert 'очень длинный чанк' in packed.text
+
+
+def test_budget_is_filled_by_rank_before_document_order():
+    docs = [
+        (chunk('лучший чанк ' * 20, chunk=5), 0.1),
+        (chunk('ранний чанк ' * 20, chunk=0), 0.2),
+        (chunk('второй ранний чанк ' * 20, chunk=1), 0.3),
+    ]
+    budget = count_tokens('[1] Источник: https://example.com/a\n') + count_tokens(docs[0][0].page_content) + 5
+    packed = pack_context(docs, budget=budget)
+
+    assert packed.chunks == 1
+    assert 'лучший чанк' in packed.text
+    assert 'ранний чанк' not in packed.text
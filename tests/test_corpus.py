@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from vec_db.corpus import CorpusStore
+
+
+def test_opening_a_json_file_does_not_modify_it(tmp_path):
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps([{'source': 'a', 'text': 'текст'}], ensure_ascii=False, indent=4), encoding='utf-8')
+    before = path.read_bytes()
+
+    CorpusStore(str(path))
+
+    assert path.read_bytes() == before
+    with pytest.raises(ValueError):
+        CorpusStore(str(path)).append({'source': 'b', 'text': 'другой'})
+    assert path.read_bytes() == before
+
+
+def test_torn_tail_is_dropped_only_on_append(tmp_path):
+    path = tmp_path / 'data.jsonl'
+    path.write_bytes(b'{"source": "a", "text": "1"}\n{"source": "b", "te')
+
+    corpus = CorpusStore(str(path))
+    assert corpus.sources == ['a']
+    assert path.read_bytes().endswith(b'"te')
+
+    corpus.append({'source': 'c', 'text': '3'})
+    assert [doc['source'] for doc in CorpusStore(str(path)).iter_documents()] == ['a', 'c']
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from api_utils import gigachat_api_utils
+from api_utils.gigachat_api_utils import GigaChatError, GigaChatResponseError
+from api_utils.gigachat_client import CircuitBreaker, GigaChatClient, gigachat_client, parser_gigachat_client
+from api_utils.http_client import http_client
+from api_utils.token_manager import TokenManager
+from benchmarks.mock_gigachat import ANSWER, MockGigaChat
+
+
+def run_with_mock(mock: MockGigaChat, scenario):
+    async def main():
+        base_url = await mock.start()
+        gigachat_api_utils.GIGACHAT_AUTH_URL = f'{base_url}/api/v2/oauth'
+        gigachat_api_utils.GIGACHAT_API_URL = f'{base_url}/api/v1'
+        try:
+            return await scenario(GigaChatClient(TokenManager('secret'), deadline=5, retries=3, backoff=0.01,
+                                                 hedge=False, breaker=CircuitBreaker(3, 30)))
+        finally:
+            await http_client.close()
+            await mock.stop()
+
+    return asyncio.run(main())
+
+
+def test_retries_server_errors():
+    mock = MockGigaChat(latency=0, failures=[503, 429])
+
+    async def scenario(client):
+        return await client.complete('вопрос'), client.breaker.state
+
+    assert run_with_mock(mock, scenario) == (ANSWER, 'closed')
+    assert mock.completion_requests == 3
+
+
+def test_malformed_response_raises_gigachat_error():
+    mock = MockGigaChat(latency=0, malformed=1)
+
+    async def scenario(client):
+        with pytest.raises(GigaChatResponseError) as info:
+            await client.complete('вопрос')
+        return info.value, client.breaker.state
+
+    error, state = run_with_mock(mock, scenario)
+    assert isinstance(error, GigaChatError)
+    assert state == 'closed'
+    assert mock.completion_requests == 1
+
+
+def test_malformed_and_empty_responses_open_breaker():
+    mock = MockGigaChat(latency=0, malformed=2, answer='')
+
+    async def scenario(client):
+        for _ in range(3):
+            with pytest.raises(GigaChatResponseError):
+                await client.complete('вопрос')
+        return client.breaker.state
+
+    assert run_with_mock(mock, scenario) == 'open'
+    assert mock.completion_requests == 3
+
+
+def test_parser_and_answers_use_separate_breakers():
+    assert parser_gigachat_client.breaker is not gigachat_client.breaker
+
+
+def test_concurrent_401_refreshes_token_once():
+    mock = MockGigaChat(latency=0.05)
+
+    async def scenario(client):
+        await client.complete('прогрев')
+        mock.revoke_tokens()
+        return await asyncio.gather(*(client.complete(f'вопрос {i}') for i in range(5)))
+
+    assert run_with_mock(mock, scenario) == [ANSWER] * 5
+    assert mock.oauth_requests == 2
+
+
+def test_cancellation_does_not_open_breaker():
+    mock = MockGigaChat(latency=1)
+
+    async def scenario(client):
+        for _ in range(5):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(client.complete('вопрос'), 0.05)
+        return client.breaker.state
+
+    assert run_with_mock(mock, scenario) == 'closed'
+
+
+def test_failed_token_refresh_frees_half_open_trial():
+    mock = MockGigaChat(latency=0)
+
+    class FailingRefresh:
+        async def get(self):
+            return 'revoked-token'
+
+        async def refresh(self, stale=None):
+            raise GigaChatError(503, 'OAuth недоступен')
+
+    async def scenario(client):
+        client.tokens = FailingRefresh()
+        client.breaker = CircuitBreaker(1, 0)
+        client.breaker.record_failure()
+        errors = []
+        for _ in range(2):
+            with pytest.raises(GigaChatError) as info:
+                await client.complete('вопрос')
+            errors.append(info.value.status)
+        return errors
+
+    # Второй вызов снова допущен как пробный, а не отклонён CircuitOpenError
+    assert run_with_mock(mock, scenario) == [503, 503]
+    assert mock.completion_requests == 2
+
+
+def test_late_401_does_not_refresh_replaced_token():
+    mock = MockGigaChat(latency=0)
+
+    async def scenario(client):
+        stale = await client.tokens.get()
+        fresh = await client.tokens.refresh(stale=stale)
+        # Ответ 401 на запрос со старым токеном пришёл уже после обновления
+        return stale, fresh, await client.tokens.refresh(stale=stale)
+
+    stale, fresh, again = run_with_mock(mock, scenario)
+    assert fresh != stale and again == fresh
+    assert mock.oauth_requests == 2
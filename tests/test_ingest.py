@@ -0,0 +1,53 @@
+import asyncio
+
+from vec_db.corpus import CorpusStore
+from vec_db.ingest import ingest
+from vec_db.manifest import load_manifest
+
+
+class StubStore:
+    """Коллекция в памяти, записывающая порядок операций."""
+
+    def __init__(self):
+        self.records = {}
+        self.operations = []
+
+    def get(self, include=None):
+        return {'ids': list(self.records)}
+
+    def add_texts(self, texts, metadatas, ids):
+        self.operations.append(('add', list(ids)))
+        self.records.update(zip(ids, texts))
+
+    def delete(self, ids):
+        self.operations.append(('delete', sorted(ids)))
+        for chunk_id in ids:
+            del self.records[chunk_id]
+
+
+def test_incremental_sync_touches_only_changed_sources(tmp_path):
+    corpus = CorpusStore(str(tmp_path / 'data.jsonl'))
+    corpus.append({'source': 'a', 'text': '### Первый\nтекст а'})
+    corpus.append({'source': 'b', 'text': '### Один\nтекст б\n### Два\nстарый'})
+    corpus.append({'source': 'c', 'text': '### Третий\nтекст в'})
+    db = StubStore()
+    asyncio.run(ingest(db, str(tmp_path), corpus, ['a', 'b', 'c']))
+    before = load_manifest(str(tmp_path))
+
+    corpus.append({'source': 'b', 'text': '### Один\nтекст б\n### Два\nновый'})
+    db.operations.clear()
+    stats = asyncio.run(ingest(db, str(tmp_path), corpus, ['a', 'b']))
+    after = load_manifest(str(tmp_path))
+
+    kept, replaced = before['b']['chunk_ids']
+    added = [chunk_id for chunk_id in after['b']['chunk_ids'] if chunk_id != kept]
+    assert after['a'] == before['a']
+    assert after['b']['chunk_ids'][0] == kept
+    assert db.operations == [
+        ('add', added),
+        ('delete', [replaced]),
+        ('delete', sorted(before['c']['chunk_ids'])),
+    ]
+    assert (stats['changed_sources'], stats['added_sources'], stats['removed_sources']) == (['b'], [], ['c'])
+    assert set(after) == {'a', 'b'}
+    assert set(db.records) == {chunk_id for entry in after.values() for chunk_id in entry['chunk_ids']}
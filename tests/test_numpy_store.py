@@ -0,0 +1,100 @@
+import numpy as np
+
+from vec_db.numpy_store import NumpyVectorStore
+from vec_db.quantization import truncate
+
+
+class StubEmbeddings:
+    """Эмбеддинги из заранее заданной таблицы: текст — номер строки матрицы."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[int(text)].tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def random_set(clusters: int = 30, size: int = 10, dims: int = 64, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    # Векторы сгруппированы вокруг случайных центров, запросы — зашумлённые центры: ближайшие соседи
+    # запроса лежат в его группе, а порядок внутри группы определяют малые различия
+    centers = rng.normal(size=(clusters, dims))
+    vectors = np.repeat(centers, size, axis=0) + 0.3 * rng.normal(size=(clusters * size, dims))
+    queries = centers + 0.3 * rng.normal(size=(clusters, dims))
+    return vectors.astype(np.float32), queries.astype(np.float32)
+
+
+def make_store(vectors: np.ndarray, **kwargs) -> NumpyVectorStore:
+    store = NumpyVectorStore(StubEmbeddings(vectors), **kwargs)
+    texts = [str(i) for i in range(len(vectors))]
+    store.add_texts(texts, [{'row': i} for i in range(len(vectors))], ids=texts)
+    return store
+
+
+def brute_force(vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return [[int(i) for i in np.argsort(-(vectors @ query))[:k]] for query in queries]
+
+
+def rows(results) -> list:
+    return [[doc.metadata['row'] for doc, _ in result] for result in results]
+
+
+def test_exact_search_matches_brute_force_cosine():
+    vectors, queries = random_set()
+    store = make_store(vectors)
+
+    results = store.similarity_search_by_vectors(queries.tolist(), k=5)
+
+    assert rows(results) == brute_force(vectors, queries, 5)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    query = queries[0] / np.linalg.norm(queries[0])
+    for doc, score in results[0]:
+        assert np.isclose(score, 2 - 2 * normalized[doc.metadata['row']] @ query, atol=1e-5)
+
+
+def test_persist_and_load_round_trip(tmp_path):
+    vectors, queries = random_set()
+    store = make_store(vectors, persist_directory=str(tmp_path))
+    store.persist()
+    expected = rows(store.similarity_search_by_vectors(queries.tolist(), k=5))
+
+    loaded = NumpyVectorStore(StubEmbeddings(vectors), persist_directory=str(tmp_path))
+    assert loaded.ids == store.ids
+    assert loaded.get(ids=['7'])['documents'] == ['7']
+    assert rows(loaded.similarity_search_by_vectors(queries.tolist(), k=5)) == expected
+
+
+def test_compressed_codes_with_rescoring_keep_exact_top_k():
+    vectors, queries = random_set()
+    expected = brute_force(vectors, queries, 5)
+
+    for options in ({'quantization': 'int8'}, {'quantization': 'binary'}, {'dims': 32, 'quantization': 'int8'}):
+        store = make_store(vectors, **options)
+        assert rows(store.similarity_search_by_vectors(queries.tolist(), k=5)) == expected, options
+
+
+def test_compressed_codes_are_saved_with_the_store(tmp_path):
+    vectors, queries = random_set()
+    store = make_store(vectors, persist_directory=str(tmp_path), quantization='binary')
+    store.similarity_search_by_vectors(queries.tolist(), k=5)
+    store.persist()
+
+    loaded = NumpyVectorStore(StubEmbeddings(vectors), persist_directory=str(tmp_path), quantization='binary')
+    assert not loaded._codes_stale
+    assert np.array_equal(loaded.compressed.codes, store.compressed.codes)
+
+
+def test_matryoshka_truncation_renormalises():
+    vectors, _ = random_set(clusters=2)
+
+    truncated = truncate(vectors, 16)
+
+    assert truncated.shape == (20, 16)
+    assert np.allclose(np.linalg.norm(truncated, axis=1), 1, atol=1e-6)
+    prefix = vectors[:, :16]
+    assert np.allclose(truncated, prefix / np.linalg.norm(prefix, axis=1, keepdims=True), atol=1e-6)
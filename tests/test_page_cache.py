@@ -0,0 +1,13 @@
+from parser.page_cache import PageCache
+
+
+def test_summary_survives_refetch_of_unchanged_html(tmp_path):
+    cache = PageCache(str(tmp_path))
+    assert cache.put('https://example.com', '<p>текст</p>', None, None)
+    cache.put_summary('https://example.com', 'выжимка')
+
+    assert not cache.put('https://example.com', '<p>текст</p>', None, None)
+    assert cache.get_meta('https://example.com')['summary'] == 'выжимка'
+
+    assert cache.put('https://example.com', '<p>новый текст</p>', None, None)
+    assert 'summary' not in cache.get_meta('https://example.com')
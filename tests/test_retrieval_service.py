@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from langchain_core.documents import Document
+
+from vec_db.retrieval_client import RetrievalClient
+from vec_db.retrieval_service import RetrievalService
+
+
+class StaticRetriever:
+    async def embed_many(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    async def search_many(self, vectors, k):
+        return [[(Document(page_content='текст', metadata={'source': 'https://example.com'}), 0.1)]
+                for _ in vectors]
+
+    async def search(self, query, k):
+        return (await self.search_many([[1.0, 0.0]], k))[0]
+
+
+class StaticIndex:
+    version = 'v1'
+    rebuilding = False
+
+    def __init__(self):
+        self.retriever = StaticRetriever()
+
+    async def rebuild(self, refresh=False):
+        return 'v2'
+
+
+def request_statuses(requests):
+    async def scenario():
+        async with TestClient(TestServer(RetrievalService(StaticIndex()).app())) as client:
+            statuses = []
+            for path, kwargs in requests:
+                response = await client.post(path, **kwargs)
+                body = await response.json()
+                assert (response.status == 400) == ('error' in body)
+                statuses.append(response.status)
+            return statuses
+
+    return asyncio.run(scenario())
+
+
+def test_valid_payloads_are_served():
+    assert request_statuses([
+        ('/embed', {'json': {'texts': ['вопрос']}}),
+        ('/search', {'json': {'vectors': [[1.0, 0.0]], 'k': 3}}),
+        ('/search', {'json': {'queries': ['вопрос']}}),
+        ('/context', {'json': {'query': 'вопрос', 'budget': 500}}),
+        ('/rebuild', {}),
+        ('/rebuild', {'json': {'refresh': True}}),
+    ]) == [200] * 6
+
+
+def test_malformed_payloads_are_rejected_with_400():
+    assert request_statuses([
+        ('/embed', {'data': 'не json'}),
+        ('/embed', {'json': ['вопрос']}),
+        ('/embed', {'json': {'texts': 'вопрос'}}),
+        ('/search', {'json': {}}),
+        ('/search', {'json': {'vectors': [[1.0], [1.0, 2.0]]}}),
+        ('/search', {'json': {'vectors': [['a']]}}),
+        ('/search', {'json': {'queries': ['вопрос'], 'k': 0}}),
+        ('/context', {'json': {'budget': 500}}),
+        ('/context', {'json': {'query': 'вопрос', 'budget': '500'}}),
+        ('/rebuild', {'json': {'refresh': 'yes'}}),
+    ]) == [400] * 10
+
+
+def test_client_timeout_applies_to_posts():
+    async def hang(request):
+        await asyncio.sleep(10)
+        return web.json_response({})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post('/embed', hang)
+        async with TestServer(app) as server:
+            client = RetrievalClient(str(server.make_url('')), timeout=0.1)
+            try:
+                with pytest.raises(asyncio.TimeoutError):
+                    await client.embed_many(['вопрос'])
+            finally:
+                await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_admin_routes_require_the_secret():
+    async def scenario():
+        app = RetrievalService(StaticIndex(), secret='secret').app()
+        async with TestClient(TestServer(app)) as client:
+            statuses = []
+            for path, headers in [('/rebuild', {}), ('/rollback', {'X-Retrieval-Secret': 'wrong'}),
+                                  ('/rebuild', {'X-Retrieval-Secret': 'secret'}), ('/embed', {})]:
+                response = await client.post(path, headers=headers, json={'texts': ['вопрос']})
+                statuses.append(response.status)
+            return statuses
+
+    assert asyncio.run(scenario()) == [403, 403, 200, 200]
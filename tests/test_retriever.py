@@ -0,0 +1,79 @@
+import asyncio
+
+from vec_db.retriever import AsyncRetriever
+
+
+class StubEmbeddings:
+    def __init__(self, error: Exception | None = None):
+        self.error = error
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        return [[float(len(text)), float(len(self.calls))] for text in texts]
+
+
+class StubStore:
+    def __init__(self, embeddings: StubEmbeddings, name: str = 'db'):
+        self.embeddings = embeddings
+        self.name = name
+
+    def similarity_search_by_vector_with_relevance_scores(self, vector, k):
+        return [(self.name, 0.0)]
+
+
+def test_concurrent_embeds_share_one_batch():
+    async def scenario():
+        embeddings = StubEmbeddings()
+        retriever = AsyncRetriever(StubStore(embeddings), batch_window=0.01, max_batch=8, workers=1)
+        try:
+            vectors = await asyncio.gather(*(retriever.embed(text) for text in ('а', 'бб', 'ввв')))
+        finally:
+            retriever.close()
+        return embeddings.calls, vectors
+
+    calls, vectors = asyncio.run(scenario())
+    assert calls == [['а', 'бб', 'ввв']]
+    assert vectors == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+
+
+def test_batch_error_reaches_every_waiter():
+    async def scenario():
+        retriever = AsyncRetriever(StubStore(StubEmbeddings(RuntimeError('модель недоступна'))),
+                                   batch_window=0.01, max_batch=8, workers=1)
+        try:
+            return await asyncio.gather(*(retriever.embed(text) for text in ('а', 'б')), return_exceptions=True)
+        finally:
+            retriever.close()
+
+    results = asyncio.run(scenario())
+    assert len(results) == 2
+    for result in results:
+        assert isinstance(result, RuntimeError)
+
+
+def test_snapshot_keeps_the_version_it_started_on():
+    async def scenario():
+        old, new = StubEmbeddings(), StubEmbeddings()
+        retriever = AsyncRetriever(StubStore(old, 'old'), batch_window=0.01, max_batch=8, workers=1)
+        retriever.version = 'v1'
+        try:
+            index = retriever.snapshot()
+            pending = asyncio.create_task(index.embed('вопрос'))
+            await asyncio.sleep(0)
+            retriever.swap(StubStore(new, 'new'), 'v2')
+            fresh = await retriever.embed('другой')
+            await pending
+            return index.version, await index.search_by_vector([1.0, 1.0]), old.calls, new.calls, fresh
+        finally:
+            retriever.close()
+
+    version, docs, old_calls, new_calls, fresh = asyncio.run(scenario())
+    assert version == 'v1'
+    assert docs == [('old', 0.0)]
+    assert old_calls == [['вопрос']]
+    assert new_calls == [['другой']]
+    assert fresh == [6.0, 1.0]
+
@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+from rag.scheduler import QueueFullError, RequestScheduler
+
+
+def test_requests_waiting_for_warm_up_count_against_the_queue():
+    async def scenario():
+        scheduler = RequestScheduler(concurrency=1, max_queue=2)
+        ready = asyncio.Event()
+        admitted = []
+
+        async def ask(chat_id):
+            async with scheduler.admit(chat_id, ready):
+                admitted.append(chat_id)
+
+        waiting = [asyncio.create_task(ask(chat_id)) for chat_id in (1, 2)]
+        await asyncio.sleep(0)
+        assert scheduler.full and not admitted
+        with pytest.raises(QueueFullError):
+            await ask(3)
+
+        ready.set()
+        await asyncio.gather(*waiting)
+        assert sorted(admitted) == [1, 2]
+        assert scheduler.waiting == 0
+
+    asyncio.run(scenario())
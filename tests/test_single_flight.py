@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from api_utils.gigachat_api_utils import GigaChatError
+from rag.single_flight import SingleFlight
+
+
+def test_stream_error_reaches_every_subscriber_as_its_own_copy():
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def factory():
+            yield 'часть'
+            started.set()
+            await asyncio.sleep(0.01)
+            raise GigaChatError(503, 'недоступен', retry_after=1.0)
+
+        async def consume():
+            parts = []
+            try:
+                async for part in flight.stream('ключ', factory):
+                    parts.append(part)
+            except GigaChatError as ex:
+                return parts, ex
+
+        first = asyncio.create_task(consume())
+        await started.wait()
+        return await asyncio.gather(first, consume())
+
+    (parts_a, error_a), (parts_b, error_b) = asyncio.run(scenario())
+    assert parts_a == parts_b == ['часть']
+    assert error_a is not error_b
+    assert error_a.__cause__ is error_b.__cause__
+    assert (error_a.status, error_a.retry_after, str(error_a)) == (503, 1.0, str(error_b.__cause__))
+
+
+def test_stream_keeps_pump_task_referenced():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def factory():
+            yield 'a'
+
+        stream = flight.stream('ключ', factory)
+        assert await stream.__anext__() == 'a'
+        assert len(flight._pumps) == 1
+        with pytest.raises(StopAsyncIteration):
+            await stream.__anext__()
+        await asyncio.sleep(0)
+        return len(flight._pumps)
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,101 @@
+import asyncio
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp.test_utils import TestClient, TestServer
+
+import bot as bot_module
+from benchmarks.mock_telegram import MockTelegram
+from benchmarks.replay_updates import UPDATES_PATH, load_updates
+from config import BOT_TOKEN, WEBHOOK_PATH, WEBHOOK_SECRET
+
+ANSWER = 'Ответ из базы знаний'
+
+
+class StaticPipeline:
+    """Конвейер, сразу отдающий один и тот же ответ, чтобы проверять только транспорт."""
+
+    def __init__(self):
+        self.questions = []
+
+    async def stream(self, query: str):
+        self.questions.append(query)
+        yield ANSWER
+
+
+async def wait_idle():
+    while bot_module.in_flight:
+        await asyncio.sleep(0.01)
+
+
+def run_webhook_scenario(scenario):
+    async def main():
+        telegram = MockTelegram()
+        api_url = await telegram.start()
+        bot_module.bot = Bot(token=BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+        bot_module.pipeline = StaticPipeline()
+        bot_module.draining = False
+        bot_module.ready.set()
+        client = TestClient(TestServer(bot_module.create_webhook_app()))
+        await client.start_server()
+        try:
+            return await scenario(client, telegram)
+        finally:
+            await client.close()
+            await bot_module.bot.session.close()
+            await telegram.stop()
+            bot_module.pipeline = None
+            bot_module.draining = False
+
+    return asyncio.run(main())
+
+
+def test_replayed_updates_are_answered():
+    updates = load_updates(UPDATES_PATH)
+
+    async def scenario(client, telegram):
+        statuses = []
+        for update in updates:
+            response = await client.post(WEBHOOK_PATH, json=update,
+                                         headers={'X-Telegram-Bot-Api-Secret-Token': WEBHOOK_SECRET})
+            statuses.append(response.status)
+        await wait_idle()
+        return statuses, telegram
+
+    statuses, telegram = run_webhook_scenario(scenario)
+    assert statuses == [200] * len(updates)
+    assert len(telegram.sent('sendMessage')) == len(updates)
+    assert {call['chat_id'] for call in telegram.sent('sendMessage')} == \
+           {str(update['message']['chat']['id']) for update in updates}
+    assert all(call['text'] == ANSWER for call in telegram.sent('editMessageText')[-len(updates):])
+
+
+def test_rejects_update_without_secret():
+    update = load_updates(UPDATES_PATH)[0]
+
+    async def scenario(client, telegram):
+        response = await client.post(WEBHOOK_PATH, json=update)
+        await wait_idle()
+        return response.status, telegram.calls
+
+    status, calls = run_webhook_scenario(scenario)
+    assert status == 401
+    assert calls == []
+
+
+def test_health_and_drain():
+    update = load_updates(UPDATES_PATH)[0]
+
+    async def scenario(client, telegram):
+        healthz = (await client.get('/healthz')).status
+        ready = (await client.get('/readyz')).status
+        bot_module.draining = True
+        draining = (await client.get('/readyz')).status
+        rejected = (await client.post(WEBHOOK_PATH, json=update,
+                                      headers={'X-Telegram-Bot-Api-Secret-Token': WEBHOOK_SECRET})).status
+        return healthz, ready, draining, rejected, telegram.calls
+
+    healthz, ready, draining, rejected, calls = run_webhook_scenario(scenario)
+    assert (healthz, ready, draining, rejected) == (200, 200, 503, 503)
+    assert calls == []